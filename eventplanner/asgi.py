@@ -0,0 +1,22 @@
+"""
+ASGI config for eventplanner project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.2 has no ASGI handler or async views, so the WSGI application is
+served from a thread pool of ASGI_WORKER_THREADS threads. Live calendar
+streams are served by coroutines, without a thread. Needs asgiref and an ASGI
+server, e.g. ``uvicorn eventplanner.asgi:application``.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+from website.asgi import ThreadedWsgiToAsgi
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "eventplanner.settings")
+
+application = ThreadedWsgiToAsgi(get_wsgi_application(),
+                                 settings.ASGI_WORKER_THREADS)
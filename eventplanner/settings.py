@@ -24,12 +24,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'website',
+    'website.apps.WebsiteConfig',
 ]
 
 MIDDLEWARE = [
+    'website.middleware.ServerTimingMiddleware',
+    'website.middleware.QueryLogMiddleware',
+    'website.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'website.middleware.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -41,7 +45,7 @@ ROOT_URLCONF = 'eventplanner.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'website.timing.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -57,6 +61,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'eventplanner.wsgi.application'
 
+# Requests handled at once per process by eventplanner.asgi, by default the
+# thread pool default of the CPU count plus four, at most 32.
+ASGI_WORKER_THREADS = None
+
 # Database
 # https://docs.djangoproject.com/en/2.0/ref/settings/#databases
 
@@ -67,6 +75,110 @@ DATABASES = {
     }
 }
 
+# Read replicas
+# Views with read_from_replicas read from one of DATABASE_REPLICAS, except
+# for sessions that wrote. DATABASE_REPLICA_COUNT=2 adds two SQLite copies of
+# the database, refreshed by `manage.py sync_replicas`.
+
+DATABASE_REPLICAS = []
+for index in range(int(os.environ.get('DATABASE_REPLICA_COUNT', 0))):
+    alias = 'replica{}'.format(index + 1)
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db-{}.sqlite3'.format(alias)),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['website.routers.ReplicaRouter']
+
+# Request timing
+# Fraction of requests timed by ServerTimingMiddleware, from 0 to 1. Off by
+# default; a small rate such as 0.01 keeps the overhead negligible in
+# production, and 1 times every request while profiling.
+
+SERVER_TIMING_SAMPLE_RATE = 0.0
+
+# Slow query log
+# QueryLogMiddleware records the queries of this fraction of requests, logs
+# those slower than SLOW_QUERY_THRESHOLD_MS with their plans and, when
+# QUERY_LOG_PATH is set, appends all of them there for `manage.py
+# slow_queries`.
+
+QUERY_LOG_SAMPLE_RATE = 0.0
+SLOW_QUERY_THRESHOLD_MS = 100
+QUERY_LOG_PATH = None
+
+# Metrics
+# Every process keeps its metrics in a file of METRICS_DIR, summed by the
+# /metrics endpoint. Files of processes that ended are removed when a process
+# starts. By default it is eventplanner-metrics in the temporary directory.
+# /metrics is served to staff users and to scrapers sending the header
+# "Authorization: Bearer <METRICS_TOKEN>". Without a token only staff see it.
+
+METRICS_DIR = None
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Tests write their files to a temporary directory.
+
+TEST_RUNNER = 'website.tests.runner.TestRunner'
+
+# Caching
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+# Public pages are cached per business, ranking and opinions page and
+# invalidated by model signals; a FileBasedCache shares them across processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PAGE_CACHE_TIMEOUT = 600
+
+# Live calendars
+# Open business calendars are told of booking changes over Server-Sent Events.
+# LocalBroker only reaches listeners in the publishing process; with several
+# server processes on one host use 'website.live.FileBroker', which shares
+# messages through LIVE_UPDATES_PATH. Under eventplanner.asgi streams wait
+# without a thread and end after LIVE_UPDATES_STREAM_SECONDS. Other servers
+# hold a worker thread per stream, so there streams end after
+# LIVE_UPDATES_THREADED_STREAM_SECONDS and browsers reconnect
+# LIVE_UPDATES_THREADED_RECONNECT_SECONDS later. Calendars only reload after
+# reconnecting if a change was published meanwhile.
+
+LIVE_UPDATES_BROKER = 'website.live.LocalBroker'
+LIVE_UPDATES_PATH = None
+LIVE_UPDATES_HEARTBEAT_SECONDS = 15
+LIVE_UPDATES_STREAM_SECONDS = 300
+LIVE_UPDATES_THREADED_STREAM_SECONDS = 10
+LIVE_UPDATES_THREADED_RECONNECT_SECONDS = 20
+
+# Background jobs
+# Jobs are rows of website.Job, run by `manage.py run_workers`. Failed jobs are
+# retried up to JOB_MAX_ATTEMPTS times, JOB_RETRY_DELAY seconds later at first
+# and twice as long after each failure, up to JOB_MAX_RETRY_DELAY. Jobs left
+# running for JOB_STALE_SECONDS by a worker that died are queued again by
+# the others, or failed when it was their last attempt.
+
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10
+JOB_MAX_RETRY_DELAY = 3600
+JOB_STALE_SECONDS = 3600
+
+# Booking notifications
+# Contractors get one email per BOOKING_DIGEST_SECONDS listing the bookings of
+# their businesses made, changed or cancelled in that time. Digests are sent
+# by `manage.py run_workers` over EMAIL_BACKEND, one connection per batch.
+
+BOOKING_DIGEST_SECONDS = 300
+DEFAULT_FROM_EMAIL = 'Event Planner <noreply@localhost>'
+
+# Business search
+# Use 'website.search.SimpleSearchBackend' on databases without SQLite FTS5.
+
+BUSINESS_SEARCH_BACKEND = 'website.search.SQLiteFTSBackend'
+
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
 
@@ -105,7 +217,17 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR + '/media/'
 
+# Avatar thumbnails are rendered by background jobs, see above. Uploads with
+# more pixels than AVATAR_MAX_PIXELS are rejected.
+AVATAR_MAX_PIXELS = 4096 * 4096
+
 AUTH_USER_MODEL = 'website.User'
+# Sessions started before ProfileModelBackend name ModelBackend, and stay
+# logged in while it is listed.
+AUTHENTICATION_BACKENDS = [
+    'website.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 LOGIN_REDIRECT_URL = 'website:main'
 LOGIN_URL = 'website:login'
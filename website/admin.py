@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import (Client, Contractor, Business, BusinessType, Event, Opinion,
+from .models import (BookingNotification, Client, Contractor, Business,
+                     BusinessType, Event, Job, Opinion, OpinionEligibility,
                      User)
 
 
@@ -23,6 +24,7 @@ class ClientAdmin(admin.ModelAdmin):
 
     inlines = [EventInline]
     list_display = ('user',)
+    list_select_related = ('user',)
     list_filter = ('user__date_joined',)
     search_fields = ('user',)
 
@@ -37,6 +39,7 @@ class ContractorAdmin(admin.ModelAdmin):
 
     inlines = [BusinessInline]
     list_display = ('user',)
+    list_select_related = ('user',)
     list_filter = ('user__date_joined',)
     search_fields = ('user',)
 
@@ -53,6 +56,7 @@ class BusinessAdmin(admin.ModelAdmin):
     inlines = [OpinionInline]
     fields = ('name', 'owner', 'business_type', 'description')
     list_display = ('name', 'owner', 'business_type', 'get_average_rating')
+    list_select_related = ('owner__user', 'business_type')
     list_filter = ('business_type',)
     search_fields = ('name',)
 
@@ -74,12 +78,39 @@ class EventAdmin(admin.ModelAdmin):
         })
     )
     list_display = ('title', 'date_from', 'date_to', 'get_duration', 'owner')
+    list_select_related = ('owner__user',)
     list_filter = ('date_from', 'date_to')
     search_fields = ('title',)
 
 
 @admin.register(Opinion)
 class OpinionAdmin(admin.ModelAdmin):
-    fields = ('text', 'rating', 'business')
-    list_display = ('__str__', 'rating', 'business')
+    fields = ('text', 'rating', 'business', 'author', 'event')
+    raw_id_fields = ('author', 'event')
+    list_display = ('__str__', 'rating', 'business', 'author')
+    list_select_related = ('business', 'author__user')
     list_filter = ('rating',)
+
+
+@admin.register(OpinionEligibility)
+class OpinionEligibilityAdmin(admin.ModelAdmin):
+    list_display = ('client', 'business', 'ended_events', 'opinions')
+    list_select_related = ('client__user', 'business')
+    raw_id_fields = ('client', 'business')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'priority', 'attempts', 'run_at',
+                    'worker')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'idempotency_key')
+
+
+@admin.register(BookingNotification)
+class BookingNotificationAdmin(admin.ModelAdmin):
+    list_display = ('event_title', 'action', 'business', 'contractor',
+                    'created_at', 'sent_at')
+    list_select_related = ('business', 'contractor__user')
+    list_filter = ('action', 'sent_at')
+    raw_id_fields = ('contractor', 'business')
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class WebsiteConfig(AppConfig):
     name = 'website'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401
+
+        # Files of earlier server processes would count forever.
+        metrics.remove_dead_process_files()
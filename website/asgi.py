@@ -0,0 +1,146 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from . import live
+
+LIVE_VIEW_NAME = 'website:business_live'
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """Serves a WSGI application over ASGI, each request on a pool thread.
+
+    asgiref's own adapter runs every request on one shared thread and never
+    closes responses, which skips Django's ``request_finished`` and leaks
+    database connections. Here a slow request holds only its pool thread,
+    while the server keeps reading and writing other connections.
+
+    Live calendar streams are served by a coroutine instead, so open
+    calendars hold no thread. They skip the middleware; they are public
+    and read nothing from the session.
+    """
+
+    def __init__(self, wsgi_application, max_workers=None):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        pk = _get_live_business(scope)
+        # Unknown businesses get the view's 404 page.
+        if pk is not None and await sync_to_async(
+                _business_exists, thread_sensitive=False,
+                executor=self.executor)(pk):
+            await self.stream(live.business_channel(pk), receive, send,
+                              _get_last_event_id(scope))
+            return
+
+        await _Instance(self.wsgi_application, self.executor)(
+            scope, receive, send)
+
+    async def stream(self, channel, receive, send, last_event_id=None):
+        """Sends the events of ``channel`` until it ends or the client
+        disconnects."""
+        async def send_events():
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'text/event-stream'),
+                                    (b'cache-control', b'no-cache'),
+                                    (b'x-accel-buffering', b'no')]})
+            async for chunk in live.stream_async(channel, last_event_id):
+                await send({'type': 'http.response.body',
+                            'body': chunk.encode(), 'more_body': True})
+            await send({'type': 'http.response.body'})
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        sender = asyncio.ensure_future(send_events())
+        listener = asyncio.ensure_future(wait_for_disconnect())
+        done, pending = await asyncio.wait(
+            [sender, listener], return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if sender in done:
+            sender.result()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+class _Instance(WsgiToAsgiInstance):
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_wsgi_app, thread_sensitive=False,
+                            executor=self.executor)(body)
+
+    def _run_wsgi_app(self, body):
+        response = self.wsgi_application(
+            self.build_environ(self.scope, body), self.start_response)
+        try:
+            for output in response:
+                if output:
+                    self._send_start()
+                    self.sync_send({'type': 'http.response.body',
+                                    'body': output, 'more_body': True})
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+
+        self._send_start()
+        self.sync_send({'type': 'http.response.body'})
+
+    def _send_start(self):
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+
+
+def _get_live_business(scope):
+    """Returns the business of a live calendar stream request, if it is
+    one."""
+    if scope['type'] != 'http' or scope['method'] != 'GET':
+        return None
+    path = scope['path'][len(scope.get('root_path', '')):]
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    return match.kwargs['pk'] if match.view_name == LIVE_VIEW_NAME else None
+
+
+def _get_last_event_id(scope):
+    for name, value in scope['headers']:
+        if name.lower() == b'last-event-id':
+            return live.parse_event_id(value.decode('latin-1'))
+    return None
+
+
+def _business_exists(pk):
+    from .models import Business
+
+    try:
+        return Business.objects.filter(pk=pk).exists()
+    finally:
+        # Pool threads outlive requests and request_finished is not sent.
+        connections.close_all()
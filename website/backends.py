@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class ProfileModelBackend(ModelBackend):
+    """Loads the session user together with its client or contractor profile.
+
+    Both profiles are joined into the user query, so a missing one raises
+    ``DoesNotExist`` on access without another round trip.
+    """
+
+    def get_user(self, user_id):
+        user_model = get_user_model()
+        try:
+            user = user_model._default_manager.select_related(
+                'client', 'contractor').get(pk=user_id)
+        except user_model.DoesNotExist:
+            return None
+
+        return user if self.user_can_authenticate(user) else None
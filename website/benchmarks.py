@@ -0,0 +1,156 @@
+import collections
+import datetime
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Business, Client, Contractor, Event
+from .views import (BusinessesListView, EventsListView, MainPageView,
+                    OpinionsListView, RankingView)
+
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name):
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+class Subjects:
+    """The busiest rows of the database, which the benchmarks run against."""
+
+    def __init__(self):
+        self.now = timezone.now()
+        self.business = Business.objects.order_by(
+            '-opinion_count', 'pk').first()
+        self.scheduled_business = Business.objects.annotate(
+            events=Count('event')).order_by('-events', 'pk').first()
+        self.client = Client.objects.select_related('user').annotate(
+            events=Count('event')).order_by('-events', 'pk').first()
+        self.contractor = Contractor.objects.select_related('user').annotate(
+            businesses=Count('business')).order_by('-businesses', 'pk').first()
+
+    def is_complete(self):
+        return None not in (self.business, self.scheduled_business,
+                            self.client, self.contractor)
+
+
+def make_view(view_class, user=None, path='/', **kwargs):
+    request = RequestFactory().get(path)
+    request.user = user or AnonymousUser()
+    view = view_class()
+    view.setup(request, **kwargs)
+    return view
+
+
+@benchmark('Business.get_average_rating')
+def average_rating(subjects):
+    Business.objects.get(pk=subjects.business.pk).get_average_rating()
+
+
+@benchmark('Business.get_rating_histogram')
+def rating_histogram(subjects):
+    Business.objects.get(pk=subjects.business.pk).get_rating_histogram()
+
+
+@benchmark('Business.get_event_schedule')
+def event_schedule(subjects):
+    subjects.scheduled_business.get_event_schedule()
+
+
+@benchmark('Business.objects.busy_during')
+def busy_during(subjects):
+    list(Business.objects.busy_during(
+        subjects.now, subjects.now + datetime.timedelta(days=7))[:25])
+
+
+@benchmark('RankingView.get_queryset')
+def ranking(subjects):
+    list(make_view(RankingView).get_queryset())
+
+
+@benchmark('BusinessesListView.page')
+def businesses_page(subjects):
+    view = make_view(BusinessesListView)
+    list(view.paginate_keyset(view.get_queryset())[1])
+
+
+@benchmark('BusinessesListView.search')
+def businesses_search(subjects):
+    view = make_view(BusinessesListView, path='/?q=golden')
+    list(view.paginate_keyset(view.get_queryset())[1])
+
+
+@benchmark('BusinessAutocompleteView.prefix')
+def autocomplete(subjects):
+    list(Business.objects.name_prefix('gol').values_list(
+        'pk', 'name', 'business_type__business_type')[:10])
+
+
+@benchmark('BusinessScheduleView.window')
+def schedule_window(subjects):
+    list(Event.objects.overlapping(
+        subjects.now, subjects.now + datetime.timedelta(days=31)).booking(
+        subjects.scheduled_business).order_by('date_from', 'pk'))
+
+
+@benchmark('OpinionsListView.page')
+def opinions_page(subjects):
+    view = make_view(OpinionsListView, pk=subjects.business.pk)
+    list(view.paginate_keyset(subjects.business.opinion_set.all())[1])
+
+
+@benchmark('EventsListView.page')
+def events_page(subjects):
+    view = make_view(EventsListView, user=subjects.client.user)
+    _, page, events, _ = view.paginate_queryset(view.get_queryset(), None)
+    for event in events:
+        list(event.businesses.all())
+
+
+@benchmark('MainPageView.contractor_page')
+def contractor_page(subjects):
+    view = make_view(MainPageView, user=subjects.contractor.user)
+    list(view.paginate_keyset(Business.objects.filter(
+        owner=subjects.contractor))[1])
+
+
+def run(repeat=5, names=None):
+    """Times every benchmark, or those in ``names``, ``repeat`` times.
+
+    Returns seconds and the query count of the first run per benchmark.
+    """
+    subjects = Subjects()
+    if not subjects.is_complete():
+        raise ValueError('The database needs businesses, events, clients and '
+                         'contractors; run generate_data first.')
+
+    results = collections.OrderedDict()
+    for name, function in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+
+        timings = []
+        for attempt in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                function(subjects)
+                timings.append(time.perf_counter() - start)
+            if not attempt:
+                query_count = len(queries)
+
+        results[name] = {
+            'queries': query_count,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'max': max(timings),
+        }
+    return results
@@ -0,0 +1,165 @@
+import calendar
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import routers
+from .metrics import PAGE_CACHE_LOOKUPS
+
+KEY_PREFIX = 'website'
+
+
+def get_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+
+
+def get_write_timeout():
+    """Returns the timeout to store what the current request built.
+
+    It is 0, storing nothing, while the request reads from a replica: the
+    replica may lag behind the write that bumped a version, and what it
+    returns would stay under the new version until the next bump.
+    """
+    return 0 if routers.reads_from_replica() else get_timeout()
+
+
+def get_or_set(key, default):
+    """``cache.get_or_set`` that only reads the cache while the request reads
+    from a replica."""
+    if routers.reads_from_replica():
+        value = cache.get(key)
+        return default() if value is None else value
+    return cache.get_or_set(key, default, get_timeout())
+
+
+def _version_key(scope):
+    return '{}:version:{}'.format(KEY_PREFIX, scope)
+
+
+def get_versions(*scopes):
+    """Returns the current version of every scope, e.g. ``'business:1'``.
+
+    Versions only ever grow, even when evicted, because new ones start from
+    the current time in milliseconds. Cache entries built from a scope embed
+    its version in their keys, so bumping it invalidates them on any backend.
+    """
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            get_versions(scope)
+
+
+def make_digest(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def make_key(name, *parts):
+    return '{}:page:{}:{}'.format(KEY_PREFIX, name, make_digest(*parts))
+
+
+class CachedPageMixin:
+    """Serves anonymous GET requests from the cache.
+
+    Subclasses return the scopes a page is built from in
+    ``get_cache_scopes``; pages are cached per URL and scope versions.
+    Pages read from a replica are served but not cached, see
+    ``get_write_timeout``.
+    """
+    cache_name = None
+
+    def get_cache_scopes(self):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        if (request.method != 'GET' or request.user.is_authenticated
+                or len(get_messages(request))):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = make_key(self.cache_name, request.get_full_path(),
+                       *get_versions(*self.get_cache_scopes()))
+        cached = cache.get(key)
+        PAGE_CACHE_LOOKUPS.inc(page=self.cache_name,
+                               result='miss' if cached is None else 'hit')
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        timeout = get_write_timeout()
+        if (response.status_code == 200 and not response.streaming
+                and not response.cookies and timeout):
+            cache.set(key, (response.content, response['Content-Type']),
+                      timeout)
+
+        return response
+
+
+class ConditionalPageMixin:
+    """Answers conditional GETs with 304 before any template is rendered.
+
+    Subclasses return data identifying the page state from
+    ``get_page_version``, computed with as little SQL as possible, and may
+    return a datetime from ``get_last_modified`` when deletions cannot make
+    the page older. Views which also define ``get_cache_scopes`` keep both in
+    the cache until one of the scopes is bumped.
+    """
+
+    def get_page_version(self):
+        raise NotImplementedError
+
+    def get_last_modified(self):
+        return None
+
+    def get_page_state(self):
+        def get_state():
+            return self.get_page_version(), self.get_last_modified()
+
+        if not hasattr(self, 'get_cache_scopes'):
+            return get_state()
+
+        return get_or_set(make_key('state', self.request.get_full_path(),
+                                   *get_versions(*self.get_cache_scopes())),
+                          get_state)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+        version, last_modified = self.get_page_state()
+        etag = quote_etag(make_digest(
+            request.get_full_path(), request.user.pk, version))
+        timestamp = last_modified and calendar.timegm(
+            last_modified.utctimetuple())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
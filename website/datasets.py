@@ -0,0 +1,147 @@
+import datetime
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import bump_versions
+from .imports import (BusinessImporter, EventImporter, OpinionImporter,
+                      bulk_insert)
+from .models import Business, Client, Contractor, Event, Opinion, Role, User
+
+BUSINESS_TYPES = ('catering', 'venue', 'music', 'photography', 'flowers',
+                  'decorations', 'transport', 'cake')
+NAME_WORDS = ('Golden', 'Royal', 'Happy', 'Silver', 'Grand', 'Little',
+              'Sunny', 'Blue', 'Old Town', 'Garden', 'River', 'Star')
+EVENT_TITLES = ('Wedding', 'Birthday party', 'Conference', 'Anniversary',
+                'Graduation', 'Christening', 'Company party', 'Concert')
+OPINION_TEXTS = ('Great service.', 'Would book again.', 'Late, but fine.',
+                 'Not worth the price.', 'Everything went perfectly!')
+DEFAULT_PASSWORD = 'p4ssw0rd'
+
+
+class Scale:
+    """Row counts of a generated dataset, derived from the business count
+    unless given."""
+
+    def __init__(self, businesses, contractors=None, clients=None,
+                 events=None, opinions=None, businesses_per_event=3):
+        self.businesses = businesses
+        self.contractors = contractors or max(businesses // 10, 1)
+        self.clients = clients or max(businesses // 2, 1)
+        self.events = events if events is not None else businesses * 2
+        self.opinions = opinions if opinions is not None else businesses * 3
+        self.businesses_per_event = businesses_per_event
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def generate(scale, seed=0, chunk_size=1000, password=DEFAULT_PASSWORD,
+             progress=None):
+    """Adds a synthetic dataset of ``scale`` with bulk inserts.
+
+    Users are named ``client<n>`` and ``contractor<n>`` after the ones
+    already present and share ``password``. Rows go through the
+    ``import_data`` importers, which keep derived data up to date.
+    """
+    generator = random.Random(seed)
+    now = timezone.now()
+    progress = progress or (lambda name, count: None)
+
+    contractors = _create_users(Contractor, Role.CONTRACTOR,
+                                scale.contractors, password, chunk_size)
+    progress('contractors', len(contractors))
+    clients = _create_users(Client, Role.CLIENT, scale.clients, password,
+                            chunk_size)
+    progress('clients', len(clients))
+
+    first_business = _next_pk(Business)
+    _import(BusinessImporter(), ({
+        'id': first_business + index,
+        'name': '{} {} {}'.format(generator.choice(NAME_WORDS),
+                                  generator.choice(BUSINESS_TYPES).title(),
+                                  index),
+        'business_type': generator.choice(BUSINESS_TYPES),
+        'owner': generator.choice(contractors),
+        'description': 'Generated business {}.'.format(index),
+    } for index in range(scale.businesses)), chunk_size)
+    progress('businesses', scale.businesses)
+
+    first_event = _next_pk(Event)
+    window = datetime.timedelta(days=365).total_seconds()
+
+    def events():
+        for index in range(scale.events):
+            date_from = now + datetime.timedelta(
+                seconds=generator.uniform(-window, window))
+            yield {
+                'id': first_event + index,
+                'title': generator.choice(EVENT_TITLES),
+                'date_from': date_from.isoformat(),
+                'date_to': (date_from + datetime.timedelta(
+                    hours=generator.randint(2, 48))).isoformat(),
+                'owner': generator.choice(clients),
+                'businesses': generator.sample(
+                    range(first_business, first_business + scale.businesses),
+                    min(generator.randint(1, scale.businesses_per_event),
+                        scale.businesses)),
+            }
+
+    _import(EventImporter(), events(), chunk_size)
+    progress('events', scale.events)
+
+    # Opinions are grouped by business, so a chunk updates few aggregates.
+    _import(OpinionImporter(), ({
+        'business': first_business + (
+            index * scale.businesses // scale.opinions),
+        'rating': generator.choice((1, 2, 3, 3, 4, 4, 4, 5, 5, 5)),
+        'text': generator.choice(OPINION_TEXTS),
+    } for index in range(scale.opinions)), chunk_size)
+    progress('opinions', scale.opinions)
+
+
+def _next_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def _create_users(profile_model, role, count, password, chunk_size):
+    """Creates ``count`` users with profiles and returns their usernames."""
+    prefix = profile_model.__name__.lower()
+    start = profile_model.objects.count()
+    password = make_password(password)
+    usernames = []
+
+    for chunk_start in range(start, start + count, chunk_size):
+        names = ['{}{}'.format(prefix, index) for index in range(
+            chunk_start, min(chunk_start + chunk_size, start + count))]
+        users = [User(username=name, email='{}@example.com'.format(name),
+                      password=password, role=role.value) for name in names]
+        with transaction.atomic():
+            bulk_insert(User, users)
+            profile_model.objects.bulk_create(
+                [profile_model(user_id=user.pk) for user in users])
+        usernames += names
+
+    return usernames
+
+
+def _import(importer, records, chunk_size):
+    numbered = enumerate(records, 1)
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            return
+        with transaction.atomic():
+            scopes = importer.import_chunk(chunk)
+        bump_versions(*scopes)
+
+
+def count_rows():
+    return {
+        model._meta.model_name: model.objects.count()
+        for model in (Contractor, Client, Business, Event, Opinion)
+    }
@@ -0,0 +1,151 @@
+import collections
+import csv
+import datetime
+
+from .models import Event
+
+CHUNK_SIZE = 1000
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ics': 'text/calendar; charset=utf-8',
+}
+FORMATS = tuple(CONTENT_TYPES)
+ICALENDAR_PRODID = '-//eventplanner//events//EN'
+ICALENDAR_UID_DOMAIN = 'eventplanner'
+# Content lines longer than this many octets are folded (RFC 5545, 3.1).
+ICALENDAR_LINE_LENGTH = 75
+
+
+def get_export_events(events):
+    return events.only('pk', 'title', 'date_from', 'date_to',
+                       'updated_at').order_by('date_from', 'pk')
+
+
+def iter_bookings(events, chunk_size=CHUNK_SIZE):
+    """Yields every event with the sorted names of the businesses it books.
+
+    Events are read ``chunk_size`` at a time and their bookings with one
+    query per chunk, so memory does not grow with the number of events.
+    """
+    chunk = []
+    for event in events.iterator(chunk_size=chunk_size):
+        chunk.append(event)
+        if len(chunk) == chunk_size:
+            yield from _with_bookings(chunk)
+            chunk = []
+    yield from _with_bookings(chunk)
+
+
+def _with_bookings(events):
+    if not events:
+        return
+
+    names = collections.defaultdict(list)
+    bookings = Event.businesses.through.objects.filter(
+        event__in=[event.pk for event in events]).order_by(
+        'business__name').values_list('event', 'business__name')
+    for event, name in bookings:
+        names[event].append(name)
+
+    for event in events:
+        yield event, names[event.pk]
+
+
+def export_events(events, export_format, name, with_businesses=True,
+                  chunk_size=CHUNK_SIZE):
+    """Returns an iterator of the chunks of an export of ``events``.
+
+    ``name`` titles the calendar. Without ``with_businesses`` the booked
+    businesses are left out, saving a query per chunk.
+    """
+    events = get_export_events(events)
+    if with_businesses:
+        rows = iter_bookings(events, chunk_size)
+    else:
+        rows = ((event, None) for event in events.iterator(
+            chunk_size=chunk_size))
+
+    if export_format == 'csv':
+        return _stream_csv(rows, with_businesses)
+    if export_format == 'ics':
+        return _stream_icalendar(rows, name)
+    raise ValueError('Unknown export format {!r}.'.format(export_format))
+
+
+class _Echo:
+    """File-like object returning what ``csv.writer`` writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def _stream_csv(rows, with_businesses):
+    writer = csv.writer(_Echo())
+    header = ['id', 'title', 'start', 'end']
+    yield writer.writerow(header + ['businesses'] if with_businesses
+                          else header)
+
+    for event, businesses in rows:
+        row = [event.pk, event.title, event.date_from.isoformat(),
+               event.date_to.isoformat()]
+        if with_businesses:
+            row.append('; '.join(businesses))
+        yield writer.writerow(row)
+
+
+def _stream_icalendar(rows, name):
+    yield _content_lines(
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:{}'.format(ICALENDAR_PRODID),
+        'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:{}'.format(_escape_text(name)),
+    )
+
+    for event, businesses in rows:
+        lines = [
+            'BEGIN:VEVENT',
+            'UID:event-{}@{}'.format(event.pk, ICALENDAR_UID_DOMAIN),
+            'DTSTAMP:{}'.format(_format_datetime(event.updated_at)),
+            'DTSTART:{}'.format(_format_datetime(event.date_from)),
+            'DTEND:{}'.format(_format_datetime(event.date_to)),
+            'SUMMARY:{}'.format(_escape_text(event.title)),
+        ]
+        if businesses:
+            lines.append('DESCRIPTION:{}'.format(
+                _escape_text(', '.join(businesses))))
+        lines.append('END:VEVENT')
+        yield _content_lines(*lines)
+
+    yield _content_lines('END:VCALENDAR')
+
+
+def _format_datetime(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _escape_text(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _content_lines(*lines):
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+def _fold(line):
+    """Splits ``line`` into folded parts without breaking UTF-8 sequences."""
+    encoded = line.encode()
+    parts = []
+    start = 0
+    limit = ICALENDAR_LINE_LENGTH
+    while len(encoded) - start > limit:
+        end = start + limit
+        while encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+        # Continuation lines start with a space.
+        limit = ICALENDAR_LINE_LENGTH - 1
+    parts.append(encoded[start:].decode())
+    return '\r\n '.join(parts)
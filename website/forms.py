@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm as AuthUserCreationForm
 
 from .models import Business, Client, Contractor, Event, Opinion, User
+from .thumbnails import get_max_pixels
 
 
 class UserCreationForm(AuthUserCreationForm):
@@ -52,6 +53,14 @@ class UserEditAvatarForm(forms.ModelForm):
             'avatar',
         )
 
+    def clean_avatar(self):
+        avatar = self.cleaned_data['avatar']
+        image = getattr(avatar, 'image', None)
+        if image and image.width * image.height > get_max_pixels():
+            raise forms.ValidationError('This image is too large.')
+
+        return avatar
+
 
 class ClientEditForm(forms.ModelForm):
 
@@ -67,6 +76,20 @@ class ContractorEditForm(forms.ModelForm):
         fields = ()
 
 
+class BusinessAutocompleteWidget(forms.SelectMultiple):
+    """Offers only the selected businesses; the page adds matches of
+    what the user types from the ``business_autocomplete`` endpoint."""
+
+    def optgroups(self, name, value, attrs=None):
+        pks = [pk for pk in value if str(pk).isdigit()]
+        businesses = self.choices.queryset.filter(pk__in=pks).order_by(
+            'name_key', 'pk') if pks else []
+        return [(None, [
+            self.create_option(name, business.pk, str(business), True, index,
+                               attrs=attrs)
+        ], index) for index, business in enumerate(businesses)]
+
+
 class EventForm(forms.ModelForm):
 
     class Meta:
@@ -77,6 +100,53 @@ class EventForm(forms.ModelForm):
             'date_to',
             'businesses'
         )
+        widgets = {
+            'businesses': BusinessAutocompleteWidget,
+        }
+
+    def __init__(self, *args, owner=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.owner = owner or getattr(self.instance, 'owner', None)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get('date_from')
+        date_to = cleaned_data.get('date_to')
+
+        if date_from and date_to and date_from < date_to:
+            self._check_overlapping_events(date_from, date_to)
+            self._check_busy_businesses(date_from, date_to,
+                                        cleaned_data.get('businesses'))
+
+        return cleaned_data
+
+    def lock_businesses(self):
+        """Locks the submitted businesses, so concurrent bookings of them
+        cannot both pass validation. Call it in a transaction, before
+        validating."""
+        pks = [pk for pk in self['businesses'].data or ()
+               if str(pk).isdigit()]
+        Business.objects.filter(pk__in=pks).lock()
+
+    def _check_overlapping_events(self, date_from, date_to):
+        if self.owner is None:
+            return
+
+        overlapping = Event.objects.overlapping(date_from, date_to).filter(
+            owner=self.owner).exclude(pk=self.instance.pk).first()
+        if overlapping:
+            self.add_error(None, 'This event overlaps your event "{}".'.format(
+                overlapping))
+
+    def _check_busy_businesses(self, date_from, date_to, businesses):
+        if not businesses:
+            return
+
+        busy = Business.objects.filter(pk__in=businesses).busy_during(
+            date_from, date_to, exclude_event=self.instance)
+        for business in busy:
+            self.add_error('businesses', '{} is already booked at that '
+                                         'time.'.format(business))
 
 
 class BusinessForm(forms.ModelForm):
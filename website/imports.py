@@ -0,0 +1,366 @@
+import collections
+import csv
+import itertools
+import json
+import os
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .caching import bump_versions
+from .models import (Business, BusinessType, Client, Contractor, Event,
+                     ImportCheckpoint, Opinion, OpinionEligibility,
+                     make_name_key)
+from .search import get_search_backend
+
+FORMATS = ('csv', 'jsonl')
+# Stays under the bound parameter limit of older SQLite versions.
+LOOKUP_BATCH_SIZE = 500
+
+
+class InvalidRecord(ValueError):
+
+    def __init__(self, number, message):
+        super().__init__('Record {}: {}'.format(number, message))
+
+
+def read_records(path, format=None):
+    """Yields the records of a CSV or JSON Lines file as dicts, one by one."""
+    format = format or os.path.splitext(path)[1].lstrip('.').lower()
+    if format == 'ndjson':
+        format = 'jsonl'
+    if format not in FORMATS:
+        raise ValueError('Unknown format of {}, use one of: {}.'.format(
+            path, ', '.join(FORMATS)))
+
+    with open(path, newline='', encoding='utf-8') as source:
+        if format == 'csv':
+            yield from csv.DictReader(source)
+            return
+
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('Line {} of {} is not a JSON object.'.format(
+                    number, path))
+            yield record
+
+
+def lookup_in_batches(queryset, lookup, values):
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+        yield from queryset.filter(**{'{}__in'.format(lookup): values[
+            start:start + LOOKUP_BATCH_SIZE]})
+
+
+class LookupCache:
+    """Resolves natural keys to instances with one query per batch of misses.
+
+    Holds at most ``max_size`` instances, so memory stays bounded whatever
+    the number of distinct keys in the input.
+    """
+
+    def __init__(self, queryset, lookup, key, max_size=10000):
+        self.queryset = queryset
+        self.lookup = lookup
+        self.key = key
+        self.max_size = max_size
+        self.cache = {}
+
+    def resolve(self, keys):
+        """Maps each of ``keys`` to its instance, or None if missing."""
+        keys = set(keys)
+        found = {
+            self.key(obj): obj for obj in lookup_in_batches(
+                self.queryset, self.lookup, keys.difference(self.cache))
+        }
+        resolved = {key: self.cache.get(key, found.get(key)) for key in keys}
+
+        if len(self.cache) + len(found) > self.max_size:
+            self.cache.clear()
+        self.cache.update(found)
+        return resolved
+
+
+def bulk_insert(model, objs, batch_size=None):
+    """``bulk_create`` setting the primary key of every object.
+
+    Databases which cannot return inserted keys get the keys following the
+    current maximum, so the import should not run alongside other writers.
+    """
+    if not connection.features.can_return_ids_from_bulk_insert:
+        missing = [obj for obj in objs if obj.pk is None]
+        if missing:
+            start = max([model.objects.aggregate(top=Max('pk'))['top'] or 0]
+                        + [obj.pk for obj in objs if obj.pk is not None])
+            for offset, obj in enumerate(missing, 1):
+                obj.pk = start + offset
+
+    model.objects.bulk_create(objs, batch_size=batch_size)
+
+
+class Importer:
+    """Writes chunks of records of one model.
+
+    ``import_chunk`` receives ``(number, record)`` pairs and returns the
+    page cache scopes to bump once the chunk is committed.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size
+        self.clients = LookupCache(Client.objects.select_related('user'),
+                                   'user__username',
+                                   lambda client: client.user.username)
+
+    def import_chunk(self, records):
+        raise NotImplementedError
+
+    @staticmethod
+    def get_value(number, record, field, required=True):
+        value = record.get(field)
+        if value in (None, ''):
+            if required:
+                raise InvalidRecord(number, 'missing {}.'.format(field))
+            return None
+        return value
+
+    def get_int(self, number, record, field, required=True):
+        value = self.get_value(number, record, field, required)
+        try:
+            return value if value is None else int(value)
+        except (TypeError, ValueError):
+            raise InvalidRecord(number, 'invalid {} {!r}.'.format(
+                field, value))
+
+    def get_ints(self, number, record, field):
+        values = record.get(field) or []
+        if isinstance(values, str):
+            values = values.split(';')
+        try:
+            return [int(value) for value in values if str(value).strip()]
+        except (TypeError, ValueError):
+            raise InvalidRecord(number, 'invalid {} {!r}.'.format(
+                field, values))
+
+    def get_datetime(self, number, record, field):
+        value = self.get_value(number, record, field)
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+        if parsed is None:
+            raise InvalidRecord(number, 'invalid {} {!r}.'.format(
+                field, value))
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    @staticmethod
+    def resolve(cache, number_keys, name):
+        """Resolves ``(number, key)`` pairs, keys may be None."""
+        resolved = cache.resolve(key for _, key in number_keys
+                                 if key is not None)
+        for number, key in number_keys:
+            if key is not None and resolved[key] is None:
+                raise InvalidRecord(number, 'unknown {} {!r}.'.format(
+                    name, key))
+        return resolved
+
+    @staticmethod
+    def check_exist(model, number_pks, name):
+        """Checks ``(number, pk)`` pairs refer to existing rows."""
+        existing = {obj.pk for obj in lookup_in_batches(
+            model.objects.only('pk'), 'pk', {pk for _, pk in number_pks})}
+        for number, pk in number_pks:
+            if pk not in existing:
+                raise InvalidRecord(number, 'unknown {} {}.'.format(name, pk))
+
+
+class BusinessImporter(Importer):
+    """Fields: ``id`` (optional), ``name``, ``business_type``, ``owner``
+    (contractor username) and ``description``.
+
+    Business types are created when missing.
+    """
+
+    def __init__(self, batch_size=None):
+        super().__init__(batch_size)
+        self.business_types = LookupCache(
+            BusinessType.objects.all(), 'business_type',
+            lambda business_type: business_type.business_type)
+        self.contractors = LookupCache(
+            Contractor.objects.select_related('user'), 'user__username',
+            lambda contractor: contractor.user.username)
+
+    def import_chunk(self, records):
+        type_names = {self.get_value(number, record, 'business_type')
+                      for number, record in records}
+        business_types = self.business_types.resolve(type_names)
+        missing = [name for name, obj in business_types.items() if obj is None]
+        if missing:
+            BusinessType.objects.bulk_create(
+                [BusinessType(business_type=name) for name in missing],
+                ignore_conflicts=True)
+            business_types = self.business_types.resolve(type_names)
+
+        owners = self.resolve(self.contractors, [
+            (number, self.get_value(number, record, 'owner'))
+            for number, record in records
+        ], 'contractor')
+
+        businesses = [
+            Business(
+                pk=self.get_int(number, record, 'id', required=False),
+                name=self.get_value(number, record, 'name'),
+                name_key=make_name_key(record['name']),
+                business_type=business_types[record['business_type']],
+                owner=owners[record['owner']],
+                description=record.get('description') or ''
+            )
+            for number, record in records
+        ]
+        bulk_insert(Business, businesses, self.batch_size)
+        get_search_backend().index(businesses)
+
+        return ['ranking']
+
+
+class EventImporter(Importer):
+    """Fields: ``id`` (optional), ``title``, ``date_from``, ``date_to`` (ISO
+    8601), ``owner`` (client username) and ``businesses`` (primary keys, a
+    list or separated with semicolons in CSV).
+    """
+
+    def import_chunk(self, records):
+        now = timezone.now()
+        owners = self.resolve(self.clients, [
+            (number, self.get_value(number, record, 'owner'))
+            for number, record in records
+        ], 'client')
+
+        events = []
+        bookings = []
+        for number, record in records:
+            event = Event(
+                pk=self.get_int(number, record, 'id', required=False),
+                title=self.get_value(number, record, 'title'),
+                date_from=self.get_datetime(number, record, 'date_from'),
+                date_to=self.get_datetime(number, record, 'date_to'),
+                owner=owners[record['owner']]
+            )
+            if event.date_to < event.date_from:
+                raise InvalidRecord(number, 'event ends before it starts.')
+            event.ended = event.date_to <= now
+            events.append(event)
+            bookings += [(number, event, business) for business
+                         in self.get_ints(number, record, 'businesses')]
+
+        self.check_exist(Business, [(number, business)
+                                    for number, _, business in bookings],
+                         'business')
+        bulk_insert(Event, events, self.batch_size)
+        Event.businesses.through.objects.bulk_create([
+            Event.businesses.through(event_id=event.pk, business_id=business)
+            for _, event, business in bookings
+        ], batch_size=self.batch_size)
+        OpinionEligibility.objects.credit_events(
+            (event.owner_id, business)
+            for _, event, business in bookings if event.ended)
+
+        return ['schedule:{}'.format(business)
+                for business in {business for _, _, business in bookings}]
+
+
+class OpinionImporter(Importer):
+    """Fields: ``id`` (optional), ``business`` (primary key), ``rating``,
+    ``text``, ``author`` (optional client username) and ``event`` (optional
+    primary key).
+    """
+
+    def import_chunk(self, records):
+        authors = self.resolve(self.clients, [
+            (number, self.get_value(number, record, 'author', required=False))
+            for number, record in records
+        ], 'client')
+
+        opinions = []
+        for number, record in records:
+            rating = self.get_int(number, record, 'rating')
+            if rating not in dict(Opinion.RATINGS):
+                raise InvalidRecord(number, 'invalid rating {}.'.format(
+                    rating))
+            author = self.get_value(number, record, 'author', required=False)
+            opinions.append((number, Opinion(
+                pk=self.get_int(number, record, 'id', required=False),
+                rating=rating,
+                text=self.get_value(number, record, 'text'),
+                business_id=self.get_int(number, record, 'business'),
+                author=authors.get(author),
+                event_id=self.get_int(number, record, 'event', required=False)
+            )))
+
+        self.check_exist(Business, [(number, opinion.business_id)
+                                    for number, opinion in opinions],
+                         'business')
+        self.check_exist(Event, [(number, opinion.event_id)
+                                 for number, opinion in opinions
+                                 if opinion.event_id is not None], 'event')
+        opinions = [opinion for _, opinion in opinions]
+        Opinion.objects.bulk_create(opinions, batch_size=self.batch_size)
+
+        ratings = collections.defaultdict(collections.Counter)
+        for opinion in opinions:
+            ratings[opinion.business_id][opinion.rating] += 1
+        for business, counts in ratings.items():
+            Business.objects.filter(pk=business).add_ratings(counts)
+
+        written = collections.Counter(
+            (opinion.author_id, opinion.business_id)
+            for opinion in opinions if opinion.author_id)
+        for (author, business), count in written.items():
+            OpinionEligibility.objects.credit_opinion(author, business, count)
+
+        return ['ranking'] + [
+            scope.format(business) for business in ratings
+            for scope in ('business:{}', 'opinions:{}')
+        ]
+
+
+IMPORTERS = {
+    'businesses': BusinessImporter,
+    'events': EventImporter,
+    'opinions': OpinionImporter,
+}
+
+
+def import_records(importer, records, source, chunk_size=1000, restart=False,
+                   progress=None):
+    """Imports ``records`` in chunks, each committed with a checkpoint.
+
+    A failed import run again with the same ``source`` skips the records
+    committed before the failure. Returns the number of imported records.
+    """
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source)
+    if restart:
+        checkpoint.records = 0
+    done = checkpoint.records
+    numbered = enumerate(itertools.islice(records, done, None), done + 1)
+
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            break
+
+        with transaction.atomic():
+            scopes = importer.import_chunk(chunk)
+            done += len(chunk)
+            ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                records=done)
+        bump_versions(*scopes)
+        if progress is not None:
+            progress(done)
+
+    imported = done - checkpoint.records
+    checkpoint.delete()
+    return imported
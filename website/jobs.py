@@ -0,0 +1,182 @@
+import concurrent.futures
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import time
+import traceback
+
+import django
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger('website.jobs')
+
+TASKS = {}
+
+
+def task(function):
+    """Registers ``function`` as a task; only tasks can be enqueued."""
+    TASKS['{}.{}'.format(function.__module__, function.__qualname__)] = function
+    return function
+
+
+def get_task(name):
+    if name not in TASKS:
+        # Importing the module registers its tasks.
+        import_string(name)
+    if name not in TASKS:
+        raise ValueError('{} is not a task.'.format(name))
+    return TASKS[name]
+
+
+def get_retry_delay(attempts):
+    """Seconds before attempt ``attempts + 1``: exponential with jitter."""
+    base = getattr(settings, 'JOB_RETRY_DELAY', 10)
+    delay = min(base * 2 ** (attempts - 1),
+                getattr(settings, 'JOB_MAX_RETRY_DELAY', 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def enqueue(function, kwargs=None, priority=0, delay=0, key=None,
+            max_attempts=None):
+    """Adds a call of the task ``function`` with JSON ``kwargs``.
+
+    Jobs with higher ``priority`` run first. A job with the ``key`` of an
+    earlier one is not added, and the earlier one is returned. Jobs are
+    saved in the current transaction, so they run only if it commits.
+    """
+    name = '{}.{}'.format(function.__module__, function.__qualname__)
+    if TASKS.get(name) is not function:
+        raise ValueError('{} is not a task.'.format(name))
+
+    job = Job(task=name, arguments=json.dumps(kwargs or {}),
+              priority=priority, idempotency_key=key,
+              run_at=timezone.now() + datetime.timedelta(seconds=delay),
+              max_attempts=max_attempts or getattr(
+                  settings, 'JOB_MAX_ATTEMPTS', 5))
+    if key is None:
+        job.save()
+        return job
+
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=key)
+    return job
+
+
+def run_job(pk):
+    """Runs the claimed job ``pk`` and records its outcome."""
+    job = Job.objects.get(pk=pk)
+    try:
+        get_task(job.task)(**json.loads(job.arguments))
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = get_retry_delay(job.attempts)
+            logger.warning('Job %s (%s) failed, retrying in %.0f s:\n%s',
+                           job.pk, job.task, delay, error)
+            Job.objects.filter(pk=pk).update(
+                status=Job.QUEUED, worker='', last_error=error,
+                run_at=now + datetime.timedelta(seconds=delay))
+        else:
+            logger.error('Job %s (%s) failed for good:\n%s', job.pk,
+                         job.task, error)
+            Job.objects.filter(pk=pk).update(
+                status=Job.FAILED, last_error=error, finished_at=now)
+        return False
+
+    Job.objects.filter(pk=pk).update(status=Job.DONE, finished_at=(
+        timezone.now()))
+    return True
+
+
+def _run_job_in_thread(pk):
+    try:
+        return run_job(pk)
+    finally:
+        # Pool threads outlive jobs; their connections are not reused.
+        connection.close()
+
+
+class Worker:
+    """Runs queued jobs on ``concurrency`` threads, or processes.
+
+    Jobs left running for ``stale_after`` seconds, as by a worker that was
+    killed, are queued again when the worker starts and every
+    ``requeue_interval`` seconds while it runs.
+    """
+    requeue_interval = 60
+
+    def __init__(self, concurrency=4, processes=False, poll_interval=1.0,
+                 stale_after=None, name=None):
+        self.concurrency = concurrency
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after or getattr(
+            settings, 'JOB_STALE_SECONDS', 3600)
+        self.name = name or '{}:{}'.format(socket.gethostname(), os.getpid())
+
+    def get_executor(self):
+        if self.processes:
+            # Spawned children set Django up afresh instead of sharing the
+            # parent's database connections.
+            return concurrent.futures.ProcessPoolExecutor(
+                self.concurrency, multiprocessing.get_context('spawn'),
+                initializer=django.setup), run_job
+        return concurrent.futures.ThreadPoolExecutor(
+            self.concurrency, thread_name_prefix='job'), _run_job_in_thread
+
+    def run(self, once=False, stop=None):
+        """Runs jobs until ``stop`` is set or, with ``once``, until none
+        is due. Returns the number of jobs run."""
+        executor, function = self.get_executor()
+        running = set()
+        count = 0
+        requeued_at = None
+        with executor:
+            while stop is None or not stop.is_set():
+                if (requeued_at is None or time.monotonic() - requeued_at
+                        >= self.requeue_interval):
+                    self.requeue_stale()
+                    requeued_at = time.monotonic()
+
+                free = self.concurrency - len(running)
+                claimed = Job.objects.claim(self.name, free) if free else []
+                running.update(executor.submit(function, pk)
+                               for pk in claimed)
+
+                if once and not claimed and not running:
+                    break
+                if not claimed or not free:
+                    done, running = concurrent.futures.wait(
+                        running, timeout=self.poll_interval,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        if future.exception() is not None:
+                            logger.error('Worker failed to run a job.',
+                                         exc_info=future.exception())
+                    count += len(done)
+                    if not done and not running:
+                        time.sleep(self.poll_interval)
+        return count + len(running)
+
+    def requeue_stale(self):
+        started_before = timezone.now() - datetime.timedelta(
+            seconds=self.stale_after)
+        failed = Job.objects.fail_stale(started_before)
+        if failed:
+            logger.error('Failed %s stale jobs out of attempts.', failed)
+        requeued = Job.objects.requeue_stale(started_before)
+        if requeued:
+            logger.warning('Requeued %s stale jobs.', requeued)
@@ -0,0 +1,336 @@
+import asyncio
+import collections
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+DEFAULT_BROKER = 'website.live.LocalBroker'
+SUBSCRIPTION_SIZE = 100
+# Milliseconds browsers wait before reconnecting a closed stream.
+RECONNECT_DELAY = 1000
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker():
+    """Returns the broker of ``LIVE_UPDATES_BROKER``, one per process."""
+    path = getattr(settings, 'LIVE_UPDATES_BROKER', DEFAULT_BROKER)
+    with _brokers_lock:
+        if path not in _brokers:
+            _brokers[path] = import_string(path)()
+        return _brokers[path]
+
+
+def business_channel(pk):
+    return 'business:{}'.format(pk)
+
+
+def make_event_id():
+    """Returns the id of a message published now, the time in microseconds.
+
+    Ids of messages and streams of one host compare in publishing order.
+    """
+    return int(time.time() * 1000000)
+
+
+def parse_event_id(value):
+    """Returns the id of a ``Last-Event-ID`` header, ``None`` without one
+    and 0, older than any, for one that is not ours."""
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def publish_bookings(action, event_pk, business_pks):
+    """Tells calendars of ``business_pks`` that a booking of the event
+    changed, once the transaction commits."""
+    channels = [business_channel(pk) for pk in business_pks]
+
+    def publish():
+        broker = get_broker()
+        message = {'action': action, 'event': event_pk,
+                   'id': make_event_id()}
+        for channel in channels:
+            broker.publish(channel, message)
+
+    if channels:
+        transaction.on_commit(publish)
+
+
+def format_message(message):
+    event_id = 'id: {}\n'.format(message['id']) if 'id' in message else ''
+    return '{}event: booking\ndata: {}\n\n'.format(event_id,
+                                                  json.dumps(message))
+
+
+def format_retry(reconnect_delay):
+    return 'retry: {}\n\n'.format(reconnect_delay)
+
+
+HEARTBEAT = ':\n\n'
+
+
+def format_start(broker, channel, last_event_id):
+    """Returns the first event of a stream of ``channel``, subscribed to
+    already.
+
+    It gives the browser an id to send back as ``Last-Event-ID`` when it
+    reconnects. If messages may have been published since the one it sent,
+    it is a ``missed`` booking message, which reloads the calendar.
+    """
+    event_id = make_event_id()
+    if last_event_id is not None and broker.changed_since(channel,
+                                                          last_event_id):
+        return format_message({'action': 'missed', 'id': event_id})
+    return 'id: {}\n\n'.format(event_id)
+
+
+def stream(channel, seconds=None, reconnect_delay=RECONNECT_DELAY,
+           last_event_id=None):
+    """Yields the messages of ``channel`` as Server-Sent Events.
+
+    Comments are sent every ``LIVE_UPDATES_HEARTBEAT_SECONDS`` to keep idle
+    connections open through proxies. The stream ends after ``seconds``,
+    ``LIVE_UPDATES_STREAM_SECONDS`` by default, and browsers reconnect
+    ``reconnect_delay`` milliseconds later, sending ``last_event_id``.
+    """
+    heartbeat = getattr(settings, 'LIVE_UPDATES_HEARTBEAT_SECONDS', 15)
+    if seconds is None:
+        seconds = getattr(settings, 'LIVE_UPDATES_STREAM_SECONDS', 300)
+    end = time.monotonic() + seconds
+    broker = get_broker()
+    subscription = broker.subscribe(channel)
+    try:
+        yield format_retry(reconnect_delay)
+        yield format_start(broker, channel, last_event_id)
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            message = subscription.get(min(heartbeat, remaining))
+            yield HEARTBEAT if message is None else format_message(message)
+    finally:
+        subscription.close()
+
+
+async def stream_async(channel, last_event_id=None):
+    """Like ``stream``, but waits for messages without holding a thread."""
+    heartbeat = getattr(settings, 'LIVE_UPDATES_HEARTBEAT_SECONDS', 15)
+    end = time.monotonic() + getattr(settings, 'LIVE_UPDATES_STREAM_SECONDS',
+                                     300)
+    broker = get_broker()
+    subscription = broker.subscribe(channel, AsyncSubscription)
+    try:
+        yield format_retry(RECONNECT_DELAY)
+        yield format_start(broker, channel, last_event_id)
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            message = await subscription.get(min(heartbeat, remaining))
+            yield HEARTBEAT if message is None else format_message(message)
+    finally:
+        subscription.close()
+
+
+class Subscription:
+    """Messages of one channel for one listener.
+
+    When the listener falls ``SUBSCRIPTION_SIZE`` messages behind, newer
+    messages are dropped; they only tell it to reload.
+    """
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(SUBSCRIPTION_SIZE)
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            pass
+
+    def get(self, timeout):
+        """Returns the next message, or ``None`` after ``timeout`` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    """Subscription read by a coroutine of the event loop it was made on.
+
+    Brokers put messages from other threads, so they are handed to the
+    loop's thread.
+    """
+
+    def __init__(self, broker, channel):
+        super().__init__(broker, channel)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(SUBSCRIPTION_SIZE)
+
+    def put(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop closed; so did the stream.
+            pass
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """Publishes messages to the subscribers of the same process.
+
+    The id of the last message of every channel is kept, from ``since``
+    on, for ``changed_since``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = collections.defaultdict(set)
+        self.since = make_event_id()
+        self.last_ids = {}
+
+    def subscribe(self, channel, subscription_class=Subscription):
+        subscription = subscription_class(self, channel)
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions[subscription.channel]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.channel]
+
+    def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        with self.lock:
+            if 'id' in message:
+                self.last_ids[channel] = max(message['id'],
+                                             self.last_ids.get(channel, 0))
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def changed_since(self, channel, event_id):
+        """Whether a message of ``channel`` may have been published since
+        the message or stream ``event_id``."""
+        with self.lock:
+            return (event_id < self.since
+                    or self.last_ids.get(channel, 0) >= event_id)
+
+
+class FileBroker(LocalBroker):
+    """Publishes messages to the processes of one host through a file.
+
+    Messages are appended to ``LIVE_UPDATES_PATH`` as JSON lines, and a
+    thread per process follows the file and dispatches them locally. By
+    default the file is eventplanner-live.jsonl in the temporary directory.
+    Once it reaches ``max_size`` bytes it is removed and a new one started;
+    followers read the old file, still open, to its end first.
+    """
+    poll_interval = 0.25
+    max_size = 1024 * 1024
+
+    def __init__(self):
+        super().__init__()
+        self.path = getattr(settings, 'LIVE_UPDATES_PATH', None) or (
+            os.path.join(tempfile.gettempdir(), 'eventplanner-live.jsonl'))
+        self.follower_pid = None
+
+    def subscribe(self, channel, subscription_class=Subscription):
+        with self.lock:
+            # Threads do not survive a fork, so every process starts its own.
+            if self.follower_pid != os.getpid():
+                self.follower_pid = os.getpid()
+                # Earlier messages of the file are not dispatched.
+                self.since = make_event_id()
+                threading.Thread(target=self.follow, args=(self._open(),),
+                                 daemon=True).start()
+        return super().subscribe(channel, subscription_class)
+
+    def publish(self, channel, message):
+        # One write per message keeps lines of processes whole.
+        with open(self.path, 'a', encoding='utf-8') as messages:
+            messages.write(json.dumps([channel, message]) + '\n')
+            size = messages.tell()
+        if size >= self.max_size:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                # Another process started a new file first.
+                pass
+
+    def _open(self, from_start=False):
+        """Returns the current file, at its end unless ``from_start``, or
+        ``None`` before any message is published."""
+        try:
+            messages = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        if not from_start:
+            messages.seek(0, os.SEEK_END)
+        return messages
+
+    def _is_replaced(self, messages):
+        try:
+            return os.stat(self.path).st_ino != os.fstat(
+                messages.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def follow(self, messages):
+        while True:
+            if messages is None:
+                messages = self._open(from_start=True)
+            if messages is not None:
+                # Checked first, so lines written before a new file started
+                # are read below.
+                replaced = self._is_replaced(messages)
+                self._dispatch_lines(messages)
+                if replaced:
+                    messages.close()
+                    messages = None
+                    continue
+            time.sleep(self.poll_interval)
+
+    def _dispatch_lines(self, messages):
+        while True:
+            start = messages.tell()
+            line = messages.readline()
+            if not line.endswith(b'\n'):
+                # Not written yet, or only partly.
+                messages.seek(start)
+                return
+            self.dispatch(*json.loads(line.decode()))
@@ -0,0 +1,274 @@
+import collections
+import concurrent.futures
+import datetime
+import http.cookiejar
+import queue
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.urls import reverse
+
+from .models import Business, Event
+from .querylog import percentile
+
+TIMEOUT = 30
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Leaves redirects to the caller, so every request is timed alone."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Session:
+    """Cookie-keeping HTTP client of one user of a running server."""
+
+    def __init__(self, base_url, username=None, password=None):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    @property
+    def is_logged_in(self):
+        return any(cookie.name == 'sessionid' for cookie in self.cookies)
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data):
+        token = next((cookie.value for cookie in self.cookies
+                      if cookie.name == 'csrftoken'), '')
+        data = dict(data, csrfmiddlewaretoken=token)
+        return self._open(urllib.request.Request(
+            self.base_url + path,
+            data=urllib.parse.urlencode(data, doseq=True).encode(),
+            headers={'Referer': self.base_url + path}))
+
+    def _open(self, request):
+        """Returns the status code, raising ``OSError`` if there is none."""
+        try:
+            with self.opener.open(request, timeout=TIMEOUT) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+
+class Action:
+    """One request of a load test, sent by a user of ``role``.
+
+    ``function`` takes the session and the load test and returns the path
+    and, for a POST, its data. Responses with other than ``expected``
+    statuses are errors.
+    """
+
+    def __init__(self, url_name, role, function, expected=(200,)):
+        self.url_name = url_name
+        self.role = role
+        self.function = function
+        self.expected = expected
+
+
+def _page(url_name):
+    return lambda session, test: (reverse('website:' + url_name), None)
+
+
+def _business_page(url_name):
+    return lambda session, test: (reverse('website:' + url_name, kwargs={
+        'pk': test.random.choice(test.businesses)}), None)
+
+
+def _schedule(session, test):
+    start = int(time.time() * 1000)
+    return '{}?from={}&to={}'.format(
+        reverse('website:business_schedule',
+                kwargs={'pk': test.random.choice(test.businesses)}),
+        start, start + 31 * 24 * 3600 * 1000), None
+
+
+def _event_data(test, title):
+    # Far future dates in fine steps rarely collide with other bookings.
+    date_from = datetime.datetime(2100, 1, 1) + datetime.timedelta(
+        minutes=test.random.randrange(50 * 365 * 24) * 60)
+    return {
+        'title': title,
+        'date_from': date_from.strftime('%Y-%m-%d %H:%M:%S'),
+        'date_to': (date_from + datetime.timedelta(hours=1)).strftime(
+            '%Y-%m-%d %H:%M:%S'),
+        'businesses': [test.random.choice(test.businesses)],
+    }
+
+
+def _add_event(session, test):
+    return reverse('website:add_event'), _event_data(test, 'Load test event')
+
+
+def _edit_event(session, test):
+    events = test.events.get(session.username)
+    if not events:
+        return _add_event(session, test)
+    return (reverse('website:edit_event',
+                    kwargs={'pk': test.random.choice(events)}),
+            _event_data(test, 'Edited load test event'))
+
+
+def _add_opinion(session, test):
+    return (reverse('website:add_opinion',
+                    kwargs={'pk': test.random.choice(test.businesses)}),
+            {'text': 'Load test opinion.', 'rating': test.random.randint(1, 5)})
+
+
+ACTIONS = collections.OrderedDict([
+    ('businesses', Action('businesses', None, _page('businesses'))),
+    ('ranking', Action('ranking', None, _page('ranking'))),
+    ('business', Action('business', None, _business_page('business'))),
+    ('opinion', Action('opinion', None, _business_page('opinion'))),
+    ('business_schedule', Action('business_schedule', None, _schedule)),
+    ('events', Action('events', 'client', _page('events'))),
+    ('add_event', Action('add_event', 'client', _add_event, (302,))),
+    ('edit_event', Action('edit_event', 'client', _edit_event, (302,))),
+    # Without an ended event at the business, the view redirects too.
+    ('add_opinion', Action('add_opinion', 'client', _add_opinion, (302,))),
+    ('main', Action('main', 'contractor', _page('main'))),
+])
+DEFAULT_MIX = {
+    'businesses': 20, 'ranking': 15, 'business': 25, 'opinion': 10,
+    'business_schedule': 10, 'events': 6, 'add_event': 2, 'edit_event': 2,
+    'add_opinion': 2, 'main': 8,
+}
+
+
+class Results:
+    """Latencies and errors per URL name, safe to add to from threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.defaultdict(collections.Counter)
+
+    def add(self, url_name, latency, error=None):
+        with self.lock:
+            self.latencies[url_name].append(latency)
+            if error is not None:
+                self.errors[url_name][str(error)] += 1
+
+    def summary(self):
+        stats = collections.OrderedDict()
+        for url_name in sorted(self.latencies):
+            values = sorted(self.latencies[url_name])
+            errors = sum(self.errors[url_name].values())
+            stats[url_name] = {
+                'requests': len(values),
+                'errors': errors,
+                'error_rate': errors / len(values),
+                'error_kinds': dict(self.errors[url_name]),
+                'p50_ms': percentile(values, 0.5) * 1000,
+                'p90_ms': percentile(values, 0.9) * 1000,
+                'p99_ms': percentile(values, 0.99) * 1000,
+                'max_ms': values[-1] * 1000,
+            }
+        return stats
+
+
+class LoadTest:
+    """Sends a weighted mix of actions to a server at a fixed rate.
+
+    Requests are started on schedule whether or not earlier ones finished,
+    and latency counts from the scheduled start, so a saturated server
+    shows up as growing latency instead of a lower rate.
+    """
+
+    def __init__(self, base_url, mix=None, rps=10, workers=10, users=10,
+                 password='', seed=None):
+        self.base_url = base_url
+        self.mix = {name: weight for name, weight in (
+            mix or DEFAULT_MIX).items() if weight > 0}
+        self.rps = rps
+        self.workers = workers
+        self.password = password
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.results = Results()
+
+        self.businesses = list(Business.objects.order_by('?').values_list(
+            'pk', flat=True)[:1000])
+        if not self.businesses:
+            raise ValueError('There are no businesses to request.')
+
+        self.sessions = {}
+        self.events = collections.defaultdict(list)
+        for role in {ACTIONS[name].role for name in self.mix} - {None}:
+            usernames = ['{}{}'.format(role, index) for index in range(users)]
+            self.sessions[role] = queue.Queue()
+            for username in usernames:
+                self.sessions[role].put(Session(base_url, username, password))
+            if role == 'client':
+                for username, pk in Event.objects.filter(
+                        owner__user__username__in=usernames).values_list(
+                        'owner__user__username', 'pk'):
+                    self.events[username].append(pk)
+        self.anonymous = Session(base_url)
+
+    def run(self, duration):
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        start = time.perf_counter()
+        total = int(duration * self.rps)
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            for index in range(total):
+                scheduled = start + index / self.rps
+                time.sleep(max(scheduled - time.perf_counter(), 0))
+                with self.random_lock:
+                    action = ACTIONS[self.random.choices(names, weights)[0]]
+                executor.submit(self.send, action, scheduled)
+        return self.results.summary()
+
+    def send(self, action, scheduled):
+        if action.role is None:
+            self._send(action, self.anonymous, scheduled)
+            return
+
+        sessions = self.sessions[action.role]
+        session = sessions.get()
+        try:
+            if not session.is_logged_in:
+                self.login(session)
+            self._send(action, session, scheduled)
+        finally:
+            sessions.put(session)
+
+    def login(self, session):
+        path = reverse('website:login')
+        start = time.perf_counter()
+        try:
+            session.get(path)
+            status = session.post(path, {'username': session.username,
+                                         'password': session.password})
+        except OSError as error:
+            self.results.add('login', time.perf_counter() - start, error)
+            return
+        self.results.add('login', time.perf_counter() - start,
+                         None if session.is_logged_in else status)
+
+    def _send(self, action, session, scheduled):
+        # The random generator is shared by all threads.
+        with self.random_lock:
+            path, data = action.function(session, self)
+        try:
+            status = (session.get(path) if data is None
+                      else session.post(path, data))
+        except OSError as exception:
+            error = type(exception).__name__
+        else:
+            error = None if status in action.expected else status
+        self.results.add(action.url_name, time.perf_counter() - scheduled,
+                         error)
@@ -0,0 +1,90 @@
+import datetime
+import json
+import platform
+import sqlite3
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from website.benchmarks import BENCHMARKS, run
+from website.datasets import Scale, count_rows, generate
+
+
+class Command(BaseCommand):
+    help = ('Times the model methods and view querysets of the hot pages and '
+            'writes the results as JSON. With --scales every scale is '
+            'generated in a throwaway test database; otherwise the default '
+            'database is measured as it is.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', metavar='N',
+                            help='Business counts of the datasets to '
+                                 'generate.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per benchmark.')
+        parser.add_argument('--case', action='append', dest='cases',
+                            choices=list(BENCHMARKS),
+                            help='Benchmark to run, by default all.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--label', default='',
+                            help='Name of the run, e.g. a commit.')
+        parser.add_argument('--output',
+                            help='File to write, by default standard output.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be positive.')
+
+        if options['scales']:
+            runs = [self.run_scale(scale, options)
+                    for scale in options['scales']]
+        else:
+            runs = [self.run_benchmarks(None, options)]
+
+        report = json.dumps({
+            'label': options['label'],
+            'created': datetime.datetime.now(
+                datetime.timezone.utc).isoformat(),
+            'versions': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+            },
+            'database': connection.vendor,
+            'runs': runs,
+        }, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def run_scale(self, businesses, options):
+        scale = Scale(businesses)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            generate(scale, seed=options['seed'])
+            return self.run_benchmarks(scale, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_benchmarks(self, scale, options):
+        try:
+            results = run(options['repeat'], options['cases'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        if options['verbosity'] > 1:
+            for name, result in results.items():
+                self.stderr.write('{:<32} {:>10.2f} ms median {:>4} '
+                                  'queries'.format(name,
+                                                   result['median'] * 1000,
+                                                   result['queries']))
+        return {
+            'scale': scale.as_dict() if scale else None,
+            'rows': count_rows(),
+            'results': results,
+        }
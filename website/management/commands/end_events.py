@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from website.models import Event
+
+
+class Command(BaseCommand):
+    help = ('Marks past events as ended, allowing their clients to review '
+            'the booked businesses. Meant to run periodically.')
+
+    def handle(self, *args, **options):
+        ended = Event.objects.end_past()
+        self.stdout.write(self.style.SUCCESS(
+            'Ended {} events.'.format(ended)))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from website.exports import CHUNK_SIZE, FORMATS, export_events
+from website.models import Business, Client, Event
+
+
+class Command(BaseCommand):
+    help = ('Exports the events of a client or the schedule of a business '
+            'as CSV or iCalendar.')
+
+    def add_arguments(self, parser):
+        owner = parser.add_mutually_exclusive_group(required=True)
+        owner.add_argument('--client', metavar='USERNAME',
+                           help='Export the events of this client.')
+        owner.add_argument('--business', metavar='PK', type=int,
+                           help='Export the schedule of this business.')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', metavar='PATH',
+                            help='Write to this file instead of stdout.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Events read per query.')
+
+    def handle(self, *args, **options):
+        if options['client'] is not None:
+            client = Client.objects.filter(
+                user__username=options['client']).first()
+            if client is None:
+                raise CommandError('Unknown client {}.'.format(
+                    options['client']))
+            events = Event.objects.filter(owner=client)
+            name = 'Events of {}'.format(options['client'])
+            with_businesses = True
+        else:
+            business = Business.objects.filter(
+                pk=options['business']).only('name').first()
+            if business is None:
+                raise CommandError('Unknown business {}.'.format(
+                    options['business']))
+            events = Event.objects.filter(businesses=business)
+            name = 'Schedule of {}'.format(business.name)
+            with_businesses = False
+
+        chunks = export_events(events, options['format'], name,
+                               with_businesses=with_businesses,
+                               chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from website.models import User
+from website.thumbnails import has_thumbnails, render_thumbnails_now
+
+
+class Command(BaseCommand):
+    help = 'Renders missing avatar thumbnails of all users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Render thumbnails even if they exist.')
+
+    def handle(self, *args, **options):
+        names = User.objects.exclude(avatar='').order_by().values_list(
+            'avatar', flat=True).distinct()
+
+        rendered = 0
+        for name in names.iterator():
+            if options['force'] or not has_thumbnails(name):
+                render_thumbnails_now(name)
+                rendered += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            'Rendered thumbnails of {} avatars.'.format(rendered)))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from website.datasets import DEFAULT_PASSWORD, Scale, generate
+
+
+class Command(BaseCommand):
+    help = ('Adds a synthetic dataset of contractors, clients, businesses, '
+            'events and opinions. Other counts default to multiples of the '
+            'business count.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('businesses', type=int)
+        parser.add_argument('--contractors', type=int)
+        parser.add_argument('--clients', type=int)
+        parser.add_argument('--events', type=int)
+        parser.add_argument('--opinions', type=int)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows committed per transaction.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD,
+                            help='Password of the generated users.')
+
+    def handle(self, *args, **options):
+        if options['businesses'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('Business count and --chunk-size must be '
+                               'positive.')
+
+        self.verbosity = options['verbosity']
+        scale = Scale(options['businesses'], options['contractors'],
+                      options['clients'], options['events'],
+                      options['opinions'])
+        generate(scale, seed=options['seed'],
+                 chunk_size=options['chunk_size'],
+                 password=options['password'], progress=self.report)
+        self.stdout.write(self.style.SUCCESS('Generated {} businesses.'.format(
+            scale.businesses)))
+
+    def report(self, name, count):
+        if self.verbosity > 1:
+            self.stdout.write('{} {} added.'.format(count, name))
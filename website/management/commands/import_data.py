@@ -0,0 +1,53 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from website.imports import FORMATS, IMPORTERS, import_records, read_records
+
+
+class Command(BaseCommand):
+    help = ('Imports businesses, events or opinions from a CSV or JSON Lines '
+            'file in chunks. An interrupted import run again with the same '
+            'file resumes after the last committed chunk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format, by default taken from the '
+                                 'file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Records committed per transaction.')
+        parser.add_argument('--batch-size', type=int,
+                            help='Rows per INSERT statement.')
+        parser.add_argument('--checkpoint',
+                            help='Name of the resume checkpoint, by default '
+                                 'the kind and absolute path.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint of a previous run.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        source = options['checkpoint'] or '{}:{}'.format(
+            options['kind'], os.path.abspath(options['path']))
+        importer = IMPORTERS[options['kind']](options['batch_size'])
+        self.verbosity = options['verbosity']
+
+        try:
+            imported = import_records(
+                importer, read_records(options['path'], options['format']),
+                source, chunk_size=options['chunk_size'],
+                restart=options['restart'], progress=self.report)
+        except (OSError, ValueError, IntegrityError) as error:
+            raise CommandError(
+                'Import stopped, run again to resume: {}'.format(error))
+
+        self.stdout.write(self.style.SUCCESS('Imported {} {}.'.format(
+            imported, options['kind'])))
+
+    def report(self, done):
+        if self.verbosity > 1:
+            self.stdout.write('{} records committed.'.format(done))
@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.datasets import DEFAULT_PASSWORD
+from website.loadtest import ACTIONS, DEFAULT_MIX, LoadTest
+
+
+def parse_mix(values):
+    mix = dict(DEFAULT_MIX)
+    for value in values:
+        name, _, weight = value.partition('=')
+        if name not in ACTIONS:
+            raise CommandError('Unknown action {!r}, choose from {}.'.format(
+                name, ', '.join(ACTIONS)))
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError('Weight of {} must be a number.'.format(name))
+    return mix
+
+
+class Command(BaseCommand):
+    help = ('Sends a mix of anonymous, client and contractor requests to a '
+            'running server at a target rate and reports latency '
+            'percentiles and error rates per URL name. Users log in as the '
+            'client<n> and contractor<n> users of generate_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Base URL, e.g. http://localhost:8000')
+        parser.add_argument('--rps', type=float, default=10,
+                            help='Requests started per second.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Seconds to send requests for.')
+        parser.add_argument('--workers', type=int, default=10,
+                            help='Requests in flight at most.')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Logged in users per role.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--mix', action='append', default=[],
+                            metavar='ACTION=WEIGHT',
+                            help='Weight of an action, 0 leaves it out. '
+                                 'Actions: {}.'.format(', '.join(ACTIONS)))
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--output', help='File to write results as JSON.')
+
+    def handle(self, *args, **options):
+        if min(options['rps'], options['duration'], options['workers'],
+               options['users']) <= 0:
+            raise CommandError('--rps, --duration, --workers and --users '
+                               'must be positive.')
+
+        try:
+            test = LoadTest(options['url'], parse_mix(options['mix']),
+                            rps=options['rps'], workers=options['workers'],
+                            users=options['users'],
+                            password=options['password'], seed=options['seed'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        stats = test.run(options['duration'])
+
+        self.stdout.write('{:<20} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9}'.format(
+            'url name', 'requests', 'errors', 'p50 ms', 'p90 ms', 'p99 ms',
+            'max ms'))
+        for url_name, row in stats.items():
+            self.stdout.write(
+                '{:<20} {requests:>8} {error_rate:>7.1%} {p50_ms:>9.1f} '
+                '{p90_ms:>9.1f} {p99_ms:>9.1f} {max_ms:>9.1f}'.format(
+                    url_name, **row))
+            for kind, count in sorted(row['error_kinds'].items()):
+                self.stdout.write('    {} x {}'.format(count, kind))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump({'options': {
+                    key: options[key] for key in (
+                        'url', 'rps', 'duration', 'workers', 'users', 'mix')
+                }, 'results': stats}, output, indent=2)
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from website.models import Business, Opinion
+
+
+def compute_rating_aggregates():
+    histogram = {
+        'rating_{}_count'.format(rating): Count('pk', filter=Q(rating=rating))
+        for rating, _ in Opinion.RATINGS
+    }
+    rows = Opinion.objects.order_by().values('business').annotate(
+        opinion_count=Count('pk'), rating_sum=Sum('rating'), **histogram)
+
+    aggregates = {}
+    for row in rows:
+        business_id = row.pop('business')
+        row['average_rating'] = row['rating_sum'] / row['opinion_count']
+        aggregates[business_id] = row
+
+    return aggregates
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds stored business rating aggregates from opinions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report businesses with stale aggregates, '
+                 'without fixing them.')
+
+    def handle(self, *args, **options):
+        empty = {field: 0 for field in Business.RATING_FIELDS}
+        empty['average_rating'] = None
+
+        with transaction.atomic():
+            aggregates = compute_rating_aggregates()
+            stale = {}
+            for business in Business.objects.only(
+                    *Business.RATING_FIELDS).iterator():
+                expected = aggregates.get(business.pk, empty)
+                if any(getattr(business, field) != value
+                       for field, value in expected.items()):
+                    stale[business.pk] = expected
+
+            if options['check']:
+                if stale:
+                    raise CommandError(
+                        '{} businesses have stale rating aggregates: {}'.format(
+                            len(stale), ', '.join(map(str, sorted(stale)))))
+                self.stdout.write('All rating aggregates are up to date.')
+                return
+
+            for business_id, expected in stale.items():
+                Business.objects.filter(pk=business_id).update(**expected)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt rating aggregates of {} businesses.'.format(len(stale))))
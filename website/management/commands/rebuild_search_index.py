@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the business search index from the database.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            get_search_backend().rebuild()
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt business search index.'))
@@ -0,0 +1,49 @@
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = ('Runs jobs of the database queue on a pool of threads or, with '
+            '--processes, of processes. Start one per host; workers on '
+            'several hosts share the queue.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Jobs run at once.')
+        parser.add_argument('--processes', action='store_true',
+                            help='Run jobs in processes instead of threads, '
+                                 'for CPU bound tasks.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between looks at an idle queue.')
+        parser.add_argument('--stale-after', type=float,
+                            help='Seconds after which running jobs of dead '
+                                 'workers are queued again. Defaults to '
+                                 'JOB_STALE_SECONDS.')
+        parser.add_argument('--once', action='store_true',
+                            help='Stop when no job is due.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] <= 0 or options['poll_interval'] <= 0:
+            raise CommandError('--concurrency and --poll-interval must be '
+                               'positive.')
+        self.verbosity = options['verbosity']
+
+        worker = Worker(options['concurrency'], options['processes'],
+                        options['poll_interval'], options['stale_after'])
+        if self.verbosity > 1:
+            self.stdout.write('Worker {} running {} jobs at once.'.format(
+                worker.name, worker.concurrency))
+
+        stop = threading.Event()
+        try:
+            count = worker.run(once=options['once'], stop=stop)
+        except KeyboardInterrupt:
+            # Running jobs are left to finish by the executor's shutdown.
+            stop.set()
+            self.stdout.write('Stopped.')
+            return
+        if self.verbosity:
+            self.stdout.write('Ran {} jobs.'.format(count))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from website.querylog import aggregate, get_log_path, read_log
+
+SORT_KEYS = ('total_ms', 'p95_ms', 'count')
+
+
+class Command(BaseCommand):
+    help = ('Prints the query fingerprints with the most time spent in the '
+            'query log written by QueryLogMiddleware.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path',
+                            help='Query log to read, by default '
+                                 'QUERY_LOG_PATH.')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--sort', choices=SORT_KEYS, default='total_ms')
+
+    def handle(self, *args, **options):
+        path = options['path'] or get_log_path()
+        if not path:
+            raise CommandError('Set QUERY_LOG_PATH or pass --path.')
+
+        try:
+            stats = aggregate(read_log(path))
+        except FileNotFoundError:
+            raise CommandError('No query log at {}.'.format(path))
+
+        stats.sort(key=lambda row: row[options['sort']], reverse=True)
+        for row in stats[:options['limit']]:
+            self.stdout.write(
+                '{count:>8} queries {total_ms:>10.1f} ms total '
+                '{p95_ms:>8.1f} ms p95  {view} at {origin}\n'
+                '    {fingerprint}'.format(**row))
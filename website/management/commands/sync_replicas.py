@@ -0,0 +1,37 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from website.routers import PRIMARY, get_replicas
+
+
+class Command(BaseCommand):
+    help = ('Copies the SQLite primary database onto every SQLite replica in '
+            'DATABASE_REPLICAS, for trying replica reads locally. Real '
+            'replicas are kept up to date by the database server.')
+
+    def handle(self, *args, **options):
+        primary = connections[PRIMARY].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The primary database is not SQLite.')
+        if not get_replicas():
+            raise CommandError('DATABASE_REPLICAS is empty.')
+
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in get_replicas():
+                replica = connections[alias].settings_dict
+                if replica['ENGINE'] != primary['ENGINE']:
+                    raise CommandError('Replica {} is not SQLite.'.format(
+                        alias))
+                connections[alias].close()
+                target = sqlite3.connect(replica['NAME'])
+                try:
+                    # The online backup API copies a consistent snapshot.
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write('Copied {} to {}.'.format(PRIMARY, alias))
+        finally:
+            source.close()
@@ -0,0 +1,277 @@
+import collections
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+_registry = []
+
+
+def get_metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'eventplanner-metrics')
+
+
+class MmapedValues:
+    """File of named float values, written by one process, read by any.
+
+    Entries are a 4 byte key length, the key, padding to 8 bytes and an 8
+    byte value. The header holds the number of bytes in use, updated after
+    an entry is complete, so readers never see a partial one.
+    """
+    header = struct.Struct('<I4x')
+    initial_size = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.positions = {}
+        self.file = open(path, 'a+b')
+        if os.path.getsize(path) < self.initial_size:
+            self.file.truncate(self.initial_size)
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+        self.used = self.header.unpack_from(self.mmap, 0)[0]
+        if not self.used:
+            self.used = self.header.size
+            self.header.pack_into(self.mmap, 0, self.used)
+        for key, value, position in self.read_entries(self.mmap, self.used):
+            self.positions[key] = position
+
+    @classmethod
+    def read_entries(cls, data, used=None):
+        if used is None:
+            used = cls.header.unpack_from(data, 0)[0]
+        position = cls.header.size
+        while position < used:
+            length = struct.unpack_from('<I', data, position)[0]
+            key = bytes(data[position + 4:position + 4 + length]).decode()
+            position += 4 + length + (-(4 + length) % 8)
+            yield key, struct.unpack_from('<d', data, position)[0], position
+            position += 8
+
+    def add(self, key, amount):
+        position = self.positions.get(key)
+        if position is None:
+            position = self._append(key)
+        value = struct.unpack_from('<d', self.mmap, position)[0]
+        struct.pack_into('<d', self.mmap, position, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode()
+        padding = -(4 + len(encoded)) % 8
+        size = 4 + len(encoded) + padding + 8
+        while self.used + size > len(self.mmap):
+            self._grow()
+
+        struct.pack_into('<I{}s{}xd'.format(len(encoded), padding), self.mmap,
+                         self.used, len(encoded), encoded, 0.0)
+        position = self.used + size - 8
+        self.used += size
+        self.header.pack_into(self.mmap, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def _grow(self):
+        size = len(self.mmap) * 2
+        self.mmap.close()
+        self.file.truncate(size)
+        self.mmap = mmap.mmap(self.file.fileno(), 0)
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+
+class _Store:
+    """The values file of the current process, reopened after a fork."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = None
+        self.pid = None
+        self.directory = None
+
+    def add(self, key, amount):
+        with self.lock:
+            directory = get_metrics_dir()
+            if (self.values is None or self.pid != os.getpid()
+                    or self.directory != directory):
+                self._open(directory)
+            self.values.add(key, amount)
+
+    def _open(self, directory):
+        if self.values is not None and self.pid == os.getpid():
+            self.values.close()
+        os.makedirs(directory, exist_ok=True)
+        self.pid = os.getpid()
+        self.directory = directory
+        self.values = MmapedValues(os.path.join(
+            directory, 'metrics-{}.db'.format(self.pid)))
+
+
+_store = _Store()
+
+
+def _make_key(name, suffix, labels):
+    return json.dumps([name, suffix, sorted(labels.items())])
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _check_labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError('{} takes labels {}, not {}.'.format(
+                self.name, ', '.join(self.labelnames), ', '.join(labels)))
+        return {key: str(value) for key, value in labels.items()}
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        _store.add(_make_key(self.name, '_total',
+                             self._check_labels(labels)), amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        labels = self._check_labels(labels)
+        for bound in self.buckets:
+            if value <= bound:
+                _store.add(_make_key(self.name, '_bucket', dict(
+                    labels, le=_format_value(bound))), 1)
+        _store.add(_make_key(self.name, '_sum', labels), value)
+        _store.add(_make_key(self.name, '_count', labels), 1)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_dead_process_files():
+    """Removes the values files of processes that are no longer running.
+
+    Their counts leave the totals, which Prometheus reads as a counter
+    reset. Returns the removed paths.
+    """
+    removed = []
+    for path in glob.glob(os.path.join(get_metrics_dir(), 'metrics-*.db')):
+        pid = os.path.basename(path)[len('metrics-'):-len('.db')]
+        if not pid.isdigit() or _is_running(int(pid)):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Another starting process removed it first.
+            continue
+        removed.append(path)
+    return removed
+
+
+def collect():
+    """Sums the values of every process in the metrics directory."""
+    totals = collections.defaultdict(float)
+    for path in glob.glob(os.path.join(get_metrics_dir(), 'metrics-*.db')):
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < MmapedValues.header.size:
+            continue
+        for key, value, _ in MmapedValues.read_entries(data):
+            totals[key] += value
+
+    samples = collections.defaultdict(list)
+    for key, value in totals.items():
+        name, suffix, labels = json.loads(key)
+        samples[name].append((suffix, labels, value))
+    return samples
+
+
+def render():
+    """Returns all metrics in the Prometheus text exposition format."""
+    samples = collect()
+    lines = []
+    for metric in _registry:
+        lines.append('# HELP {} {}'.format(
+            metric.name, metric.documentation.replace('\\', '\\\\')))
+        lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+        for suffix, labels, value in sorted(
+                samples.get(metric.name, ()),
+                key=lambda sample: _sort_key(*sample[:2])):
+            lines.append('{}{}{} {}'.format(metric.name, suffix,
+                                            _format_labels(labels),
+                                            _format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+
+def _sort_key(suffix, labels):
+    labels = dict(labels)
+    bound = labels.pop('le', None)
+    return (sorted(labels.items()), suffix,
+            float(bound) if bound is not None else 0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(key, value.replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels))
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REQUEST_DURATION = Histogram(
+    'website_http_request_duration_seconds',
+    'Time spent handling requests.', ['url_name', 'method'])
+RESPONSES = Counter(
+    'website_http_responses', 'Responses sent.', ['url_name', 'status'])
+REQUEST_QUERIES = Histogram(
+    'website_db_queries_per_request', 'SQL queries run per request.',
+    ['url_name'], buckets=QUERY_COUNT_BUCKETS)
+REQUEST_QUERY_DURATION = Histogram(
+    'website_db_query_duration_seconds_per_request',
+    'Time spent in SQL queries per request.', ['url_name'])
+PAGE_CACHE_LOOKUPS = Counter(
+    'website_page_cache_lookups', 'Page cache lookups by result.',
+    ['page', 'result'])
+EVENTS_CREATED = Counter('website_events_created', 'Events created.')
+OPINIONS_ADDED = Counter('website_opinions_added', 'Opinions added.')
+REGISTRATIONS = Counter(
+    'website_registrations', 'Client and contractor registrations.',
+    ['role'])
@@ -0,0 +1,170 @@
+import contextlib
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+from .querylog import QueryRecorder
+from .timing import RequestTiming
+
+logger = logging.getLogger('website.timing')
+
+
+def get_sample_rate(setting):
+    return getattr(settings, setting, 0.0)
+
+
+def is_sampled(setting):
+    sample_rate = get_sample_rate(setting)
+    return bool(sample_rate) and random.random() < sample_rate
+
+
+@contextlib.contextmanager
+def wrap_queries(wrapper):
+    """Installs an execute wrapper on every database connection."""
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class ServerTimingMiddleware:
+    """Times a sample of requests and reports it in a ``Server-Timing`` header.
+
+    Records SQL query count and time on every database, template render time
+    and the total time spent below this middleware, and logs them keyed by
+    URL name. ``SERVER_TIMING_SAMPLE_RATE`` is the sampled fraction of
+    requests; the others run untouched. Streaming content is produced after
+    the response leaves the middleware and is not timed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_sampled('SERVER_TIMING_SAMPLE_RATE'):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with RequestTiming() as timing, wrap_queries(timing):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = ', '.join([
+            'db;desc="{} queries";dur={:.1f}'.format(
+                timing.sql_count, timing.sql_time * 1000),
+            'tpl;dur={:.1f}'.format(timing.template_time * 1000),
+            'total;dur={:.1f}'.format(total * 1000),
+        ])
+        self.log(request, response, timing, total)
+        return response
+
+    @staticmethod
+    def log(request, response, timing, total):
+        match = request.resolver_match
+        url_name = match.view_name if match else None
+        fields = {
+            'url_name': url_name,
+            'method': request.method,
+            'status': response.status_code,
+            'sql_count': timing.sql_count,
+            'sql_ms': round(timing.sql_time * 1000, 1),
+            'template_ms': round(timing.template_time * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+        }
+        logger.info(' '.join('{}={}'.format(key, value)
+                             for key, value in fields.items()),
+                    extra={'timing': fields})
+
+
+class QueryLogMiddleware:
+    """Records the queries of a sample of requests for the slow query log.
+
+    Queries slower than ``SLOW_QUERY_THRESHOLD_MS`` are logged with their
+    plan. With ``QUERY_LOG_PATH`` set, every recorded query is appended to
+    that file for the ``slow_queries`` command. ``QUERY_LOG_SAMPLE_RATE``
+    is the recorded fraction of requests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_sampled('QUERY_LOG_SAMPLE_RATE'):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with wrap_queries(recorder):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        recorder.flush(match.view_name if match else None)
+        return response
+
+
+class MetricsMiddleware:
+    """Records request latency, status and SQL use in ``website.metrics``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with RequestTiming() as timing, wrap_queries(timing):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        url_name = match.view_name if match else 'unmatched'
+        metrics.REQUEST_DURATION.observe(duration, url_name=url_name,
+                                         method=request.method)
+        metrics.RESPONSES.inc(url_name=url_name, status=response.status_code)
+        metrics.REQUEST_QUERIES.observe(timing.sql_count, url_name=url_name)
+        metrics.REQUEST_QUERY_DURATION.observe(timing.sql_time,
+                                               url_name=url_name)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Routes the reads of ``read_from_replicas`` views to a replica.
+
+    A request writing to the ``website`` models pins its session to the
+    primary for good, so users always see their own changes. Must come
+    after ``SessionMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = routers.RoutingState(
+            pinned=request.session.get(routers.PIN_SESSION_KEY, False))
+        token = routers.activate(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.deactivate(token)
+
+        if state.wrote:
+            request.session[routers.PIN_SESSION_KEY] = True
+        if response.streaming:
+            response.streaming_content = self._stream(
+                state, response.streaming_content)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if getattr(view_class, 'read_from_replicas', False):
+            routers.get_state().use_replicas()
+
+    @staticmethod
+    def _stream(state, content):
+        # Streaming content is read after the request left the middleware.
+        token = routers.activate(state)
+        try:
+            yield from content
+        finally:
+            routers.deactivate(token)
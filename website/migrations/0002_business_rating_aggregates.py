@@ -0,0 +1,71 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:03
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Business = apps.get_model('website', 'Business')
+    Opinion = apps.get_model('website', 'Opinion')
+
+    histogram = {
+        'rating_{}_count'.format(rating): Count('pk', filter=Q(rating=rating))
+        for rating in range(1, 6)
+    }
+    rows = Opinion.objects.order_by().values('business').annotate(
+        opinion_count=Count('pk'), rating_sum=Sum('rating'), **histogram)
+    for row in rows:
+        row['average_rating'] = row['rating_sum'] / row['opinion_count']
+        Business.objects.filter(pk=row.pop('business')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='average_rating',
+            field=models.FloatField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='opinion_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_aggregates,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0002_business_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date_from', 'date_to'], name='website_eve_date_fr_76108c_idx'),
+        ),
+    ]
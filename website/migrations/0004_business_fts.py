@@ -0,0 +1,46 @@
+from django.db import migrations
+
+CREATE_FTS_TABLE = """
+CREATE VIRTUAL TABLE website_business_fts USING fts5(
+    name, business_type, owner, description,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+POPULATE_FTS_TABLE = """
+INSERT INTO website_business_fts (rowid, name, business_type, owner,
+                                  description)
+SELECT business.id, business.name, business_type.business_type,
+       user.username, business.description
+FROM website_business business
+JOIN website_businesstype business_type
+    ON business_type.id = business.business_type_id
+JOIN website_contractor contractor ON contractor.id = business.owner_id
+JOIN website_user user ON user.id = contractor.user_id
+"""
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(CREATE_FTS_TABLE)
+    schema_editor.execute(POPULATE_FTS_TABLE)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute('DROP TABLE website_business_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0003_event_date_range_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
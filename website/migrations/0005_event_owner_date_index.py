@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0004_business_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['owner', 'date_from'], name='website_eve_owner_i_7d82c6_idx'),
+        ),
+    ]
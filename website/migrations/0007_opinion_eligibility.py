@@ -0,0 +1,90 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:18
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def populate_opinion_eligibility(apps, schema_editor):
+    Business = apps.get_model('website', 'Business')
+    Event = apps.get_model('website', 'Event')
+    OpinionEligibility = apps.get_model('website', 'OpinionEligibility')
+
+    Event.objects.filter(date_to__lte=timezone.now()).update(ended=True)
+    rows = Event.businesses.through.objects.filter(
+        event__ended=True).order_by().values(
+        'event__owner', 'business').annotate(ended_events=Count('pk'))
+    # Opinions written so far have no author, so every one of them counts
+    # against each client who could have written it.
+    opinion_counts = dict(Business.objects.filter(
+        opinion_count__gt=0).values_list('pk', 'opinion_count'))
+
+    OpinionEligibility.objects.bulk_create([
+        OpinionEligibility(
+            client_id=row['event__owner'], business_id=row['business'],
+            ended_events=row['ended_events'],
+            opinions=min(row['ended_events'],
+                         opinion_counts.get(row['business'], 0)))
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpinionEligibility',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ended_events', models.PositiveIntegerField(default=0)),
+                ('opinions', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'opinion eligibilities',
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='ended',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='opinion',
+            name='author',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='website.Client'),
+        ),
+        migrations.AddField(
+            model_name='opinion',
+            name='event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='website.Event'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='opinion',
+            unique_together={('event', 'business')},
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['ended', 'date_to'], name='website_eve_ended_5a915f_idx'),
+        ),
+        migrations.AddField(
+            model_name='opinioneligibility',
+            name='business',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='website.Business'),
+        ),
+        migrations.AddField(
+            model_name='opinioneligibility',
+            name='client',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='website.Client'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='opinioneligibility',
+            unique_together={('client', 'business')},
+        ),
+        migrations.RunPython(populate_opinion_eligibility,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+def populate_name_keys(apps, schema_editor):
+    Business = apps.get_model('website', 'Business')
+
+    businesses = []
+    for pk, name in Business.objects.values_list('pk', 'name').iterator():
+        businesses.append(Business(pk=pk, name_key=name.lower()[:100]))
+    Business.objects.bulk_update(businesses, ['name_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0008_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_name_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='business',
+            name='name_key',
+            field=models.CharField(db_index=True, editable=False, max_length=100),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0010_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_pk', models.PositiveIntegerField()),
+                ('event_title', models.CharField(max_length=100)),
+                ('action', models.CharField(choices=[('booked', 'booked'), ('updated', 'updated'), ('unbooked', 'unbooked'), ('deleted', 'deleted')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='website.Business')),
+                ('contractor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='website.Contractor')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bookingnotification',
+            index=models.Index(fields=['sent_at', 'contractor'], name='website_boo_sent_at_0438b4_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0011_bookingnotification'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='website_eve_date_fr_76108c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['date_to', 'date_from'], name='website_eve_date_to_6b277f_idx'),
+        ),
+    ]
@@ -1,15 +1,14 @@
 from enum import Enum
+import collections
 import datetime
 
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Avg
+from django.db import connections, models, transaction
+from django.db.models import Case, Exists, F, FloatField, OuterRef, When
+from django.db.models.functions import Cast
 from django.utils import timezone
 
-WIDTH_FIELD = 225
-HEIGHT_FIELD = 225
-
 
 class Role(Enum):
     ADMIN = 0
@@ -24,16 +23,6 @@ class User(AbstractUser):
     avatar = models.ImageField('avatar', upload_to='avatars/',
                                default='default_image.png')
 
-    # def save(self, *args, **kwargs):
-    #     super().save(*args, **kwargs)
-    #     from PIL import Image
-
-    # print("IMG: ", self.avatar.path)
-    # photo = Image.open(self.avatar.path)
-
-    #     photo.thumbnail((WIDTH_FIELD, HEIGHT_FIELD))
-    #     photo.save(self.get_t)
-
     def __str__(self):
         return self.username
 
@@ -44,13 +33,13 @@ class User(AbstractUser):
     get_role.admin_order_field = 'role'
 
     def is_admin(self):
-        return self.get_role() == Role.ADMIN.name
+        return self.role == Role.ADMIN.value
 
     def is_client(self):
-        return self.get_role() == Role.CLIENT.name
+        return self.role == Role.CLIENT.value
 
     def is_contractor(self):
-        return self.get_role() == Role.CONTRACTOR.name
+        return self.role == Role.CONTRACTOR.value
 
 
 class Client(models.Model):
@@ -84,12 +73,100 @@ class BusinessType(models.Model):
         return self.business_type
 
 
+def make_name_key(name):
+    """Returns the form of a business name its prefix search compares."""
+    return name.lower()[:100]
+
+
+class BusinessQuerySet(models.QuerySet):
+
+    def name_prefix(self, prefix):
+        """Businesses whose name starts with ``prefix``, ignoring case,
+        ordered by name. Runs as a range scan of the ``name_key`` index."""
+        key = make_name_key(prefix)
+        return self.filter(name_key__gte=key,
+                           name_key__lt=key + '\U0010ffff').order_by(
+            'name_key', 'pk')
+
+    def lock(self):
+        """Locks the businesses until the transaction ends, so bookings of
+        them are checked and saved one transaction at a time.
+
+        SQLite has no row locks, so the database is locked for writing
+        instead. Taking that lock before reading also keeps a transaction
+        from failing with "database is locked" when it later writes.
+        """
+        connection = connections[self.db]
+        if connection.features.has_select_for_update:
+            list(self.select_for_update().order_by('pk').values_list(
+                'pk', flat=True))
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('UPDATE {0} SET id = id WHERE 0'.format(
+                    connection.ops.quote_name(self.model._meta.db_table)))
+
+    def busy_during(self, date_from, date_to, exclude_event=None):
+        """Businesses booked by an event overlapping ``date_from`` to
+        ``date_to``.
+
+        The bookings of these businesses are read first and joined to their
+        events, rather than every event of the range being listed.
+        """
+        bookings = Event.businesses.through.objects.filter(
+            business__in=self.values('pk'), event__date_from__lt=date_to,
+            event__date_to__gt=date_from)
+        if exclude_event is not None:
+            bookings = bookings.exclude(event=exclude_event.pk)
+
+        return self.filter(pk__in=bookings.values('business'))
+
+    def add_ratings(self, counts):
+        """Adds ``count`` ratings per ``rating: count``; negative removes."""
+        updates = {
+            'opinion_count': F('opinion_count') + sum(counts.values()),
+            'rating_sum': F('rating_sum') + sum(
+                rating * count for rating, count in counts.items()),
+        }
+        for rating, count in counts.items():
+            histogram_field = 'rating_{}_count'.format(rating)
+            updates[histogram_field] = F(histogram_field) + count
+
+        self.update(**updates)
+        # Now() is CURRENT_TIMESTAMP on SQLite, whole seconds behind the
+        # microseconds of auto_now, and page versions compare updated_at.
+        self.update(updated_at=timezone.now(), average_rating=Case(
+            When(opinion_count=0, then=None),
+            default=Cast('rating_sum', FloatField()) / F('opinion_count'),
+            output_field=FloatField()
+        ))
+
+
 class Business(models.Model):
     name = models.CharField(max_length=100)
+    name_key = models.CharField(max_length=100, editable=False, db_index=True)
     business_type = models.ForeignKey(BusinessType, on_delete=models.CASCADE)
     owner = models.ForeignKey(Contractor, on_delete=models.CASCADE)
     description = models.TextField(max_length=500,
                                    default='Business description...')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Rating aggregates, maintained by Opinion on every write and rebuilt by
+    # the rebuild_ratings management command.
+    opinion_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(null=True, editable=False,
+                                       db_index=True)
+
+    objects = BusinessQuerySet.as_manager()
+
+    RATING_FIELDS = ('opinion_count', 'rating_sum', 'rating_1_count',
+                     'rating_2_count', 'rating_3_count', 'rating_4_count',
+                     'rating_5_count', 'average_rating')
 
     class Meta:
         verbose_name = 'Business'
@@ -98,28 +175,71 @@ class Business(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_key = make_name_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_key'}
+        super().save(*args, **kwargs)
+
     def get_average_rating(self):
-        return self.opinion_set.all().aggregate(
-            avg_rating=Avg('rating'))['avg_rating']
+        return self.average_rating
 
     get_average_rating.short_description = 'average rating'
     get_average_rating.empty_value_display = 'no opinions'
-    get_average_rating.admin_order_field = 'name'
+    get_average_rating.admin_order_field = 'average_rating'
+
+    def get_rating_histogram(self):
+        return [(rating, getattr(self, 'rating_{}_count'.format(rating)))
+                for rating, _ in Opinion.RATINGS]
+
+    def update_rating(self, rating, delta):
+        """Adds (delta=1) or removes (delta=-1) a single rating."""
+        Business.objects.filter(pk=self.pk).add_ratings({rating: delta})
 
     def get_event_schedule(self):
-        event_schedule = []
-        for event in self.event_set.all():
-            event_dict = {
-                "id": str(event.pk),
-                "title": str(event.title),
-                "url": "/event/{}".format(event.pk),
-                "class": "event-special",
-                "start": str(event.date_from.timestamp() * 1000),
-                "end": str(event.date_to.timestamp() * 1000)
-            }
-            event_schedule.append(event_dict)
+        return [event.get_schedule_entry() for event in self.event_set.all()]
+
+
+class EventQuerySet(models.QuerySet):
+
+    def overlapping(self, date_from, date_to):
+        return self.filter(date_from__lt=date_to, date_to__gt=date_from)
 
-        return event_schedule
+    def booking(self, business):
+        """Events booking ``business``.
+
+        Each event is looked up in the through table's unique index, so a
+        range of events is still read from the date index rather than from
+        the business's whole booking history.
+        """
+        return self.annotate(books_business=Exists(
+            Event.businesses.through.objects.filter(
+                event=OuterRef('pk'), business=business))).filter(
+            books_business=True)
+
+    def end_past(self, now=None, chunk_size=500):
+        """Marks past events as ended and credits their clients' ledgers.
+
+        Returns the number of events marked.
+        """
+        now = now or timezone.now()
+        ended = 0
+
+        while True:
+            with transaction.atomic():
+                events = dict(self.select_for_update().filter(
+                    ended=False, date_to__lte=now).order_by('pk').values_list(
+                    'pk', 'owner')[:chunk_size])
+                if not events:
+                    return ended
+
+                bookings = Event.businesses.through.objects.filter(
+                    event__in=events).values_list('event', 'business')
+                OpinionEligibility.objects.credit_events(
+                    (events[event], business) for event, business in bookings)
+                Event.objects.filter(pk__in=events).update(ended=True)
+                ended += len(events)
 
 
 class Event(models.Model):
@@ -128,13 +248,44 @@ class Event(models.Model):
     date_to = models.DateTimeField(blank=False, null=False)
     owner = models.ForeignKey(Client, on_delete=models.CASCADE)
     businesses = models.ManyToManyField(Business, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Set once the event has ended and its bookings allow opinions.
+    ended = models.BooleanField(default=False, editable=False)
+
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Overlap checks bound date_to from below and date_from from
+            # above; leading on date_to keeps past events out of the range.
+            models.Index(fields=['date_to', 'date_from']),
+            models.Index(fields=['owner', 'date_from']),
+            models.Index(fields=['ended', 'date_to']),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Events of existing rows end through EventQuerySet.end_past, which
+        # credits their bookings; new ones have none yet.
+        if self._state.adding and self.date_to <= timezone.now():
+            self.ended = True
+        super().save(*args, **kwargs)
+
     def get_duration(self):
         return self.date_to - self.date_from
 
+    def get_schedule_entry(self):
+        return {
+            "id": str(self.pk),
+            "title": str(self.title),
+            "url": "/event/{}".format(self.pk),
+            "class": "event-special",
+            "start": str(self.date_from.timestamp() * 1000),
+            "end": str(self.date_to.timestamp() * 1000)
+        }
+
     def clean(self):
         super().clean()
         if not self.date_to or not self.date_from:
@@ -160,8 +311,207 @@ class Opinion(models.Model):
     rating = models.PositiveSmallIntegerField(choices=RATINGS)
     text = models.TextField(max_length=500)
     business = models.ForeignKey(Business, on_delete=models.CASCADE)
+    author = models.ForeignKey(Client, on_delete=models.SET_NULL, null=True,
+                               blank=True)
+    event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True,
+                              blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        unique_together = ('event', 'business')
 
     def __str__(self):
         text_limit = 50
         return self.text if len(self.text) <= text_limit else '{}...'.format(
             self.text[:text_limit])
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Opinion.objects.select_for_update().filter(
+                    pk=self.pk).values('rating', 'business').first()
+            super().save(*args, **kwargs)
+
+            if previous == {'rating': self.rating,
+                            'business': self.business_id}:
+                return
+            if previous:
+                Business(pk=previous['business']).update_rating(
+                    previous['rating'], -1)
+            elif self.author_id:
+                OpinionEligibility.objects.credit_opinion(
+                    self.author_id, self.business_id, 1)
+            self.business.update_rating(self.rating, 1)
+
+        self.business.refresh_from_db(fields=Business.RATING_FIELDS)
+
+
+class OpinionEligibilityQuerySet(models.QuerySet):
+
+    def credit_events(self, bookings, delta=1):
+        """Adds ``delta`` ended events per ``(client, business)`` pair."""
+        counts = collections.Counter(bookings)
+        if delta > 0:
+            self.bulk_create([
+                OpinionEligibility(client_id=client, business_id=business)
+                for client, business in counts
+            ], ignore_conflicts=True)
+
+        for (client, business), count in counts.items():
+            self.filter(client=client, business=business).update(
+                ended_events=F('ended_events') + count * delta)
+
+    def credit_opinion(self, client, business, delta=1):
+        self.filter(client=client, business=business).update(
+            opinions=F('opinions') + delta)
+
+
+class OpinionEligibility(models.Model):
+    """Ledger of ended events and opinions of a client for a business.
+
+    A client may write one opinion per ended event booking the business.
+    """
+    client = models.ForeignKey(Client, on_delete=models.CASCADE)
+    business = models.ForeignKey(Business, on_delete=models.CASCADE)
+    ended_events = models.PositiveIntegerField(default=0)
+    opinions = models.PositiveIntegerField(default=0)
+
+    objects = OpinionEligibilityQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('client', 'business')
+        verbose_name_plural = 'opinion eligibilities'
+
+    def __str__(self):
+        return '{} at {}'.format(self.client, self.business)
+
+    def can_add_opinion(self):
+        return self.opinions < self.ended_events
+
+    def get_unreviewed_event(self):
+        return Event.objects.filter(
+            owner=self.client_id, businesses=self.business_id, ended=True
+        ).exclude(opinion__business=self.business_id).order_by(
+            'date_to').first()
+
+
+class ImportCheckpoint(models.Model):
+    """Number of records of an ``import_data`` source already committed."""
+    source = models.CharField(max_length=255, unique=True)
+    records = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '{} ({} records)'.format(self.source, self.records)
+
+
+class JobQuerySet(models.QuerySet):
+
+    def claim(self, worker, limit, now=None):
+        """Marks up to ``limit`` due jobs as run by ``worker``, most urgent
+        first, and returns their primary keys.
+
+        Each job is taken with a conditional update, so concurrent workers
+        never claim the same one, without row locks.
+        """
+        now = now or timezone.now()
+        candidates = self.filter(status=Job.QUEUED, run_at__lte=now).order_by(
+            '-priority', 'run_at', 'pk').values_list('pk', flat=True)
+
+        claimed = []
+        for pk in candidates[:limit * 2]:
+            if len(claimed) == limit:
+                break
+            if self.filter(pk=pk, status=Job.QUEUED).update(
+                    status=Job.RUNNING, worker=worker, started_at=now,
+                    attempts=F('attempts') + 1):
+                claimed.append(pk)
+        return claimed
+
+    def requeue_stale(self, started_before):
+        """Returns jobs of workers that died while running them to the
+        queue, if they have attempts left."""
+        return self.filter(status=Job.RUNNING, started_at__lt=started_before,
+                           attempts__lt=F('max_attempts')).update(
+            status=Job.QUEUED, worker='')
+
+    def fail_stale(self, started_before):
+        """Fails jobs of workers that died while running them on their last
+        attempt, such as jobs that kill their worker every time."""
+        return self.filter(status=Job.RUNNING, started_at__lt=started_before,
+                           attempts__gte=F('max_attempts')).update(
+            status=Job.FAILED, worker='', finished_at=timezone.now(),
+            last_error='The worker stopped while running the job.')
+
+
+class Job(models.Model):
+    """Call of a ``website.jobs.task`` function, run by ``run_workers``."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    )
+
+    task = models.CharField(max_length=200)
+    arguments = models.TextField(default='{}')
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    idempotency_key = models.CharField(max_length=200, null=True, blank=True,
+                                       unique=True)
+    worker = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'priority', 'run_at']),
+        ]
+
+    def __str__(self):
+        return '{} ({})'.format(self.task, self.status)
+
+
+class BookingNotification(models.Model):
+    """Booking change at a contractor's business, awaiting their digest."""
+    BOOKED = 'booked'
+    UPDATED = 'updated'
+    UNBOOKED = 'unbooked'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (BOOKED, 'booked'),
+        (UPDATED, 'updated'),
+        (UNBOOKED, 'unbooked'),
+        (DELETED, 'deleted'),
+    )
+
+    contractor = models.ForeignKey(Contractor, on_delete=models.CASCADE)
+    business = models.ForeignKey(Business, on_delete=models.CASCADE)
+    # Not a foreign key with a copied title, as deleted events are reported
+    # too.
+    event_pk = models.PositiveIntegerField()
+    event_title = models.CharField(max_length=100)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'contractor']),
+        ]
+
+    def __str__(self):
+        return '{} {} at {}'.format(self.event_title, self.action,
+                                    self.business)
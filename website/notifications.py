@@ -0,0 +1,102 @@
+import collections
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import BookingNotification, Business, Event
+
+
+def notify_bookings(action, event, business_pks=None):
+    """Queues notifying the owners of ``business_pks`` of a booking change
+    of ``event``, by default at all of its businesses.
+
+    The request only adds one job; contractors are looked up and notified
+    by workers.
+    """
+    if business_pks is not None:
+        business_pks = list(business_pks)
+        if not business_pks:
+            return
+    enqueue(record_booking_changes, {
+        'action': action, 'event': event.pk, 'title': event.title,
+        'businesses': business_pks})
+
+
+def get_digest_window(now=None):
+    """Returns the key of the current ``BOOKING_DIGEST_SECONDS`` window and
+    the seconds until it ends."""
+    length = getattr(settings, 'BOOKING_DIGEST_SECONDS', 300)
+    now = time.time() if now is None else now
+    number = int(now // length)
+    return ('booking-digests:{}:{}'.format(length, number),
+            (number + 1) * length - now)
+
+
+@task
+def record_booking_changes(action, event, title, businesses=None):
+    if businesses is None:
+        businesses = Event.businesses.through.objects.filter(
+            event=event).values_list('business', flat=True)
+    BookingNotification.objects.bulk_create(
+        BookingNotification(contractor_id=owner, business_id=business,
+                            event_pk=event, event_title=title, action=action)
+        for business, owner in Business.objects.filter(
+            pk__in=businesses).values_list('pk', 'owner'))
+
+    # Changes of one window share one digest job, which runs as it ends and
+    # so after the notifications above are committed.
+    key, delay = get_digest_window()
+    enqueue(send_booking_digests, delay=delay, key=key)
+
+
+def coalesce(notifications):
+    """Returns the latest notification of every booking of
+    ``notifications``, leaving out bookings made and cancelled within them.
+
+    A booking made and then updated is reported as made.
+    """
+    bookings = collections.OrderedDict()
+    for notification in notifications:
+        key = (notification.event_pk, notification.business_id)
+        made = bookings.get(key)
+        if made is None or made.action != BookingNotification.BOOKED:
+            bookings[key] = notification
+        elif notification.action in (BookingNotification.UNBOOKED,
+                                     BookingNotification.DELETED):
+            del bookings[key]
+    return list(bookings.values())
+
+
+@task
+def send_booking_digests():
+    """Mails every contractor one digest of their unsent notifications.
+
+    Digests share one connection to the mail server. Each contractor's
+    notifications are marked sent once their digest is, so a retry after a
+    failure only sends the rest.
+    """
+    notifications = collections.defaultdict(list)
+    for notification in BookingNotification.objects.filter(
+            sent_at=None).select_related('contractor__user',
+                                         'business').order_by(
+            'created_at', 'pk'):
+        notifications[notification.contractor].append(notification)
+
+    with get_connection() as connection:
+        for contractor, contractor_notifications in notifications.items():
+            changes = coalesce(contractor_notifications)
+            if changes:
+                EmailMessage(
+                    'Booking changes at your businesses',
+                    render_to_string('website/emails/booking_digest.txt', {
+                        'contractor': contractor, 'changes': changes}),
+                    to=[contractor.user.email],
+                    connection=connection).send()
+            BookingNotification.objects.filter(
+                pk__in=[notification.pk for notification
+                        in contractor_notifications]).update(
+                sent_at=timezone.now())
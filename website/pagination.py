@@ -0,0 +1,178 @@
+import datetime
+import json
+
+from django.core import signing
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+
+CURSOR_SALT = 'website.pagination'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorSerializer:
+    """JSON serializer keeping full precision of datetime keys."""
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'),
+                          default=self._default).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, (datetime.date, datetime.time)):
+            return obj.isoformat()
+        return str(obj)
+
+
+def encode_cursor(keys, reverse=False):
+    return signing.dumps([keys, reverse], salt=CURSOR_SALT,
+                         serializer=CursorSerializer, compress=True)
+
+
+def decode_cursor(cursor):
+    try:
+        keys, reverse = signing.loads(cursor, salt=CURSOR_SALT,
+                                      serializer=CursorSerializer)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor.')
+
+    return keys, bool(reverse)
+
+
+def seek(queryset, ordering, keys, reverse, limit):
+    """Returns ``limit`` rows of ``queryset`` following ``keys`` in ``ordering``.
+
+    With ``reverse`` the rows preceding ``keys`` are returned, nearest first.
+    """
+    fields = [field.lstrip('-') for field in ordering]
+    descending = [field.startswith('-') != reverse for field in ordering]
+
+    if keys is not None:
+        condition = Q()
+        for index, field in enumerate(fields):
+            lookups = dict(zip(fields[:index], keys[:index]))
+            lookups['{}__{}'.format(
+                field, 'lt' if descending[index] else 'gt')] = keys[index]
+            condition |= Q(**lookups)
+        queryset = queryset.filter(condition)
+
+    return list(queryset.order_by(*(
+        ('-' if desc else '') + field
+        for field, desc in zip(fields, descending)))[:limit])
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Cursor paginator which never counts rows or skips them with OFFSET.
+
+    ``ordering`` must be unique, so it should end with ``pk``. Sources other
+    than querysets may provide their own ``keyset_ordering`` and ``seek``
+    method with the signature of ``seek`` above, without the first two
+    arguments.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('pk',)):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = getattr(object_list, 'keyset_ordering', ordering)
+
+    def get_page(self, cursor=None):
+        keys, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if keys is not None and len(keys) != len(self.ordering):
+            raise InvalidCursor('Invalid cursor.')
+
+        items = self._seek(keys, reverse, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            items.reverse()
+        if not items:
+            return KeysetPage(items)
+
+        has_next, has_previous = (
+            (keys is not None, has_more) if reverse
+            else (has_more, keys is not None))
+        return KeysetPage(
+            items,
+            next_cursor=encode_cursor(
+                self._get_keys(items[-1])) if has_next else None,
+            previous_cursor=encode_cursor(
+                self._get_keys(items[0]), reverse=True) if has_previous else None
+        )
+
+    def _seek(self, keys, reverse, limit):
+        if hasattr(self.object_list, 'seek'):
+            return self.object_list.seek(keys, reverse, limit)
+        return seek(self.object_list, self.ordering, keys, reverse, limit)
+
+    def _get_keys(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+
+class KeysetPaginationMixin:
+    paginate_by = 25
+    page_ordering = ('pk',)
+    cursor_kwarg = 'cursor'
+
+    def paginate_keyset(self, object_list):
+        paginator = KeysetPaginator(object_list, self.paginate_by,
+                                    self.page_ordering)
+        try:
+            page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as error:
+            raise Http404(str(error))
+
+        page.next_url = self._get_page_url(page.next_cursor)
+        page.previous_url = self._get_page_url(page.previous_cursor)
+        return paginator, page
+
+    def get_keyset_page_version(self, object_list):
+        """Returns the keys and update times of the requested page."""
+        if hasattr(object_list, 'only'):
+            object_list = object_list.select_related(None).prefetch_related(
+                None).only('pk', 'updated_at', *(
+                    field.lstrip('-') for field in self.page_ordering))
+
+        _, page = self.paginate_keyset(object_list)
+        return ([(obj.pk, obj.updated_at) for obj in page],
+                page.next_cursor, page.previous_cursor)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page = self.paginate_keyset(queryset)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def _get_page_url(self, cursor):
+        if cursor is None:
+            return None
+
+        params = self.request.GET.copy()
+        params[self.cursor_kwarg] = cursor
+        return '?{}'.format(params.urlencode())
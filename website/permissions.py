@@ -0,0 +1,22 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404
+
+
+class OwnerRequiredMixin:
+    """Limits a single object view to objects owned by the request user.
+
+    ``owner_profile`` names the user profile, e.g. ``'client'``, which the
+    ``owner`` field of the model points to. The ownership check is part of
+    the query fetching the object, so it costs one primary key lookup however
+    many objects the user owns. Users without the profile get a 404.
+    """
+    owner_profile = None
+
+    def get_owner(self):
+        try:
+            return getattr(self.request.user, self.owner_profile)
+        except (AttributeError, ObjectDoesNotExist):
+            raise Http404()
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.get_owner())
@@ -0,0 +1,151 @@
+import collections
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('website.queries')
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames of these modules are the instrumentation itself, not the origin.
+IGNORED_FILES = {
+    os.path.join(PACKAGE_DIR, name)
+    for name in ('querylog.py', 'middleware.py', 'timing.py')
+}
+FINGERPRINT_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def get_threshold():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100) / 1000
+
+
+def get_log_path():
+    return getattr(settings, 'QUERY_LOG_PATH', None)
+
+
+def fingerprint(sql):
+    """Returns ``sql`` with literals, parameters and IN lists collapsed."""
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_origin():
+    """Returns the innermost ``website`` frame outside instrumentation."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PACKAGE_DIR) and filename not in IGNORED_FILES:
+            return '{}:{} in {}'.format(
+                os.path.relpath(filename, os.path.dirname(PACKAGE_DIR)),
+                frame.f_lineno, frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """Execute wrapper keeping the duration and origin of every query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((
+                context['connection'].alias, sql, None if many else params,
+                time.perf_counter() - start, get_origin()))
+
+    def flush(self, view_name):
+        """Logs slow queries with their plans and appends all to the log.
+
+        Must run after the recorder is uninstalled, as plans run queries.
+        """
+        threshold = get_threshold()
+        lines = []
+        for alias, sql, params, duration, origin in self.queries:
+            lines.append(json.dumps({
+                'fingerprint': fingerprint(sql),
+                'ms': round(duration * 1000, 3),
+                'view': view_name,
+                'origin': origin,
+            }))
+            if duration >= threshold:
+                logger.warning(
+                    'Slow query (%.1f ms) in %s at %s: %s\n%s',
+                    duration * 1000, view_name, origin, sql,
+                    explain(alias, sql, params))
+
+        path = get_log_path()
+        if path and lines:
+            # One append per request keeps lines of processes whole.
+            with open(path, 'a', encoding='utf-8') as log:
+                log.write('\n'.join(lines) + '\n')
+        self.queries = []
+
+
+def explain(alias, sql, params):
+    if params is None or not sql.lstrip().upper().startswith('SELECT'):
+        return 'No plan.'
+
+    connection = connections[alias]
+    prefix = ('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+              else 'EXPLAIN ')
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' '.join(map(str, row))
+                             for row in cursor.fetchall())
+    except Exception as error:
+        return 'No plan: {}'.format(error)
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            if line.strip():
+                yield json.loads(line)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def aggregate(records):
+    """Returns stats per fingerprint: count, total and p95 milliseconds and
+    the most frequent view and origin."""
+    durations = collections.defaultdict(list)
+    views = collections.defaultdict(collections.Counter)
+    origins = collections.defaultdict(collections.Counter)
+    for record in records:
+        key = record['fingerprint']
+        durations[key].append(record['ms'])
+        views[key][record['view']] += 1
+        origins[key][record['origin']] += 1
+
+    stats = []
+    for key, values in durations.items():
+        values.sort()
+        stats.append({
+            'fingerprint': key,
+            'count': len(values),
+            'total_ms': sum(values),
+            'p95_ms': percentile(values, 0.95),
+            'view': views[key].most_common(1)[0][0],
+            'origin': origins[key].most_common(1)[0][0],
+        })
+    return stats
@@ -0,0 +1,85 @@
+import contextvars
+import random
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PIN_SESSION_KEY = '_pinned_to_primary'
+
+_state = contextvars.ContextVar('replica_routing', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class RoutingState:
+    """Where the reads of one request go.
+
+    ``replica`` is chosen once, so a page reads one consistent copy.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = None
+        self.wrote = False
+
+    def use_replicas(self):
+        replicas = get_replicas()
+        if replicas and not self.pinned:
+            self.replica = random.choice(replicas)
+
+
+def get_state():
+    return _state.get()
+
+
+def reads_from_replica():
+    """Whether reads of the current request go to a replica."""
+    state = get_state()
+    return state is not None and bool(state.replica)
+
+
+def activate(state):
+    return _state.set(state)
+
+
+def deactivate(token):
+    _state.reset(token)
+
+
+def record_write():
+    """Pins the session of the current request, if any, to the primary."""
+    state = get_state()
+    if state is not None:
+        state.wrote = True
+        state.pinned = True
+        state.replica = None
+
+
+class ReplicaRouter:
+    """Sends reads of views with ``read_from_replicas`` to a replica.
+
+    Everything else, and every request of a session after it wrote,
+    uses the primary. Replicas are never migrated; they are copies.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = get_state()
+        if state is not None and state.replica:
+            return state.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
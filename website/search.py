@@ -0,0 +1,146 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Business
+
+DEFAULT_SEARCH_BACKEND = 'website.search.SQLiteFTSBackend'
+
+
+def get_search_backend():
+    return import_string(getattr(settings, 'BUSINESS_SEARCH_BACKEND',
+                                 DEFAULT_SEARCH_BACKEND))()
+
+
+class BaseSearchBackend:
+    """Keeps a business search index and runs ranked queries against it.
+
+    ``search`` returns a queryset or an object implementing the seek
+    protocol of ``website.pagination.KeysetPaginator``.
+    """
+
+    def index(self, businesses):
+        raise NotImplementedError
+
+    def remove(self, pks):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, query):
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Unindexed fallback for databases without a full-text engine."""
+
+    def index(self, businesses):
+        pass
+
+    def remove(self, pks):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query):
+        condition = Q()
+        for term in query.split():
+            condition &= (Q(name__icontains=term)
+                          | Q(business_type__business_type__icontains=term)
+                          | Q(owner__user__username__icontains=term)
+                          | Q(description__icontains=term))
+
+        return Business.objects.filter(condition).order_by('name', 'pk')
+
+
+class FTSResults:
+    """Ranked matches of an FTS query, paginated with ``KeysetPaginator``."""
+    keyset_ordering = ('search_rank', 'pk')
+
+    def __init__(self, backend, match):
+        self.backend = backend
+        self.match = match
+
+    def seek(self, keys, reverse, limit):
+        if not self.match:
+            return []
+
+        sql = 'SELECT rowid, rank FROM {table} WHERE {table} MATCH %s'
+        params = [self.match]
+        if keys is not None:
+            sql += (' AND (rank {op} %s OR (rank = %s AND rowid {op} %s))')
+            params += [keys[0], keys[0], keys[1]]
+        sql += ' ORDER BY rank {order}, rowid {order} LIMIT %s'
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(table=self.backend.table,
+                                      op='<' if reverse else '>',
+                                      order='DESC' if reverse else 'ASC'),
+                           params)
+            rows = cursor.fetchall()
+
+        businesses = Business.objects.select_related(
+            'owner__user', 'business_type').in_bulk([pk for pk, _ in rows])
+        results = []
+        for pk, rank in rows:
+            if pk in businesses:
+                businesses[pk].search_rank = rank
+                results.append(businesses[pk])
+
+        return results
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Full-text index in an SQLite FTS5 table keyed by business primary key.
+
+    The table is created by the website migrations.
+    """
+    table = 'website_business_fts'
+    chunk_size = 500
+
+    def index(self, businesses):
+        rows = [
+            (business.pk, business.name, str(business.business_type),
+             business.owner.user.username, business.description)
+            for business in businesses
+        ]
+        if not rows:
+            return
+
+        self.remove([row[0] for row in rows])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO {} (rowid, name, business_type, owner, '
+                'description) VALUES (%s, %s, %s, %s, %s)'.format(self.table),
+                rows)
+
+    def remove(self, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'DELETE FROM {} WHERE rowid = %s'.format(self.table),
+                [(pk,) for pk in pks])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {}'.format(self.table))
+
+        businesses = Business.objects.select_related(
+            'owner__user', 'business_type').order_by('pk')
+        chunk = []
+        for business in businesses.iterator(chunk_size=self.chunk_size):
+            chunk.append(business)
+            if len(chunk) == self.chunk_size:
+                self.index(chunk)
+                chunk = []
+        self.index(chunk)
+
+    def search(self, query):
+        terms = re.findall(r'\w+', query)
+        return FTSResults(self, ' '.join('"{}"*'.format(term)
+                                         for term in terms))
@@ -0,0 +1,265 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import live, metrics, notifications, routers
+from .caching import bump_versions
+from .models import (BookingNotification, Business, BusinessType, Client,
+                     Contractor, Event, Opinion, OpinionEligibility, User)
+from .search import get_search_backend
+from .thumbnails import has_thumbnails, schedule_avatar_thumbnails
+
+
+@receiver(post_delete, sender=Opinion)
+def remove_opinion_rating(sender, instance, **kwargs):
+    Business(pk=instance.business_id).update_rating(instance.rating, -1)
+
+
+@receiver(post_delete, sender=Opinion)
+def remove_opinion_eligibility(sender, instance, **kwargs):
+    if instance.author_id:
+        OpinionEligibility.objects.credit_opinion(
+            instance.author_id, instance.business_id, -1)
+
+
+@receiver(pre_delete, sender=Event)
+def remove_ended_event_eligibility(sender, instance, **kwargs):
+    if instance.ended:
+        OpinionEligibility.objects.credit_events(
+            ((instance.owner_id, business) for business
+             in instance.businesses.values_list('pk', flat=True)), -1)
+
+
+@receiver(m2m_changed, sender=Event.businesses.through)
+def update_booking_eligibility(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        events = Event.objects.filter(ended=True, businesses=instance) if (
+            action == 'pre_clear') else Event.objects.filter(
+            ended=True, pk__in=pk_set)
+        bookings = ((client, instance.pk) for client
+                    in events.values_list('owner', flat=True))
+    elif instance.ended:
+        if action == 'pre_clear':
+            pk_set = instance.businesses.values_list('pk', flat=True)
+        bookings = ((instance.owner_id, business) for business in pk_set)
+    else:
+        return
+
+    OpinionEligibility.objects.credit_events(bookings, delta)
+
+
+@receiver(post_save, sender=Business)
+def index_business(sender, instance, **kwargs):
+    get_search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Business)
+def unindex_business(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=BusinessType)
+def reindex_business_type(sender, instance, created, **kwargs):
+    if not created:
+        get_search_backend().index(Business.objects.select_related(
+            'owner__user', 'business_type').filter(business_type=instance))
+
+
+@receiver(post_save, sender=User)
+def reindex_owner_businesses(sender, instance, created, update_fields,
+                             **kwargs):
+    if (created or not instance.is_contractor()
+            or update_fields and 'username' not in update_fields):
+        return
+
+    get_search_backend().index(Business.objects.select_related(
+        'owner__user', 'business_type').filter(owner__user=instance))
+    bump_versions('ranking')
+
+
+@receiver(post_save, sender=User)
+def render_avatar_thumbnails(sender, instance, update_fields, **kwargs):
+    if update_fields and 'avatar' not in update_fields:
+        return
+
+    # Every new user shares the default avatar, which
+    # generate_avatar_thumbnails renders once.
+    name = instance.avatar.name
+    if name == User._meta.get_field('avatar').default:
+        return
+    if name and not has_thumbnails(name):
+        # The job is saved with the user, so it only runs if they are.
+        schedule_avatar_thumbnails(name)
+
+
+@receiver([post_save, post_delete], sender=Business)
+def invalidate_business_pages(sender, instance, **kwargs):
+    bump_versions('business:{}'.format(instance.pk), 'ranking')
+
+
+@receiver([post_save, post_delete], sender=BusinessType)
+def invalidate_business_type_pages(sender, instance, **kwargs):
+    business_pks = instance.business_set.values_list('pk', flat=True)
+    bump_versions('ranking', *('business:{}'.format(pk)
+                               for pk in business_pks))
+
+
+@receiver(post_save, sender=BusinessType)
+def touch_business_type_businesses(sender, instance, created, **kwargs):
+    if not created:
+        instance.business_set.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def touch_owner_businesses(sender, instance, created, update_fields,
+                           **kwargs):
+    if (created or not instance.is_contractor()
+            or update_fields and 'username' not in update_fields):
+        return
+
+    Business.objects.filter(owner__user=instance).update(
+        updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Opinion)
+def invalidate_moved_opinion_pages(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+
+    previous_business = Opinion.objects.filter(pk=instance.pk).values_list(
+        'business', flat=True).first()
+    if previous_business not in (None, instance.business_id):
+        bump_versions('opinions:{}'.format(previous_business))
+
+
+@receiver([post_save, post_delete], sender=Opinion)
+def invalidate_opinion_pages(sender, instance, **kwargs):
+    bump_versions('opinions:{}'.format(instance.business_id), 'ranking')
+
+
+def invalidate_schedules(business_pks):
+    bump_versions(*('schedule:{}'.format(pk) for pk in business_pks))
+
+
+@receiver(post_save, sender=Event)
+def invalidate_event_schedules(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_schedules(instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Event)
+def invalidate_deleted_event_schedules(sender, instance, **kwargs):
+    invalidate_schedules(instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Event.businesses.through)
+def invalidate_booking_schedules(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_schedules([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_schedules(pk_set)
+    elif action == 'pre_clear':
+        invalidate_schedules(instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Event)
+def publish_event_update(sender, instance, created, **kwargs):
+    if not created:
+        live.publish_bookings('updated', instance.pk,
+                              instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Event)
+def publish_event_deletion(sender, instance, **kwargs):
+    live.publish_bookings('deleted', instance.pk,
+                          instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Event.businesses.through)
+def publish_booking_changes(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    published = {'post_add': 'booked', 'post_remove': 'unbooked',
+                 'pre_clear': 'unbooked'}.get(action)
+    if published is None:
+        return
+
+    if reverse:
+        events = (pk_set if action != 'pre_clear' else
+                  instance.event_set.values_list('pk', flat=True))
+        for event in events:
+            live.publish_bookings(published, event, [instance.pk])
+    elif action == 'pre_clear':
+        live.publish_bookings(published, instance.pk,
+                              instance.businesses.values_list('pk', flat=True))
+    else:
+        live.publish_bookings(published, instance.pk, pk_set)
+
+
+@receiver(post_save, sender=Event)
+def notify_event_update(sender, instance, created, **kwargs):
+    if not created:
+        notifications.notify_bookings(BookingNotification.UPDATED, instance)
+
+
+@receiver(pre_delete, sender=Event)
+def notify_event_deletion(sender, instance, **kwargs):
+    notifications.notify_bookings(
+        BookingNotification.DELETED, instance,
+        instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Event.businesses.through)
+def notify_booking_changes(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    # Bookings changed from the side of a business are changed by its
+    # contractor or an admin, not by clients.
+    if reverse:
+        return
+
+    if action == 'post_add':
+        notifications.notify_bookings(BookingNotification.BOOKED, instance,
+                                      pk_set)
+    elif action == 'post_remove':
+        notifications.notify_bookings(BookingNotification.UNBOOKED, instance,
+                                      pk_set)
+    elif action == 'pre_clear':
+        notifications.notify_bookings(
+            BookingNotification.UNBOOKED, instance,
+            instance.businesses.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Event)
+def count_created_event(sender, instance, created, **kwargs):
+    if created:
+        metrics.EVENTS_CREATED.inc()
+
+
+@receiver(post_save, sender=Opinion)
+def count_added_opinion(sender, instance, created, **kwargs):
+    if created:
+        metrics.OPINIONS_ADDED.inc()
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_save, sender=Contractor)
+def count_registration(sender, instance, created, **kwargs):
+    if created:
+        metrics.REGISTRATIONS.inc(role=sender.__name__.lower())
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def pin_to_primary(sender, update_fields=None, **kwargs):
+    # Logging in only updates last_login, which replica pages do not show.
+    if (sender._meta.app_label == 'website'
+            and update_fields != frozenset(['last_login'])):
+        routers.record_write()
@@ -0,0 +1,19 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from website.thumbnails import get_thumbnail_name, has_thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('website/page_elements/avatar.html')
+def avatar(user, size='medium', css_class=''):
+    name = user.avatar.name
+    context = {'src': user.avatar.url, 'webp_src': None, 'css_class': css_class}
+
+    if name and has_thumbnails(name):
+        context['src'] = default_storage.url(get_thumbnail_name(name, size))
+        context['webp_src'] = default_storage.url(
+            get_thumbnail_name(name, size, webp=True))
+
+    return context
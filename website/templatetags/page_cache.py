@@ -0,0 +1,17 @@
+from django import template
+
+from website.caching import get_versions, get_write_timeout
+
+register = template.Library()
+
+
+@register.simple_tag
+def cache_version(name, pk=None):
+    scope = name if pk is None else '{}:{}'.format(name, pk)
+    return get_versions(scope)[0]
+
+
+@register.simple_tag
+def page_cache_timeout():
+    """Timeout of ``{% cache %}`` fragments, 0 while reading a replica."""
+    return get_write_timeout()
@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class QueryBudget:
+
+    def __init__(self, queries, role=None, kwargs=None, params=None,
+                 headers=None):
+        self.queries = queries
+        self.role = role
+        self.kwargs = kwargs or {}
+        self.params = params or {}
+        self.headers = headers or {}
+
+
+class QueryBudgetMixin:
+    """Checks that pages stay within their query count as data grows.
+
+    ``budgets`` maps URL names to ``QueryBudget``. ``kwargs`` and ``params``
+    values may be callables taking the test case, so that they can refer to
+    objects built by ``populate``; ``headers`` are passed as request META.
+    ``populate(size)`` must add ``size`` rows of fixtures on each call and
+    return the users for every ``role``.
+    """
+    budgets = {}
+    fixture_sizes = (1, 10)
+    url_namespace = 'website'
+
+    def populate(self, size):
+        raise NotImplementedError
+
+    def assertWithinQueryBudgets(self):
+        for size in self.fixture_sizes:
+            users = self.populate(size)
+            for url_name, budget in sorted(self.budgets.items()):
+                with self.subTest(url_name=url_name, size=size):
+                    self.assertWithinQueryBudget(url_name, budget, users)
+
+    def assertWithinQueryBudget(self, url_name, budget, users):
+        if budget.role:
+            self.client.force_login(users[budget.role])
+        else:
+            self.client.logout()
+
+        url = reverse('{}:{}'.format(self.url_namespace, url_name), kwargs={
+            key: self._resolve(value) for key, value in budget.kwargs.items()})
+        params = {key: self._resolve(value)
+                  for key, value in budget.params.items()}
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params, **budget.headers)
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+
+        self.assertLess(response.status_code, 400, url)
+        self.assertLessEqual(
+            len(context), budget.queries,
+            '{} ran {} queries, over its budget of {}:\n{}'.format(
+                url, len(context), budget.queries,
+                '\n'.join(query['sql'] for query in context.captured_queries)))
+
+    def _resolve(self, value):
+        return value(self) if callable(value) else value
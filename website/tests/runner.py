@@ -0,0 +1,24 @@
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the tests with the files they write in a temporary directory,
+    instead of the system-wide ``METRICS_DIR`` and the project's media."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directory = tempfile.mkdtemp(prefix='eventplanner-tests-')
+        self.temporary_settings = override_settings(
+            METRICS_DIR=os.path.join(self.directory, 'metrics'),
+            MEDIA_ROOT=os.path.join(self.directory, 'media'))
+        self.temporary_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.temporary_settings.disable()
+        shutil.rmtree(self.directory)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+
+from django.core.signals import request_finished
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from website import live
+from website.asgi import ThreadedWsgiToAsgi
+from website.tests.test_live import create_businesses
+
+
+def make_scope(path):
+    return {'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': b'', 'headers': [], 'server': ('testserver', 80),
+            'http_version': '1.1'}
+
+
+async def call_async(application, path):
+    messages = []
+    request = {'type': 'http.request', 'body': b''}
+
+    async def receive():
+        return request
+
+    async def send(message):
+        messages.append(message)
+
+    await application(make_scope(path), receive, send)
+    return messages
+
+
+def call(application, path):
+    return asyncio.run(call_async(application, path))
+
+
+class ThreadedWsgiToAsgiTests(SimpleTestCase):
+
+    def setUp(self):
+        self.application = ThreadedWsgiToAsgi(get_wsgi_application(), 2)
+        self.addCleanup(self.application.executor.shutdown)
+
+    def test_page_served_from_pool_thread(self):
+        threads = []
+
+        def finished(**kwargs):
+            threads.append(threading.current_thread().name)
+
+        request_finished.connect(finished)
+        self.addCleanup(request_finished.disconnect, finished)
+
+        messages = call(self.application, '/')
+
+        self.assertEqual(messages[0]['type'], 'http.response.start')
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn(b'<html', b''.join(
+            message.get('body', b'') for message in messages[1:]))
+        self.assertFalse(messages[-1].get('more_body'))
+        # The response was closed on the pool thread.
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('asgi'))
+
+    def test_lifespan(self):
+        incoming = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+
+@override_settings(LIVE_UPDATES_BROKER='website.live.LocalBroker',
+                   LIVE_UPDATES_HEARTBEAT_SECONDS=5,
+                   LIVE_UPDATES_STREAM_SECONDS=5)
+class LiveStreamTests(TransactionTestCase):
+
+    def setUp(self):
+        # One thread, which an open stream must not hold.
+        self.application = ThreadedWsgiToAsgi(get_wsgi_application(), 1)
+        self.addCleanup(self.application.executor.shutdown)
+        self.business, = create_businesses('business')
+        self.channel = live.business_channel(self.business.pk)
+
+    def test_stream_holds_no_thread(self):
+        async def scenario():
+            sent = []
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            stream = asyncio.ensure_future(self.application(
+                make_scope(reverse('website:business_live',
+                                   kwargs={'pk': self.business.pk})),
+                receive, send))
+            while len(sent) < 3:
+                await asyncio.sleep(0.01)
+
+            page = await asyncio.wait_for(
+                call_async(self.application, '/'), 5)
+            live.get_broker().publish(self.channel,
+                                      {'action': 'booked', 'event': 1})
+            while len(sent) < 4:
+                await asyncio.sleep(0.01)
+            disconnected.set()
+            await asyncio.wait_for(stream, 5)
+            return sent, page
+
+        sent, page = asyncio.run(scenario())
+
+        self.assertEqual(page[0]['status'], 200)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'),
+                      sent[0]['headers'])
+        self.assertEqual(sent[1]['body'], b'retry: 1000\n\n')
+        self.assertRegex(sent[2]['body'], rb'^id: \d+\n\n$')
+        self.assertEqual(sent[3]['body'], live.format_message(
+            {'action': 'booked', 'event': 1}).encode())
+        self.assertNotIn(self.channel, live.get_broker().subscriptions)
+
+    @override_settings(LIVE_UPDATES_STREAM_SECONDS=0)
+    def test_stream_resumes_from_last_event_id(self):
+        async def scenario(last_event_id):
+            sent = []
+
+            async def receive():
+                await asyncio.Event().wait()
+
+            async def send(message):
+                sent.append(message)
+
+            scope = make_scope(reverse('website:business_live',
+                                       kwargs={'pk': self.business.pk}))
+            scope['headers'] = [(b'Last-Event-ID', last_event_id)]
+            await asyncio.wait_for(self.application(scope, receive, send), 5)
+            return sent[2]['body']
+
+        live.get_broker()
+        current = str(live.make_event_id()).encode()
+        self.assertRegex(asyncio.run(scenario(current)), rb'^id: \d+\n\n$')
+        # Ids older than the broker cannot tell what was missed.
+        self.assertIn(b'"action": "missed"', asyncio.run(scenario(b'1')))
+
+    def test_unknown_business(self):
+        messages = call(self.application, reverse(
+            'website:business_live', kwargs={'pk': self.business.pk + 1}))
+        self.assertEqual(messages[0]['status'], 404)
@@ -0,0 +1,43 @@
+from django.test import Client as RequestClient, TestCase
+
+from website.backends import ProfileModelBackend
+from website.tests.test_models import (create_client, create_contractor,
+                                       create_user)
+
+
+class ProfileModelBackendTests(TestCase):
+
+    def test_client_loaded_with_profile(self):
+        client = create_client()
+
+        with self.assertNumQueries(1):
+            user = ProfileModelBackend().get_user(client.user.pk)
+            self.assertTrue(user.is_client())
+            self.assertEqual(user.client, client)
+            self.assertFalse(hasattr(user, 'contractor'))
+
+    def test_contractor_loaded_with_profile(self):
+        contractor = create_contractor()
+
+        with self.assertNumQueries(1):
+            user = ProfileModelBackend().get_user(contractor.user.pk)
+            self.assertTrue(user.is_contractor())
+            self.assertEqual(user.contractor, contractor)
+
+    def test_inactive_user_not_loaded(self):
+        user = create_user()
+        user.is_active = False
+        user.save()
+
+        self.assertIsNone(ProfileModelBackend().get_user(user.pk))
+
+    def test_sessions_of_the_model_backend_stay_logged_in(self):
+        client = create_client()
+        rc = RequestClient()
+        rc.force_login(client.user,
+                       backend='django.contrib.auth.backends.ModelBackend')
+
+        response = rc.get('/events/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], client.user)
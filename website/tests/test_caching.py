@@ -0,0 +1,163 @@
+import datetime
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client as RequestClient, TestCase, override_settings
+from django.utils import timezone
+
+from website.tests.test_models import (create_business, create_business_type,
+                                       create_client, create_contractor,
+                                       create_event, create_opinion)
+
+
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.business_type = create_business_type()
+        self.business = create_business(
+            'some_business', self.business_type, create_contractor())
+
+    def test_ranking_served_from_cache(self):
+        RequestClient().get('/ranking/')
+
+        with self.assertNumQueries(0):
+            response = RequestClient().get('/ranking/')
+        self.assertContains(response, 'some_business')
+
+    def test_ranking_invalidated_by_opinion(self):
+        RequestClient().get('/ranking/')
+        create_opinion(4, self.business)
+
+        response = RequestClient().get('/ranking/')
+        self.assertContains(response, '4.0')
+
+    def test_business_page_invalidated_by_business_type(self):
+        url = '/business/{}/'.format(self.business.pk)
+        RequestClient().get(url)
+        self.business_type.business_type = 'catering'
+        self.business_type.save()
+
+        response = RequestClient().get(url)
+        self.assertContains(response, 'catering')
+
+    def test_opinions_page_invalidated_by_opinion(self):
+        url = '/business/{}/opinions/'.format(self.business.pk)
+        self.assertContains(RequestClient().get(url), 'No opinions')
+        create_opinion(4, self.business, 'Lovely cake')
+
+        self.assertContains(RequestClient().get(url), 'Lovely cake')
+
+    def test_authenticated_user_not_served_anonymous_page(self):
+        self.assertContains(RequestClient().get('/ranking/'), 'Register as:')
+
+        rc = RequestClient()
+        rc.force_login(create_client().user)
+        response = rc.get('/ranking/')
+
+        self.assertNotContains(response, 'Register as:')
+        self.assertContains(response, 'some_business')
+
+    def test_schedule_etag_invalidated_by_booking(self):
+        now = timezone.now()
+        url = '/business/{}/schedule/'.format(self.business.pk)
+        params = {
+            'from': int(now.timestamp() * 1000),
+            'to': int((now + datetime.timedelta(days=7)).timestamp() * 1000)
+        }
+        etag = RequestClient().get(url, params)['ETag']
+
+        event = create_event(now + datetime.timedelta(days=1),
+                             now + datetime.timedelta(days=2),
+                             create_client())
+        self.assertEqual(RequestClient().get(url, params)['ETag'], etag)
+        event.businesses.add(self.business)
+
+        self.assertNotEqual(RequestClient().get(url, params)['ETag'], etag)
+
+
+class FileBasedPageCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+            }
+        })
+        self.settings.enable()
+        self.business = create_business(
+            'some_business', create_business_type(), create_contractor())
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.cache_dir)
+
+    def test_business_page_invalidated_by_rename(self):
+        url = '/business/{}/'.format(self.business.pk)
+        RequestClient().get(url)
+        with self.assertNumQueries(0):
+            RequestClient().get(url)
+
+        self.business.name = 'renamed_business'
+        self.business.save()
+
+        self.assertContains(RequestClient().get(url), 'renamed_business')
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.business_type = create_business_type()
+        self.business = create_business(
+            'some_business', self.business_type, create_contractor())
+
+    def test_business_page_not_modified(self):
+        url = '/business/{}/'.format(self.business.pk)
+        response = RequestClient().get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = RequestClient().get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+
+    def test_business_page_not_modified_since(self):
+        url = '/business/{}/'.format(self.business.pk)
+        last_modified = RequestClient().get(url)['Last-Modified']
+
+        response = RequestClient().get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_opinions_etag_changed_by_opinion(self):
+        url = '/business/{}/opinions/'.format(self.business.pk)
+        etag = RequestClient().get(url)['ETag']
+        create_opinion(4, self.business)
+
+        response = RequestClient().get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_businesses_etag_changed_by_business_type(self):
+        etag = RequestClient().get('/businesses/')['ETag']
+        self.business_type.business_type = 'catering'
+        self.business_type.save()
+
+        response = RequestClient().get('/businesses/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertContains(response, 'catering')
+
+    def test_ranking_etag_differs_per_user(self):
+        etag = RequestClient().get('/ranking/')['ETag']
+
+        rc = RequestClient()
+        rc.force_login(create_client().user)
+        response = rc.get('/ranking/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,244 @@
+from io import StringIO
+import datetime
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, TestCase
+from django.utils import timezone
+
+from website.models import (Business, Event, ImportCheckpoint, Opinion,
+                            OpinionEligibility)
+from website.search import get_search_backend
+from website.tests.test_models import (create_business, create_business_type,
+                                       create_client, create_contractor,
+                                       create_event, create_opinion)
+
+
+class RebuildRatingsCommandTests(TestCase):
+
+    def setUp(self):
+        self.business = create_business(
+            name='business',
+            business_type=create_business_type(),
+            owner=create_contractor()
+        )
+        create_opinion(5, self.business)
+        create_opinion(2, self.business)
+
+    def test_check_passes_for_maintained_aggregates(self):
+        out = StringIO()
+        call_command('rebuild_ratings', check=True, stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+    def test_rebuild_fixes_stale_aggregates(self):
+        Business.objects.filter(pk=self.business.pk).update(
+            opinion_count=0, rating_sum=0, rating_5_count=0,
+            average_rating=None)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_ratings', check=True, stdout=StringIO())
+
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.business.refresh_from_db()
+
+        self.assertEqual(self.business.opinion_count, 2)
+        self.assertEqual(self.business.rating_5_count, 1)
+        self.assertEqual(self.business.get_average_rating(), 3.5)
+
+
+class EndEventsCommandTests(TestCase):
+
+    def test_marks_past_events(self):
+        now = timezone.now()
+        event = create_event(now - datetime.timedelta(days=2),
+                             now - datetime.timedelta(days=1), create_client())
+        Event.objects.filter(pk=event.pk).update(ended=False)
+
+        out = StringIO()
+        call_command('end_events', stdout=out)
+
+        self.assertIn('Ended 1 events.', out.getvalue())
+        self.assertTrue(Event.objects.get(pk=event.pk).ended)
+
+
+class ImportDataCommandTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.contractor = create_contractor()
+        self.client = create_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record) + '\n' for record in records))
+
+    def test_import_businesses_csv(self):
+        path = self.write('businesses.csv', (
+            'name,business_type,owner,description\n'
+            'Cake Shop,catering,contractor,"Cakes, pies"\n'
+            'Hall,venue,contractor,\n'
+        ))
+
+        call_command('import_data', 'businesses', path, chunk_size=1,
+                     stdout=StringIO())
+
+        business = Business.objects.get(name='Cake Shop')
+        self.assertEqual(str(business.business_type), 'catering')
+        self.assertEqual(business.description, 'Cakes, pies')
+        self.assertEqual(list(get_search_backend().search('cake').seek(
+            None, False, 10)), [business])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_import_events_and_opinions(self):
+        business = create_business('business', create_business_type(),
+                                   self.contractor)
+        now = timezone.now()
+        events = self.write_jsonl('events.jsonl', [{
+            'id': 10,
+            'title': 'Wedding',
+            'date_from': (now - datetime.timedelta(days=2)).isoformat(),
+            'date_to': (now - datetime.timedelta(days=1)).isoformat(),
+            'owner': 'client',
+            'businesses': [business.pk]
+        }])
+        opinions = self.write_jsonl('opinions.jsonl', [
+            {'business': business.pk, 'rating': 5, 'text': 'Great',
+             'author': 'client', 'event': 10},
+            {'business': business.pk, 'rating': 2, 'text': 'Meh'},
+        ])
+
+        call_command('import_data', 'events', events, stdout=StringIO())
+        call_command('import_data', 'opinions', opinions, stdout=StringIO())
+
+        self.assertEqual(list(Event.objects.get(pk=10).businesses.all()),
+                         [business])
+        self.assertEqual(Opinion.objects.get(text='Great').author,
+                         self.client)
+        business.refresh_from_db()
+        self.assertEqual(business.get_average_rating(), 3.5)
+        eligibility = OpinionEligibility.objects.get(client=self.client,
+                                                     business=business)
+        self.assertEqual((eligibility.ended_events, eligibility.opinions),
+                         (1, 1))
+
+    def test_failed_import_resumes(self):
+        path = self.write_jsonl('businesses.jsonl', [
+            {'name': 'first', 'business_type': 'venue', 'owner': 'contractor'},
+            {'name': 'second', 'business_type': 'venue', 'owner': 'nobody'},
+        ])
+
+        with self.assertRaises(CommandError):
+            call_command('import_data', 'businesses', path, chunk_size=1,
+                         stdout=StringIO())
+        self.assertEqual(ImportCheckpoint.objects.get().records, 1)
+
+        self.write_jsonl('businesses.jsonl', [
+            {'name': 'first', 'business_type': 'venue', 'owner': 'contractor'},
+            {'name': 'second', 'business_type': 'venue',
+             'owner': 'contractor'},
+        ])
+        call_command('import_data', 'businesses', path, chunk_size=1,
+                     stdout=StringIO())
+
+        self.assertEqual(sorted(Business.objects.values_list(
+            'name', flat=True)), ['first', 'second'])
+
+
+class ExportEventsCommandTests(TestCase):
+
+    def test_export_client_events(self):
+        client = create_client()
+        now = timezone.now()
+        for days in range(3):
+            create_event(now + datetime.timedelta(days=days),
+                         now + datetime.timedelta(days=days, hours=1),
+                         client, title='event {}'.format(days))
+
+        out = StringIO()
+        call_command('export_events', '--client=client', '--chunk-size=2',
+                     stdout=out)
+
+        self.assertEqual(
+            [line.split(',')[1] for line in out.getvalue().splitlines()],
+            ['title', 'event 0', 'event 1', 'event 2'])
+
+    def test_unknown_business(self):
+        with self.assertRaises(CommandError):
+            call_command('export_events', '--business=1', stdout=StringIO())
+
+
+class GenerateDataCommandTests(TestCase):
+
+    def test_generate_small_dataset(self):
+        call_command('generate_data', '20', '--chunk-size=7', stdout=StringIO())
+
+        self.assertEqual(Business.objects.count(), 20)
+        self.assertEqual(Event.objects.count(), 40)
+        self.assertEqual(Opinion.objects.count(), 60)
+        call_command('rebuild_ratings', check=True, stdout=StringIO())
+        self.assertTrue(self.client.login(username='client0',
+                                          password='p4ssw0rd'))
+
+    def test_benchmark_writes_results(self):
+        call_command('generate_data', '10', stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'results.json')
+
+        call_command('benchmark', '--repeat=2', '--label=test',
+                     '--output={}'.format(path), stdout=StringIO())
+
+        with open(path) as results:
+            report = json.load(results)
+        self.assertEqual(report['label'], 'test')
+        run = report['runs'][0]
+        self.assertEqual(run['rows']['business'], 10)
+        self.assertIn('RankingView.get_queryset', run['results'])
+        self.assertEqual(run['results']['RankingView.get_queryset']['queries'],
+                         1)
+
+    def test_benchmark_needs_data(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark', stdout=StringIO())
+
+
+class LoadtestCommandTests(LiveServerTestCase):
+
+    def test_reports_every_action(self):
+        call_command('generate_data', '5', '--clients=2', '--contractors=2',
+                     stdout=StringIO())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'results.json')
+
+        out = StringIO()
+        call_command('loadtest', self.live_server_url, '--rps=100',
+                     '--duration=1', '--users=2', '--workers=1', '--seed=1',
+                     '--output={}'.format(path), stdout=out)
+
+        with open(path) as results:
+            report = json.load(results)['results']
+        self.assertEqual(report['login']['requests'], 4)
+        self.assertEqual(report['login']['errors'], 0)
+        self.assertEqual(sum(row['requests'] for name, row in report.items()
+                             if name != 'login'), 100)
+        for name in ('businesses', 'business', 'events', 'main'):
+            self.assertEqual(report[name]['errors'], 0, name)
+        self.assertIn('p99 ms', out.getvalue())
+
+    def test_unknown_action(self):
+        with self.assertRaises(CommandError):
+            call_command('loadtest', self.live_server_url, '--mix=unknown=1')
@@ -0,0 +1,184 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from website import jobs
+from website.models import Job
+
+calls = []
+
+
+@jobs.task
+def record(value):
+    calls.append(value)
+
+
+@jobs.task
+def fail():
+    raise RuntimeError('Task failed.')
+
+
+def not_a_task():
+    pass
+
+
+class EnqueueTests(TestCase):
+
+    def test_enqueue(self):
+        job = jobs.enqueue(record, {'value': 1}, priority=5, delay=60)
+
+        job.refresh_from_db()
+        self.assertEqual(job.task, 'website.tests.test_jobs.record')
+        self.assertEqual(job.arguments, '{"value": 1}')
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.priority, 5)
+        self.assertGreater(job.run_at, timezone.now())
+
+    def test_enqueue_rejects_functions_that_are_not_tasks(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue(not_a_task)
+        self.assertFalse(Job.objects.exists())
+
+    def test_enqueue_with_key_adds_one_job(self):
+        first = jobs.enqueue(record, {'value': 1}, key='record:1')
+        second = jobs.enqueue(record, {'value': 2}, key='record:1')
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.get().arguments, '{"value": 1}')
+
+
+class ClaimTests(TestCase):
+
+    def test_claim_takes_due_jobs_by_priority(self):
+        low = jobs.enqueue(record, {'value': 1})
+        high = jobs.enqueue(record, {'value': 2}, priority=1)
+        jobs.enqueue(record, {'value': 3}, priority=2, delay=60)
+
+        self.assertEqual(Job.objects.claim('worker', 1), [high.pk])
+        self.assertEqual(Job.objects.claim('worker', 5), [low.pk])
+        self.assertEqual(Job.objects.claim('worker', 5), [])
+
+        high.refresh_from_db()
+        self.assertEqual(high.status, Job.RUNNING)
+        self.assertEqual(high.worker, 'worker')
+        self.assertEqual(high.attempts, 1)
+
+    def test_requeue_stale(self):
+        job = jobs.enqueue(record, {'value': 1})
+        Job.objects.claim('worker', 1)
+
+        self.assertEqual(Job.objects.requeue_stale(
+            timezone.now() - datetime.timedelta(hours=1)), 0)
+        self.assertEqual(Job.objects.requeue_stale(
+            timezone.now() + datetime.timedelta(seconds=1)), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+
+    def test_stale_jobs_out_of_attempts_fail(self):
+        job = jobs.enqueue(record, {'value': 1}, max_attempts=1)
+        Job.objects.claim('worker', 1)
+        started_before = timezone.now() + datetime.timedelta(seconds=1)
+
+        self.assertEqual(Job.objects.requeue_stale(started_before), 0)
+        self.assertEqual(Job.objects.fail_stale(started_before), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertTrue(job.last_error)
+
+
+@override_settings(JOB_RETRY_DELAY=10, JOB_MAX_RETRY_DELAY=30)
+class RunJobTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_job(self):
+        job = jobs.enqueue(record, {'value': 1})
+        Job.objects.claim('worker', 1)
+
+        self.assertTrue(jobs.run_job(job.pk))
+
+        self.assertEqual(calls, [1])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_job_is_retried_later(self):
+        job = jobs.enqueue(fail, max_attempts=2)
+        Job.objects.claim('worker', 1)
+
+        with self.assertLogs('website.jobs', 'WARNING'):
+            self.assertFalse(jobs.run_job(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('Task failed.', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + datetime.timedelta(
+            seconds=7))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        Job.objects.claim('worker', 1)
+        with self.assertLogs('website.jobs', 'ERROR'):
+            self.assertFalse(jobs.run_job(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_retry_delay_grows_up_to_the_maximum(self):
+        with mock.patch('random.uniform', return_value=1):
+            self.assertEqual([jobs.get_retry_delay(attempts)
+                              for attempts in range(1, 5)], [10, 20, 30, 30])
+
+
+class WorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_due_jobs(self):
+        for value in range(5):
+            jobs.enqueue(record, {'value': value})
+        jobs.enqueue(record, {'value': 5}, delay=60)
+
+        count = jobs.Worker(concurrency=2, poll_interval=0.01).run(once=True)
+
+        self.assertEqual(count, 5)
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 5)
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_worker_requeues_stale_jobs_while_running(self):
+        job = jobs.enqueue(record, {'value': 1})
+        Job.objects.claim('dead worker', 1)
+        Job.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - datetime.timedelta(hours=2))
+        worker = jobs.Worker(concurrency=1, poll_interval=0.01)
+        worker.requeue_interval = 0
+
+        with mock.patch.object(Job.objects, 'requeue_stale',
+                               wraps=Job.objects.requeue_stale) as requeue, \
+                self.assertLogs('website.jobs', 'WARNING'):
+            self.assertEqual(worker.run(once=True), 1)
+
+        self.assertEqual(calls, [1])
+        self.assertGreater(requeue.call_count, 1)
+
+    def test_run_workers_command(self):
+        jobs.enqueue(record, {'value': 1})
+        out = StringIO()
+
+        call_command('run_workers', once=True, poll_interval=0.01,
+                     stdout=out)
+
+        self.assertEqual(calls, [1])
+        self.assertIn('Ran 1 jobs.', out.getvalue())
+
+    def test_run_workers_command_rejects_no_concurrency(self):
+        with self.assertRaises(CommandError):
+            call_command('run_workers', once=True, concurrency=0)
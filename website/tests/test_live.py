@@ -0,0 +1,160 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from website import live
+from website.tests.test_models import (create_business, create_business_type,
+                                       create_client, create_contractor,
+                                       create_event)
+
+
+def create_businesses(*names):
+    business_type = create_business_type()
+    owner = create_contractor()
+    return [create_business(name, business_type, owner) for name in names]
+
+
+class BrokerTests(TestCase):
+
+    def test_local_broker(self):
+        broker = live.LocalBroker()
+        subscription = broker.subscribe('business:1')
+        other = broker.subscribe('business:2')
+
+        broker.publish('business:1', {'event': 1})
+
+        self.assertEqual(subscription.get(0), {'event': 1})
+        self.assertIsNone(other.get(0))
+        subscription.close()
+        other.close()
+        self.assertFalse(broker.subscriptions)
+
+    def test_file_broker_shares_messages(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(LIVE_UPDATES_PATH=os.path.join(
+                directory, 'live.jsonl')):
+            # Brokers of two processes share the file.
+            publisher, listener = live.FileBroker(), live.FileBroker()
+        subscription = listener.subscribe('business:1')
+
+        publisher.publish('business:1', {'event': 1})
+
+        self.assertEqual(subscription.get(5), {'event': 1})
+        subscription.close()
+
+    def test_file_broker_starts_new_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'live.jsonl')
+        with override_settings(LIVE_UPDATES_PATH=path):
+            publisher, listener = live.FileBroker(), live.FileBroker()
+        publisher.max_size = 100
+        subscription = listener.subscribe('business:1')
+
+        for event in range(10):
+            publisher.publish('business:1', {'event': event})
+            self.assertEqual(subscription.get(5), {'event': event})
+
+        self.assertLess(os.path.getsize(path), 100)
+        subscription.close()
+
+
+@override_settings(LIVE_UPDATES_BROKER='website.live.LocalBroker')
+class BookingNotificationTests(TransactionTestCase):
+
+    def setUp(self):
+        self.first, self.second = create_businesses('first', 'second')
+        broker = live.get_broker()
+        self.subscriptions = [broker.subscribe(live.business_channel(pk))
+                              for pk in (self.first.pk, self.second.pk)]
+
+    def tearDown(self):
+        for subscription in self.subscriptions:
+            subscription.close()
+
+    def get_messages(self, index):
+        messages = []
+        message = self.subscriptions[index].get(0)
+        while message is not None:
+            self.assertIsInstance(message.pop('id'), int)
+            messages.append(message)
+            message = self.subscriptions[index].get(0)
+        return messages
+
+    def test_booking_changes_published(self):
+        now = timezone.now()
+        event = create_event(now, now + datetime.timedelta(hours=1),
+                             create_client(), business=self.first)
+        self.assertEqual(self.get_messages(0),
+                         [{'action': 'booked', 'event': event.pk}])
+
+        event.title = 'renamed'
+        event.save()
+        event.businesses.set([self.second])
+        self.assertEqual(self.get_messages(0), [
+            {'action': 'updated', 'event': event.pk},
+            {'action': 'unbooked', 'event': event.pk}])
+
+        pk = event.pk
+        event.delete()
+        self.assertEqual(self.get_messages(1), [
+            {'action': 'booked', 'event': pk},
+            {'action': 'deleted', 'event': pk}])
+
+
+@override_settings(LIVE_UPDATES_BROKER='website.live.LocalBroker',
+                   LIVE_UPDATES_HEARTBEAT_SECONDS=0.01,
+                   LIVE_UPDATES_THREADED_STREAM_SECONDS=5,
+                   LIVE_UPDATES_THREADED_RECONNECT_SECONDS=20)
+class BusinessLiveViewTests(TestCase):
+
+    def test_stream(self):
+        business, = create_businesses('business')
+        response = self.client.get(reverse('website:business_live',
+                                           kwargs={'pk': business.pk}))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+
+        self.assertEqual(next(chunks), b'retry: 20000\n\n')
+        self.assertRegex(next(chunks), rb'^id: \d+\n\n$')
+        self.assertEqual(next(chunks), b':\n\n')
+        live.get_broker().publish(live.business_channel(business.pk),
+                                  {'action': 'booked', 'event': 1})
+        self.assertEqual(next(chunks).decode(), 'event: booking\ndata: {}\n\n'
+                         .format(json.dumps({'action': 'booked', 'event': 1})))
+        response.close()
+
+    def test_reconnection(self):
+        business, = create_businesses('business')
+        channel = live.business_channel(business.pk)
+        url = reverse('website:business_live', kwargs={'pk': business.pk})
+
+        def reconnect(last_event_id):
+            response = self.client.get(url, HTTP_LAST_EVENT_ID=last_event_id)
+            chunks = iter(response.streaming_content)
+            next(chunks)
+            first = next(chunks).decode()
+            response.close()
+            return first
+
+        broker = live.get_broker()
+        last_event_id = live.make_event_id()
+        self.assertRegex(reconnect(str(last_event_id)), r'^id: \d+\n\n$')
+
+        broker.publish(channel, {'action': 'booked', 'event': 1,
+                                 'id': live.make_event_id()})
+        # The calendar missed the booking.
+        self.assertIn('"action": "missed"', reconnect(str(last_event_id)))
+        self.assertIn('"action": "missed"', reconnect('unknown'))
+
+    def test_unknown_business(self):
+        response = self.client.get(reverse('website:business_live',
+                                           kwargs={'pk': 1}))
+        self.assertEqual(response.status_code, 404)
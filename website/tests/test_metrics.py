@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from website import metrics
+from website.tests.test_models import create_client, create_user
+
+
+def _count_in_child(directory):
+    with override_settings(METRICS_DIR=directory):
+        metrics.EVENTS_CREATED.inc(5)
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(METRICS_DIR=self.directory,
+                                          METRICS_TOKEN='secret')
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory)
+
+    def get_metrics(self):
+        response = self.client.get('/metrics',
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode().splitlines()
+
+    def test_request_metrics(self):
+        self.client.get('/ranking/')
+        self.client.get('/ranking/')
+
+        lines = self.get_metrics()
+        self.assertIn('website_http_responses_total{status="200",'
+                      'url_name="website:ranking"} 2', lines)
+        self.assertIn('website_http_request_duration_seconds_bucket{'
+                      'le="+Inf",method="GET",url_name="website:ranking"} 2',
+                      lines)
+        self.assertIn('website_page_cache_lookups_total{page="ranking",'
+                      'result="hit"} 1', lines)
+        self.assertIn('# TYPE website_db_queries_per_request histogram',
+                      lines)
+
+    def test_domain_counters(self):
+        create_client()
+        self.assertIn('website_registrations_total{role="client"} 1',
+                      self.get_metrics())
+
+    def test_processes_summed(self):
+        metrics.EVENTS_CREATED.inc()
+        process = multiprocessing.get_context('fork').Process(
+            target=_count_in_child, args=(self.directory,))
+        process.start()
+        process.join()
+
+        self.assertIn('website_events_created_total 6', self.get_metrics())
+
+    def test_values_file_grows(self):
+        for index in range(5000):
+            metrics.REGISTRATIONS.inc(role='role {}'.format(index))
+        self.assertIn('website_registrations_total{role="role 4999"} 1',
+                      self.get_metrics())
+
+    def test_dead_process_files_removed(self):
+        metrics.EVENTS_CREATED.inc()
+        process = multiprocessing.get_context('fork').Process(
+            target=_count_in_child, args=(self.directory,))
+        process.start()
+        process.join()
+
+        removed = metrics.remove_dead_process_files()
+
+        self.assertEqual(removed, [os.path.join(
+            self.directory, 'metrics-{}.db'.format(process.pid))])
+        self.assertIn('website_events_created_total 1', self.get_metrics())
+
+    def test_metrics_restricted(self):
+        # Requests through a local reverse proxy come from localhost.
+        response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/metrics',
+                                   HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+        staff = create_user()
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_without_a_token_for_staff_only(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
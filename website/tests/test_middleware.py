@@ -0,0 +1,72 @@
+from io import StringIO
+import os
+import re
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from website.querylog import fingerprint
+from website.tests.test_models import (create_business, create_business_type,
+                                       create_contractor)
+
+
+class ServerTimingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        create_business('some_business', create_business_type(),
+                        create_contractor())
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_timing_reported(self):
+        with self.assertLogs('website.timing', 'INFO') as logs:
+            response = self.client.get('/businesses/')
+
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;desc="\d+ queries";dur=[\d.]+')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        self.assertGreater(
+            float(re.search(r'tpl;dur=([\d.]+)', timing).group(1)), 0)
+        self.assertIn('url_name=website:businesses', logs.output[0])
+        self.assertIn('status=200', logs.output[0])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_not_timed(self):
+        response = self.client.get('/businesses/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class QueryLogTests(TestCase):
+
+    def setUp(self):
+        create_business('some_business', create_business_type(),
+                        create_contractor())
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'queries.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT "a" FROM "t"  WHERE "b" IN (%s, %s, %s) '
+                        "AND name = 'x' LIMIT 21"),
+            'SELECT "a" FROM "t" WHERE "b" IN (...) AND name = ? LIMIT ?')
+
+    def test_queries_logged_and_aggregated(self):
+        with self.settings(QUERY_LOG_SAMPLE_RATE=1, QUERY_LOG_PATH=self.path,
+                           SLOW_QUERY_THRESHOLD_MS=0):
+            with self.assertLogs('website.queries', 'WARNING') as logs:
+                self.client.get('/businesses/')
+                self.client.get('/businesses/')
+
+        self.assertIn('website:businesses', logs.output[0])
+        self.assertIn(' at website/pagination.py:', logs.output[0])
+        self.assertTrue(any('SCAN' in line or 'SEARCH' in line
+                            for line in logs.output))
+
+        out = StringIO()
+        call_command('slow_queries', path=self.path, limit=1, stdout=out)
+        self.assertIn('2 queries', out.getvalue())
+        self.assertIn('website_business', out.getvalue())
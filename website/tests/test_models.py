@@ -1,10 +1,12 @@
 import datetime
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from website.models import (Business, BusinessType, Client, Contractor, Event,
-                            Opinion, Role, User)
+                            Opinion, OpinionEligibility, Role, User)
 
 
 def create_user(username='username', password='p4ssw0rd',
@@ -70,6 +72,14 @@ def create_opinion(rating, business, text='opinion text'):
     )
 
 
+def explain(queryset):
+    """Returns the steps of the SQLite query plan of ``queryset``."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+
 class UserModelTests(TestCase):
 
     def setUp(self):
@@ -126,6 +136,76 @@ class BusinessModelTests(TestCase):
 
         self.assertEqual(self.business.get_average_rating(), 4)
 
+    def test_rating_aggregates_follow_opinion_changes(self):
+        opinion = create_opinion(5, self.business)
+        create_opinion(3, self.business)
+
+        opinion.rating = 1
+        opinion.save()
+        self.assertEqual(self.business.opinion_count, 2)
+        self.assertEqual(self.business.rating_sum, 4)
+        self.assertEqual(self.business.get_average_rating(), 2)
+
+        opinion.delete()
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.get_rating_histogram(),
+                         [(1, 0), (2, 0), (3, 1), (4, 0), (5, 0)])
+        self.assertEqual(self.business.get_average_rating(), 3)
+
+    def test_opinions_move_updated_at_forward(self):
+        updated_at = [self.business.updated_at]
+        for rating in (5, 4):
+            create_opinion(rating, self.business)
+            self.business.refresh_from_db()
+            updated_at.append(self.business.updated_at)
+
+        self.assertLess(updated_at[0], updated_at[1])
+        self.assertLess(updated_at[1], updated_at[2])
+
+    def test_rating_aggregates_after_deleting_all_opinions(self):
+        create_opinion(4, self.business)
+        Opinion.objects.all().delete()
+        self.business.refresh_from_db()
+
+        self.assertEqual(self.business.opinion_count, 0)
+        self.assertIsNone(self.business.get_average_rating())
+
+    def test_lock_takes_the_sqlite_write_lock(self):
+        with CaptureQueriesContext(connection) as queries:
+            Business.objects.filter(pk=self.business.pk).lock()
+
+        # The write lock is held from the first statement of the transaction,
+        # so it is never upgraded from a read lock.
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+
+    def test_busy_during(self):
+        other = create_business('other', self.business.business_type,
+                                self.business.owner)
+        date_from = timezone.now()
+        event = create_event(date_from, date_from + datetime.timedelta(
+            hours=2), self.client, business=self.business)
+        businesses = Business.objects.filter(pk__in=[self.business.pk,
+                                                     other.pk])
+
+        self.assertEqual(list(businesses.busy_during(
+            date_from + datetime.timedelta(hours=1),
+            date_from + datetime.timedelta(hours=3))), [self.business])
+        self.assertFalse(businesses.busy_during(
+            date_from + datetime.timedelta(hours=2),
+            date_from + datetime.timedelta(hours=3)))
+        self.assertFalse(businesses.busy_during(
+            date_from, date_from + datetime.timedelta(hours=1),
+            exclude_event=event))
+
+    def test_busy_during_reads_bookings_of_the_businesses(self):
+        busy = Business.objects.filter(pk=self.business.pk).busy_during(
+            timezone.now(), timezone.now() + datetime.timedelta(hours=1))
+
+        # Events are only looked up by the primary keys of bookings.
+        self.assertIn('(business_id=?)', explain(busy))
+        self.assertNotIn('date_', explain(busy))
+
     def test_event_schedule(self):
         event_duration = datetime.timedelta(days=1)
         time_between_events = datetime.timedelta(hours=12)
@@ -169,3 +249,88 @@ class EventModelTests(TestCase):
         )
 
         self.assertEqual(event.get_duration(), expected_duration)
+
+    def test_booking(self):
+        client = create_client()
+        business_type = create_business_type()
+        contractor = create_contractor()
+        business = create_business('business', business_type, contractor)
+        other = create_business('other', business_type, contractor)
+        date_from = timezone.now()
+        event = create_event(date_from, date_from + datetime.timedelta(
+            hours=1), client, business=business)
+        event.businesses.add(other)
+        create_event(date_from, date_from + datetime.timedelta(hours=1),
+                     client, business=other)
+
+        self.assertEqual(list(Event.objects.booking(business)), [event])
+
+    def test_booking_in_a_window_reads_the_date_index(self):
+        events = Event.objects.overlapping(
+            timezone.now(), timezone.now() + datetime.timedelta(days=7)
+        ).booking(1).order_by('date_from', 'pk')
+
+        self.assertIn('(date_to>?)', explain(events))
+        self.assertNotIn('(business_id=?)', explain(events))
+
+
+class OpinionEligibilityTests(TestCase):
+
+    def setUp(self):
+        self.client = create_client()
+        self.business = create_business(
+            'some_business', create_business_type(), create_contractor())
+        self.now = timezone.now()
+
+    def get_eligibility(self):
+        return OpinionEligibility.objects.get(client=self.client,
+                                              business=self.business)
+
+    def test_past_event_credited_on_booking(self):
+        create_event(self.now - datetime.timedelta(days=2),
+                     self.now - datetime.timedelta(days=1),
+                     self.client, business=self.business)
+
+        self.assertEqual(self.get_eligibility().ended_events, 1)
+        self.assertTrue(self.get_eligibility().can_add_opinion())
+
+    def test_future_event_credited_when_ended(self):
+        event = create_event(self.now + datetime.timedelta(days=1),
+                             self.now + datetime.timedelta(days=2),
+                             self.client, business=self.business)
+        self.assertFalse(OpinionEligibility.objects.exists())
+
+        ended = Event.objects.end_past(self.now + datetime.timedelta(days=3))
+
+        self.assertEqual(ended, 1)
+        self.assertEqual(self.get_eligibility().ended_events, 1)
+        event.refresh_from_db()
+        self.assertTrue(event.ended)
+        self.assertEqual(Event.objects.end_past(
+            self.now + datetime.timedelta(days=3)), 0)
+
+    def test_unbooking_and_deleting_events_debited(self):
+        event = create_event(self.now - datetime.timedelta(days=2),
+                             self.now - datetime.timedelta(days=1),
+                             self.client, business=self.business)
+        create_event(self.now - datetime.timedelta(days=4),
+                     self.now - datetime.timedelta(days=3),
+                     self.client, business=self.business)
+
+        event.businesses.clear()
+        self.assertEqual(self.get_eligibility().ended_events, 1)
+        self.business.event_set.all().delete()
+        self.assertEqual(self.get_eligibility().ended_events, 0)
+
+    def test_opinions_debited_and_restored(self):
+        create_event(self.now - datetime.timedelta(days=2),
+                     self.now - datetime.timedelta(days=1),
+                     self.client, business=self.business)
+        opinion = Opinion.objects.create(rating=4, text='Nice',
+                                         business=self.business,
+                                         author=self.client)
+        self.assertFalse(self.get_eligibility().can_add_opinion())
+
+        opinion.delete()
+
+        self.assertTrue(self.get_eligibility().can_add_opinion())
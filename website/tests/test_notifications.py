@@ -0,0 +1,127 @@
+import datetime
+import json
+from unittest import mock
+
+from django.core import mail
+from django.test import Client as RequestClient, TestCase, override_settings
+from django.utils import timezone
+
+from website import jobs, notifications
+from website.models import BookingNotification, Job
+from website.tests.test_models import (create_business, create_business_type,
+                                       create_client, create_contractor,
+                                       create_event)
+
+
+def run_queued_jobs(task):
+    """Runs the queued jobs of ``task`` as a worker would."""
+    name = '{}.{}'.format(task.__module__, task.__qualname__)
+    for job in Job.objects.filter(task=name, status=Job.QUEUED):
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        Job.objects.claim('worker', 1)
+        jobs.run_job(job.pk)
+
+
+class BookingNotificationTests(TestCase):
+
+    def setUp(self):
+        business_type = create_business_type()
+        self.first = create_contractor('first', email='first@mail.com')
+        self.second = create_contractor('second', email='second@mail.com')
+        self.businesses = [
+            create_business('hall', business_type, self.first),
+            create_business('band', business_type, self.first),
+            create_business('cake', business_type, self.second),
+        ]
+        self.client = create_client()
+        date_from = timezone.now() + datetime.timedelta(days=1)
+        self.event = create_event(date_from,
+                                  date_from + datetime.timedelta(hours=2),
+                                  self.client, title='Wedding')
+        Job.objects.all().delete()
+
+    def test_booking_adds_one_job(self):
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        date_from = timezone.now() + datetime.timedelta(days=2)
+        response = rc.post('/add-event/', {
+            'title': 'Party',
+            'date_from': date_from.strftime('%Y-%m-%d %H:%M:%S'),
+            'date_to': (date_from + datetime.timedelta(hours=1)).strftime(
+                '%Y-%m-%d %H:%M:%S'),
+            'businesses': [business.pk for business in self.businesses],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        job = Job.objects.get()
+        self.assertEqual(job.task,
+                         'website.notifications.record_booking_changes')
+        self.assertEqual(json.loads(job.arguments)['action'], 'booked')
+        self.assertFalse(BookingNotification.objects.exists())
+
+    def test_changes_of_a_window_share_one_digest_job(self):
+        self.event.businesses.add(*self.businesses)
+        self.event.title = 'Big wedding'
+        self.event.save()
+
+        run_queued_jobs(notifications.record_booking_changes)
+
+        self.assertEqual(BookingNotification.objects.filter(
+            action='booked').count(), 3)
+        self.assertEqual(BookingNotification.objects.filter(
+            action='updated', event_title='Big wedding').count(), 3)
+        digest = Job.objects.get(
+            task='website.notifications.send_booking_digests')
+        self.assertGreater(digest.run_at, timezone.now())
+
+    @override_settings(BOOKING_DIGEST_SECONDS=60)
+    def test_digest_window(self):
+        self.assertEqual(notifications.get_digest_window(150),
+                         ('booking-digests:60:2', 30))
+
+    def test_send_booking_digests(self):
+        self.event.businesses.add(*self.businesses)
+        self.event.businesses.remove(self.businesses[2])
+        run_queued_jobs(notifications.record_booking_changes)
+
+        with mock.patch('website.notifications.get_connection',
+                        wraps=notifications.get_connection) as connect:
+            run_queued_jobs(notifications.send_booking_digests)
+
+        connect.assert_called_once_with()
+        # The second contractor's business was booked and unbooked again.
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['first@mail.com'])
+        self.assertIn('Wedding at hall: booked', mail.outbox[0].body)
+        self.assertIn('Wedding at band: booked', mail.outbox[0].body)
+        self.assertFalse(BookingNotification.objects.filter(
+            sent_at=None).exists())
+
+    def test_deleted_events_are_reported(self):
+        self.event.businesses.add(self.businesses[2])
+        run_queued_jobs(notifications.record_booking_changes)
+        notifications.send_booking_digests()
+        self.event.delete()
+        run_queued_jobs(notifications.record_booking_changes)
+
+        notifications.send_booking_digests()
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('Wedding at cake: deleted', mail.outbox[1].body)
+
+    def test_coalesce(self):
+        def notification(action, event_pk=1, business=1):
+            return BookingNotification(action=action, event_pk=event_pk,
+                                       business_id=business)
+
+        booked, updated, unbooked = (notification('booked'),
+                                     notification('updated'),
+                                     notification('unbooked'))
+        other = notification('updated', event_pk=2)
+
+        self.assertEqual(notifications.coalesce([booked, other, updated]),
+                         [booked, other])
+        self.assertEqual(notifications.coalesce([booked, updated, unbooked]),
+                         [])
+        self.assertEqual(notifications.coalesce([updated, unbooked]),
+                         [unbooked])
@@ -0,0 +1,102 @@
+import datetime
+
+from django.test import TestCase, override_settings
+from django.urls import get_resolver
+from django.utils import timezone
+
+from website.models import Business, Event
+from website.tests.query_budget import QueryBudget, QueryBudgetMixin
+from website.tests.test_models import (create_business, create_business_type,
+                                       create_client, create_contractor,
+                                       create_event, create_opinion)
+
+
+def first_business(test):
+    return Business.objects.order_by('pk').first().pk
+
+
+def first_event(test):
+    return Event.objects.order_by('pk').first().pk
+
+
+def milliseconds(delta):
+    return lambda test: int((test.now + delta).timestamp() * 1000)
+
+
+# Live streams end at once, so their content can be read.
+@override_settings(LIVE_UPDATES_THREADED_STREAM_SECONDS=0,
+                   METRICS_TOKEN='secret')
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    budgets = {
+        'index': QueryBudget(0),
+        'register_client': QueryBudget(0),
+        'register_contractor': QueryBudget(0),
+        'login': QueryBudget(0),
+        'logout': QueryBudget(0),
+        'metrics': QueryBudget(0, headers={
+            'HTTP_AUTHORIZATION': 'Bearer secret'}),
+        'profile': QueryBudget(2, role='client'),
+        'edit': QueryBudget(4, role='client'),
+        'main': QueryBudget(3, role='contractor'),
+        'add_business': QueryBudget(3, role='contractor'),
+        'businesses': QueryBudget(2),
+        'business_autocomplete': QueryBudget(1, params={'q': 'bus'}),
+        'ranking': QueryBudget(2),
+        'business': QueryBudget(2, kwargs={'pk': first_business}),
+        'business_schedule': QueryBudget(3, kwargs={'pk': first_business},
+                                         params={
+            'from': milliseconds(-datetime.timedelta(days=30)),
+            'to': milliseconds(datetime.timedelta(days=30))
+        }),
+        'edit_business': QueryBudget(4, role='contractor',
+                                     kwargs={'pk': first_business}),
+        'add_opinion': QueryBudget(3, role='client',
+                                   kwargs={'pk': first_business}),
+        'opinion': QueryBudget(4, kwargs={'pk': first_business}),
+        'events': QueryBudget(4, role='client'),
+        'export_events': QueryBudget(4, role='client',
+                                     kwargs={'export_format': 'csv'}),
+        'business_live': QueryBudget(1, kwargs={'pk': first_business}),
+        'export_business_schedule': QueryBudget(
+            2, kwargs={'pk': first_business, 'export_format': 'ics'}),
+        'add_event': QueryBudget(3, role='client'),
+        'event': QueryBudget(4, role='client', kwargs={'pk': first_event}),
+        'edit_event': QueryBudget(5, role='client', kwargs={'pk': first_event}),
+    }
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.users = None
+
+    def populate(self, size):
+        if self.users is None:
+            self.business_type = create_business_type()
+            self.client_profile = create_client()
+            self.contractor = create_contractor()
+            self.users = {'client': self.client_profile.user,
+                          'contractor': self.contractor.user}
+
+        businesses = [
+            create_business('business', self.business_type, self.contractor)
+            for _ in range(size)
+        ]
+        for index in range(size):
+            event = create_event(
+                self.now - datetime.timedelta(days=index + 1),
+                self.now - datetime.timedelta(days=index),
+                self.client_profile)
+            event.businesses.set(businesses)
+            create_opinion(index % 5 + 1, businesses[index])
+
+        return self.users
+
+    def test_every_url_has_a_budget(self):
+        url_names = {
+            pattern.name
+            for pattern in get_resolver('website.urls').url_patterns
+            if pattern.name
+        }
+        self.assertEqual(url_names - set(self.budgets), set())
+
+    def test_query_budgets(self):
+        self.assertWithinQueryBudgets()
@@ -0,0 +1,155 @@
+from unittest import mock
+import datetime
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from website import routers
+from website.caching import get_versions, make_key
+from website.models import Business
+from website.routers import PIN_SESSION_KEY, ReplicaRouter, RoutingState
+from website.tests.test_models import (create_business, create_business_type,
+                                       create_client, create_contractor)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_outside_requests_use_default_routing(self):
+        self.assertIsNone(self.router.db_for_read(Business))
+        self.assertEqual(self.router.db_for_write(Business), 'default')
+
+    def test_replica_chosen_until_write(self):
+        state = RoutingState()
+        token = routers.activate(state)
+        try:
+            state.use_replicas()
+            self.assertEqual(self.router.db_for_read(Business), 'replica')
+            self.assertEqual(self.router.db_for_write(Business), 'default')
+
+            routers.record_write()
+            self.assertIsNone(self.router.db_for_read(Business))
+            self.assertTrue(state.wrote)
+        finally:
+            routers.deactivate(token)
+
+    def test_pinned_state_ignores_replicas(self):
+        state = RoutingState(pinned=True)
+        state.use_replicas()
+        self.assertIsNone(state.replica)
+
+    def test_replicas_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'website'))
+        self.assertIsNone(self.router.allow_migrate('default', 'website'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingMiddlewareTests(TestCase):
+    """Records where reads are routed, then runs them on the test database,
+    which has no replica."""
+
+    def setUp(self):
+        self.business = create_business(
+            name='business', business_type=create_business_type(),
+            owner=create_contractor())
+        self.routed = []
+        route = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            self.routed.append(route(router, model, **hints))
+            return None
+
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read',
+                                    autospec=True, side_effect=record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_only_pages_use_replica(self):
+        for url in (reverse('website:businesses'), reverse('website:ranking'),
+                    reverse('website:business',
+                            kwargs={'pk': self.business.pk}),
+                    reverse('website:opinion',
+                            kwargs={'pk': self.business.pk})):
+            self.routed = []
+            self.client.get(url)
+            self.assertEqual(set(self.routed), {'replica'}, url)
+
+    def test_pages_read_from_replica_not_cached(self):
+        cache.clear()
+        url = reverse('website:business', kwargs={'pk': self.business.pk})
+        self.client.get(url)
+        self.routed = []
+
+        self.client.get(url)
+
+        # Both the page and its state were read from the replica again.
+        self.assertEqual(set(self.routed), {'replica'})
+        self.assertGreaterEqual(len(self.routed), 2)
+
+    def test_fragments_read_from_replica_not_cached(self):
+        cache.clear()
+        self.client.force_login(create_client().user)
+        self.client.get(reverse('website:business',
+                                kwargs={'pk': self.business.pk}))
+        self.client.get(reverse('website:business_schedule',
+                                kwargs={'pk': self.business.pk}),
+                        {'from': 0, 'to': 1000})
+
+        business_content = make_template_fragment_key('business_content', [
+            self.business.pk,
+            get_versions('business:{}'.format(self.business.pk))[0]])
+        schedule_etag = make_key(
+            'schedule_etag', self.business.pk,
+            datetime.datetime.fromtimestamp(0, datetime.timezone.utc),
+            datetime.datetime.fromtimestamp(1, datetime.timezone.utc),
+            *get_versions('schedule:{}'.format(self.business.pk)))
+        self.assertIsNone(cache.get(business_content))
+        self.assertIsNone(cache.get(schedule_etag))
+
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.client.get(reverse('website:business',
+                                    kwargs={'pk': self.business.pk}))
+        self.assertIsNotNone(cache.get(business_content))
+
+    def test_streamed_schedule_uses_replica(self):
+        response = self.client.get(
+            reverse('website:business_schedule',
+                    kwargs={'pk': self.business.pk}), {'from': 0, 'to': 1000})
+        self.routed = []
+        b''.join(response.streaming_content)
+
+        self.assertEqual(set(self.routed), {'replica'})
+
+    def test_other_pages_use_primary(self):
+        self.client.force_login(create_client().user)
+        self.routed = []
+
+        self.client.get(reverse('website:events'))
+
+        self.assertEqual(set(self.routed), {None})
+
+    def test_write_pins_session_to_primary(self):
+        self.client.force_login(create_client().user)
+        self.assertNotIn(PIN_SESSION_KEY, self.client.session)
+
+        date_from = timezone.now() + datetime.timedelta(days=1)
+        self.client.post(reverse('website:add_event'), {
+            'title': 'event',
+            'date_from': date_from.strftime('%Y-%m-%d %H:%M:%S'),
+            'date_to': (date_from + datetime.timedelta(hours=1)).strftime(
+                '%Y-%m-%d %H:%M:%S'),
+            'businesses': [self.business.pk],
+        })
+        self.assertTrue(self.client.session[PIN_SESSION_KEY])
+
+        self.routed = []
+        self.client.get(reverse('website:business_schedule',
+                                kwargs={'pk': self.business.pk}),
+                        {'from': 0, 'to': 1000})
+        self.assertEqual(set(self.routed), {None})
@@ -0,0 +1,124 @@
+import concurrent.futures
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import Client as RequestClient, TestCase, override_settings
+from PIL import Image
+
+from website import jobs
+from website.models import Job
+from website.tests.test_models import create_client
+from website.thumbnails import (AVATAR_SIZES, get_thumbnail_name,
+                                has_thumbnails, render_thumbnails_now,
+                                schedule_avatar_thumbnails)
+
+
+def create_image_file(name='avatar.jpg', size=(800, 600), image_format='JPEG'):
+    data = io.BytesIO()
+    Image.new('RGB', size, 'red').save(data, format=image_format)
+    return SimpleUploadedFile(name, data.getvalue(), 'image/jpeg')
+
+
+class AvatarThumbnailTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.name = default_storage.save('avatars/avatar.jpg',
+                                         create_image_file())
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_render_all_sizes(self):
+        render_thumbnails_now(self.name)
+
+        for size, pixels in AVATAR_SIZES.items():
+            for webp, image_format in ((False, 'JPEG'), (True, 'WEBP')):
+                with Image.open(default_storage.path(
+                        get_thumbnail_name(self.name, size, webp))) as image:
+                    self.assertEqual(image.format, image_format)
+                    self.assertEqual(image.width, pixels)
+
+        self.assertTrue(has_thumbnails(self.name))
+
+    def test_concurrent_renders_of_one_image(self):
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            renders = [executor.submit(render_thumbnails_now, self.name)
+                       for _ in range(8)]
+        for render in renders:
+            render.result()
+
+        directory = os.path.dirname(default_storage.path(
+            get_thumbnail_name(self.name, 'small')))
+        self.assertEqual(len(os.listdir(directory)), 2 * len(AVATAR_SIZES))
+        self.assertTrue(has_thumbnails(self.name))
+
+    def test_rendered_by_one_job(self):
+        job = schedule_avatar_thumbnails(self.name)
+        self.assertEqual(schedule_avatar_thumbnails(self.name).pk, job.pk)
+
+        Job.objects.claim('worker', 1)
+        self.assertTrue(jobs.run_job(job.pk))
+        self.assertTrue(has_thumbnails(self.name))
+
+    def test_saving_an_avatar_queues_its_thumbnails(self):
+        user = create_client().user
+        # Not the default avatar, which every user shares.
+        self.assertFalse(Job.objects.exists())
+
+        user.avatar = self.name
+        user.save()
+
+        self.assertEqual(Job.objects.get().idempotency_key,
+                         'avatar-thumbnails:{}'.format(self.name))
+
+    @override_settings(AVATAR_MAX_PIXELS=100 * 100)
+    def test_oversized_image_rejected(self):
+        max_image_pixels = Image.MAX_IMAGE_PIXELS
+        with self.assertRaises(ValueError):
+            render_thumbnails_now(self.name)
+        # The process-wide limit is left to other threads.
+        self.assertEqual(Image.MAX_IMAGE_PIXELS, max_image_pixels)
+
+        job = schedule_avatar_thumbnails(self.name)
+        Job.objects.claim('worker', 1)
+        with self.assertLogs('website.thumbnails', 'ERROR'):
+            jobs.run_job(job.pk)
+        self.assertFalse(has_thumbnails(self.name))
+        # Retrying would fail again.
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.DONE)
+
+    def test_avatar_tag_prefers_thumbnails(self):
+        user = create_client().user
+        user.avatar = self.name
+        template = Template("{% load avatars %}{% avatar user 'small' %}")
+
+        html = template.render(Context({'user': user}))
+        self.assertIn(user.avatar.url, html)
+        self.assertNotIn('webp', html)
+
+        render_thumbnails_now(self.name)
+        html = template.render(Context({'user': user}))
+        self.assertIn(default_storage.url(
+            get_thumbnail_name(self.name, 'small', webp=True)), html)
+        self.assertIn(default_storage.url(
+            get_thumbnail_name(self.name, 'small')), html)
+
+    @override_settings(AVATAR_MAX_PIXELS=100 * 100)
+    def test_upload_over_pixel_limit_rejected(self):
+        user = create_client().user
+        rc = RequestClient()
+        rc.force_login(user)
+        rc.post('/profile/edit/', {'avatar': create_image_file()})
+
+        user.refresh_from_db()
+        self.assertEqual(user.avatar.name, 'default_image.png')
+
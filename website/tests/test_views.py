@@ -1,7 +1,9 @@
+import csv
 import datetime
+import json
 
 from django.contrib.messages import get_messages
-from django.test import Client as RequestClient, TestCase
+from django.test import Client as RequestClient, TestCase, override_settings
 from django.utils import timezone
 
 from website.models import Client, Contractor, Event, Role, User, Opinion, \
@@ -229,6 +231,58 @@ class BusinessesListTests(TestCase):
         self.assertEqual(response.context['businesses_list'][0].name,
                          'business_0')
 
+    def test_businesses_paginated(self):
+        for i in range(15, 30):
+            create_business(
+                name='business_{}'.format(i),
+                business_type=Business.objects.first().business_type,
+                owner=self.owner
+            )
+
+        rc = RequestClient()
+        response = rc.get('/businesses/')
+        self.assertTrue(response.context['is_paginated'])
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+        response = rc.get('/businesses/' + response.context['page_obj'].next_url)
+        self.assertEqual(len(response.context['businesses_list']), 5)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+        response = rc.get(
+            '/businesses/' + response.context['page_obj'].previous_url)
+        self.assertEqual(response.context['businesses_list'][0].name,
+                         'business_0')
+
+    def test_businesses_invalid_cursor(self):
+        response = RequestClient().get('/businesses/', {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_by_name_prefix(self):
+        create_business('Sunny Catering', create_business_type('catering'),
+                        self.owner)
+
+        response = RequestClient().get('/businesses/', {'q': 'sunn'})
+        self.assertEqual(
+            [business.name for business in response.context['businesses_list']],
+            ['Sunny Catering'])
+
+    def test_search_follows_business_type_rename(self):
+        business_type = create_business_type('catering')
+        create_business('Sunny', business_type, self.owner)
+        business_type.business_type = 'photography'
+        business_type.save()
+
+        response = RequestClient().get('/businesses/', {'q': 'photo'})
+        self.assertEqual(len(response.context['businesses_list']), 1)
+        response = RequestClient().get('/businesses/', {'q': 'catering'})
+        self.assertEqual(len(response.context['businesses_list']), 0)
+
+    @override_settings(
+        BUSINESS_SEARCH_BACKEND='website.search.SimpleSearchBackend')
+    def test_search_with_simple_backend(self):
+        response = RequestClient().get('/businesses/', {'q': 'business_1'})
+        self.assertEqual(len(response.context['businesses_list']), 6)
+
 
 class EventTests(TestCase):
 
@@ -243,6 +297,26 @@ class EventTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    def test_event_list_pages_cover_all_events(self):
+        now = timezone.now()
+        for day in range(30):
+            create_event(now + datetime.timedelta(days=day // 2),
+                         now + datetime.timedelta(days=day // 2, hours=1),
+                         self.client, title='event_{}'.format(day))
+
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        titles = []
+        url = '/events/'
+        while url:
+            response = rc.get(url)
+            titles += [event.title for event in response.context['events_list']]
+            next_url = response.context['page_obj'].next_url
+            url = next_url and '/events/' + next_url
+
+        self.assertEqual(len(titles), 30)
+        self.assertEqual(len(set(titles)), 30)
+
     def test_event_list_unreachable_by_contractor(self):
         rc = RequestClient()
         rc.force_login(self.contractor.user)
@@ -344,6 +418,142 @@ class EventTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(Event.objects.all().count(), 0)
 
+    def test_add_event_failure_business_booked(self):
+        business = create_business(
+            'some_business', create_business_type(), self.contractor)
+        another_client = create_client(
+            username='another_client',
+            email='another_client@mail.com'
+        )
+        start_time = timezone.now() + datetime.timedelta(days=1)
+        end_time = start_time + datetime.timedelta(days=1)
+        create_event(start_time, end_time, another_client, business=business)
+
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        response = rc.post('/add-event/', {
+            'title': 'event',
+            'date_from': (start_time + datetime.timedelta(hours=12)).strftime(
+                "%Y-%m-%d %H:%M:%S"),
+            'date_to': (end_time + datetime.timedelta(hours=12)).strftime(
+                "%Y-%m-%d %H:%M:%S"),
+            'businesses': [business.pk]
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('businesses', response.context['event_form'].errors)
+        self.assertEqual(Event.objects.all().count(), 1)
+
+    def test_add_event_failure_overlapping_own_event(self):
+        start_time = timezone.now() + datetime.timedelta(days=1)
+        end_time = start_time + datetime.timedelta(days=1)
+        create_event(start_time, end_time, self.client)
+
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        response = rc.post('/add-event/', {
+            'title': 'event',
+            'date_from': start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            'date_to': end_time.strftime("%Y-%m-%d %H:%M:%S")
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['event_form'].non_field_errors())
+        self.assertEqual(Event.objects.all().count(), 1)
+
+    def test_edit_event_does_not_overlap_itself(self):
+        business = create_business(
+            'some_business', create_business_type(), self.contractor)
+        start_time = timezone.now() + datetime.timedelta(days=1)
+        end_time = start_time + datetime.timedelta(days=1)
+        event = create_event(start_time, end_time, self.client,
+                             business=business)
+
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        response = rc.post('/event/{}/edit/'.format(event.pk), {
+            'title': 'renamed event',
+            'date_from': start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            'date_to': end_time.strftime("%Y-%m-%d %H:%M:%S"),
+            'businesses': [business.pk]
+        })
+
+        self.assertRedirects(response, '/events/')
+        event.refresh_from_db()
+        self.assertEqual(event.title, 'renamed event')
+
+    def test_event_form_offers_only_selected_businesses(self):
+        business_type = create_business_type()
+        booked = create_business('booked', business_type, self.contractor)
+        create_business('other', business_type, self.contractor)
+        start_time = timezone.now() + datetime.timedelta(days=1)
+        event = create_event(start_time, start_time + datetime.timedelta(
+            hours=1), self.client, business=booked)
+
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        add_page = rc.get('/add-event/').content.decode()
+        edit_page = rc.get('/event/{}/edit/'.format(event.pk)).content.decode()
+
+        self.assertNotIn('booked</option>', add_page)
+        self.assertIn('value="{}" selected>booked</option>'.format(booked.pk),
+                      edit_page)
+        self.assertNotIn('other</option>', edit_page)
+
+    def test_business_autocomplete(self):
+        business_type = create_business_type()
+        for name in ('Golden Cake', 'golden hall', 'Silver Hall'):
+            create_business(name, business_type, self.contractor)
+
+        response = RequestClient().get('/businesses/autocomplete/',
+                                       {'q': 'GOLD'})
+
+        self.assertEqual([result['name'] for result in response.json()[
+            'results']], ['Golden Cake', 'golden hall'])
+        self.assertEqual(RequestClient().get(
+            '/businesses/autocomplete/').json(), {'results': []})
+
+    def test_edit_event_unreachable_by_different_client(self):
+        now = timezone.now()
+        event = create_event(now, now + datetime.timedelta(days=1),
+                             self.client)
+        another_client = create_client(
+            username='another_client',
+            password='p4ssw0rd',
+            email='another_client@mail.com'
+        )
+
+        rc = RequestClient()
+        rc.force_login(another_client.user)
+        response = rc.post('/event/{}/edit/'.format(event.pk),
+                           {'title': 'renamed event'})
+
+        self.assertEqual(response.status_code, 404)
+        event.refresh_from_db()
+        self.assertEqual(event.title, 'event')
+
+    def test_edit_missing_event(self):
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        response = rc.get('/event/1/edit/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_edit_business_unreachable_by_different_contractor(self):
+        business = create_business(
+            'some_business', create_business_type(), self.contractor)
+        another_contractor = create_contractor(
+            username='another_contractor',
+            password='p4ssw0rd',
+            email='another_contractor@mail.com'
+        )
+
+        rc = RequestClient()
+        rc.force_login(another_contractor.user)
+        response = rc.get('/business/{}/edit/'.format(business.pk))
+
+        self.assertEqual(response.status_code, 404)
+
     def test_add_event_failure_as_contractor_get(self):
         rc = RequestClient()
         rc.force_login(self.contractor.user)
@@ -427,6 +637,25 @@ class OpinionTests(TestCase):
             list(get_messages(response.wsgi_request))[0].message,
             'Your opinion has been successfully added!')
 
+    def test_add_opinion_after_event_ended(self):
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        date_from = timezone.now() + datetime.timedelta(days=1)
+        event = create_event(date_from, date_from + datetime.timedelta(
+            hours=1), self.client, business=self.business)
+        # The event has ended since, and end_events has not run.
+        Event.objects.filter(pk=event.pk).update(
+            date_from=date_from - datetime.timedelta(days=2),
+            date_to=date_from - datetime.timedelta(days=1))
+
+        response = rc.post('/business/1/add-opinion/', {
+            'text': 'some_text',
+            'rating': '1'
+        })
+
+        self.assertRedirects(response, '/business/1/')
+        self.assertEqual(Opinion.objects.get().event, event)
+
     def test_add_opinion_to_non_existing_business(self):
         rc = RequestClient()
         rc.force_login(self.client.user)
@@ -484,6 +713,26 @@ class OpinionTests(TestCase):
             list(get_messages(response.wsgi_request))[1].message,
             'You cannot add more opinions on this business.')
 
+    def test_add_opinion_per_ended_event(self):
+        rc = RequestClient()
+        rc.force_login(self.client.user)
+        events = [
+            create_event(timezone.now() - datetime.timedelta(days=days + 1),
+                         timezone.now() - datetime.timedelta(days=days),
+                         self.client, business=self.business)
+            for days in (3, 1)
+        ]
+
+        for _ in range(3):
+            rc.post('/business/1/add-opinion/', {
+                'text': 'some_text',
+                'rating': '4'
+            })
+
+        self.assertEqual(
+            list(Opinion.objects.order_by('pk').values_list('author', 'event')),
+            [(self.client.pk, events[0].pk), (self.client.pk, events[1].pk)])
+
 
 class MainPageTests(TestCase):
 
@@ -502,3 +751,109 @@ class MainPageTests(TestCase):
         response = rc.get('/main/')
         self.assertEqual(list(Business.objects.all()),
                          list(response.context['businesses']))
+
+
+class BusinessScheduleTests(TestCase):
+
+    def setUp(self):
+        self.client = create_client()
+        self.business = create_business(
+            'some_business', create_business_type(), create_contractor())
+        self.now = timezone.now()
+
+        create_event(self.now + datetime.timedelta(days=1),
+                     self.now + datetime.timedelta(days=2),
+                     self.client, title='inside', business=self.business)
+        create_event(self.now + datetime.timedelta(days=60),
+                     self.now + datetime.timedelta(days=61),
+                     self.client, title='outside', business=self.business)
+
+    def _get_schedule(self, date_from, date_to, **headers):
+        return RequestClient().get(
+            '/business/{}/schedule/'.format(self.business.pk), {
+                'from': int(date_from.timestamp() * 1000),
+                'to': int(date_to.timestamp() * 1000)
+            }, **headers)
+
+    def test_schedule_contains_only_window_events(self):
+        response = self._get_schedule(
+            self.now, self.now + datetime.timedelta(days=30))
+        data = json.loads(b''.join(response.streaming_content).decode())
+
+        self.assertEqual(data['success'], 1)
+        self.assertEqual([event['title'] for event in data['result']],
+                         ['inside'])
+
+    def test_schedule_not_modified(self):
+        date_to = self.now + datetime.timedelta(days=30)
+        response = self._get_schedule(self.now, date_to)
+
+        response = self._get_schedule(
+            self.now, date_to, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_schedule_invalid_window(self):
+        response = self._get_schedule(
+            self.now, self.now + datetime.timedelta(days=1000))
+        self.assertEqual(response.status_code, 400)
+
+        response = RequestClient().get(
+            '/business/{}/schedule/'.format(self.business.pk))
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.client = create_client()
+        self.contractor = create_contractor()
+        self.business = create_business(
+            'Cakes, Pies & Co', create_business_type(), self.contractor)
+        self.now = timezone.now()
+        self.event = create_event(self.now + datetime.timedelta(days=1),
+                                  self.now + datetime.timedelta(days=2),
+                                  self.client, title='Wedding; evening ' * 5,
+                                  business=self.business)
+
+    def _get_export(self, url, user=None):
+        rc = RequestClient()
+        if user is not None:
+            rc.force_login(user)
+        response = rc.get(url)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_events_csv(self):
+        response, content = self._get_export('/events/export.csv',
+                                             self.client.user)
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0],
+                         ['id', 'title', 'start', 'end', 'businesses'])
+        self.assertEqual(rows[1][1], self.event.title)
+        self.assertEqual(rows[1][4], 'Cakes, Pies & Co')
+
+    def test_schedule_icalendar(self):
+        _, content = self._get_export(
+            '/business/{}/schedule.ics'.format(self.business.pk))
+        lines = content.split('\r\n')
+
+        self.assertEqual(lines[0], 'BEGIN:VCALENDAR')
+        self.assertIn('X-WR-CALNAME:Schedule of Cakes\\, Pies & Co', lines)
+        self.assertIn('UID:event-{}@eventplanner'.format(self.event.pk),
+                      lines)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in lines))
+        unfolded = content.replace('\r\n ', '')
+        self.assertIn('SUMMARY:{}'.format('Wedding\\; evening ' * 5),
+                      unfolded)
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+
+    def test_events_export_only_for_clients(self):
+        rc = RequestClient()
+        rc.force_login(self.contractor.user)
+        self.assertEqual(rc.get('/events/export.csv').status_code, 404)
+
+    def test_unknown_export_format(self):
+        response = RequestClient().get(
+            '/business/{}/schedule.pdf'.format(self.business.pk))
+        self.assertEqual(response.status_code, 404)
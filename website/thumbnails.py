@@ -0,0 +1,132 @@
+import logging
+import os
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from .jobs import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZES = {
+    'small': 64,
+    'medium': 225,
+    'large': 450,
+}
+THUMBNAIL_DIR = 'thumbnails'
+DEFAULT_MAX_PIXELS = 4096 * 4096
+
+
+def get_max_pixels():
+    return getattr(settings, 'AVATAR_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+
+
+def get_thumbnail_name(name, size, webp=False):
+    directory, filename = posixpath.split(name)
+    stem, extension = posixpath.splitext(filename)
+    if webp:
+        extension = '.webp'
+    elif extension.lower() not in ('.jpg', '.jpeg', '.png'):
+        extension = '.png'
+
+    return posixpath.join(directory, THUMBNAIL_DIR, '{}_{}{}'.format(
+        stem, AVATAR_SIZES[size], extension))
+
+
+def has_thumbnails(name):
+    # The smallest WebP thumbnail is the last one rendered.
+    return default_storage.exists(
+        get_thumbnail_name(name, min(AVATAR_SIZES, key=AVATAR_SIZES.get),
+                           webp=True))
+
+
+def render_thumbnails(source_path, targets, max_pixels):
+    """Writes thumbnails of the image at ``source_path``.
+
+    ``targets`` is a list of ``(size, path)`` pairs; the output format follows
+    the extension of ``path``. Images over ``max_pixels`` are rejected before
+    being decoded, so memory stays bounded whatever the upload claims, and
+    JPEGs are decoded at reduced scale.
+    """
+    largest = max(size for size, _ in targets)
+
+    # Image.MAX_IMAGE_PIXELS and warning filters are global to the process,
+    # and jobs render on several threads, so _load_image checks the size.
+    try:
+        base = _load_image(source_path, largest, max_pixels)
+    except Image.DecompressionBombError as error:
+        raise ValueError(str(error)) from error
+
+    base.thumbnail((largest, largest), Image.LANCZOS)
+
+    for size, path in sorted(targets, key=lambda target: target[0],
+                             reverse=True):
+        thumbnail = base.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension in ('.jpg', '.jpeg') and thumbnail.mode != 'RGB':
+            thumbnail = thumbnail.convert('RGB')
+
+        # Renders of one image may run at once, so each writes its own file
+        # and the last to finish replaces the others.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, partial_path = tempfile.mkstemp(
+            '.partial', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(descriptor, 'wb') as partial:
+                thumbnail.save(partial, format=Image.registered_extensions()[
+                    extension], quality=85)
+            os.chmod(partial_path, 0o644)
+            os.replace(partial_path, path)
+        except BaseException:
+            os.remove(partial_path)
+            raise
+
+    return [path for _, path in targets]
+
+
+def _load_image(path, largest, max_pixels):
+    with Image.open(path) as image:
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ValueError('{} has {}x{} pixels, over the limit of '
+                             '{}.'.format(path, width, height, max_pixels))
+
+        image.draft('RGB', (largest, largest))
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+            image.mode == 'P' and 'transparency' in image.info)
+        return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def get_render_args(name):
+    targets = [
+        (pixels, default_storage.path(get_thumbnail_name(name, size, webp)))
+        for size, pixels in sorted(AVATAR_SIZES.items(),
+                                   key=lambda item: item[1])
+        for webp in (False, True)
+    ]
+    return default_storage.path(name), targets, get_max_pixels()
+
+
+def render_thumbnails_now(name):
+    return render_thumbnails(*get_render_args(name))
+
+
+def schedule_avatar_thumbnails(name):
+    """Queues rendering every avatar thumbnail of ``name`` off the request
+    path, once per image however often it is scheduled."""
+    return enqueue(render_avatar_thumbnails, {'name': name},
+                   key='avatar-thumbnails:{}'.format(name))
+
+
+@task
+def render_avatar_thumbnails(name):
+    try:
+        render_thumbnails_now(name)
+    except ValueError:
+        # Retrying cannot shrink the image.
+        logger.exception('Could not render thumbnails of %s', name)
@@ -0,0 +1,70 @@
+import contextvars
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+# Every RequestTiming entered in the current context; they may be nested.
+_active = contextvars.ContextVar('website_request_timings', default=())
+
+
+class RequestTiming:
+    """Time spent in SQL and template rendering while handling a request.
+
+    Template time includes the SQL run by lazy querysets while rendering.
+    """
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self._token = None
+
+    def __enter__(self):
+        self._token = _active.set(_active.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.reset(self._token)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Execute wrapper for ``connection.execute_wrapper``."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        timings = _active.get()
+        if not timings:
+            return super().render(context, request)
+
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            duration = time.perf_counter() - start
+            for timing in timings:
+                timing.template_time += duration
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend recording render time of sampled requests.
+
+    Only templates loaded through the backend are timed, so included ones
+    are not counted twice.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -2,11 +2,10 @@ from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import login_required
 from django.conf.urls.static import static
 from django.urls import path
-from django.views.generic import DetailView, TemplateView
+from django.views.generic import TemplateView
 
 from eventplanner import settings
 from . import views
-from website.models import Business
 
 
 app_name = 'website'
@@ -45,15 +44,24 @@ urlpatterns = [
          name='add_business'),
     path('businesses/', views.BusinessesListView.as_view(),
          name='businesses'),
+    path('businesses/autocomplete/',
+         views.BusinessAutocompleteView.as_view(),
+         name='business_autocomplete'),
     path('ranking/',
          views.RankingView.as_view(),
          name='ranking'),
     path('business/<int:pk>/',
-         DetailView.as_view(
-             model=Business,
-             template_name='website/pages/business.html'
-         ),
+         views.BusinessDetailView.as_view(),
          name='business'),
+    path('business/<int:pk>/schedule/',
+         views.BusinessScheduleView.as_view(),
+         name='business_schedule'),
+    path('business/<int:pk>/live/',
+         views.BusinessLiveView.as_view(),
+         name='business_live'),
+    path('business/<int:pk>/schedule.<str:export_format>',
+         views.BusinessScheduleExportView.as_view(),
+         name='export_business_schedule'),
     path('business/<int:pk>/edit/',
          login_required(views.EditBusinessView.as_view()),
          name='edit_business'),
@@ -68,6 +76,9 @@ urlpatterns = [
     path('events/',
          login_required(views.EventsListView.as_view()),
          name='events'),
+    path('events/export.<str:export_format>',
+         login_required(views.EventsExportView.as_view()),
+         name='export_events'),
     path('add-event/',
          login_required(views.AddEventView.as_view()),
          name='add_event'),
@@ -77,6 +88,8 @@ urlpatterns = [
     path('event/<int:pk>/edit/',
          login_required(views.EditEventView.as_view()),
          name='edit_event'),
+
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG:
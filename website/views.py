@@ -1,14 +1,31 @@
+import datetime
+import hashlib
+import hmac
+import json
+
 from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
+from django.conf import settings
 from django.contrib.auth.forms import PasswordChangeForm
-from django.db.models import Avg
-from django.http import Http404, HttpResponseRedirect
+from django.core.exceptions import PermissionDenied
+from django.db import connections, transaction
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
-from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.views.generic import DetailView, ListView, View
-
-from website.models import Business, Event
+from django.views.generic.detail import SingleObjectMixin
+
+from website import live, metrics
+from website.caching import (CachedPageMixin, ConditionalPageMixin,
+                             get_or_set, get_versions, make_key)
+from website.exports import CONTENT_TYPES, export_events
+from website.models import Business, Event, Opinion, OpinionEligibility
+from website.pagination import KeysetPaginationMixin
+from website.permissions import OwnerRequiredMixin
+from website.search import get_search_backend
 from .forms import (BusinessForm, ClientCreationForm, ClientEditForm,
                     ContractorCreationForm, ContractorEditForm, EventForm,
                     UserCreationForm, UserEditForm, CreateOpinionForm,
@@ -105,7 +122,7 @@ class ProfileEditView(View):
             'user_edit_form': self.user_edit_form(
                 request.POST, instance=request.user),
             'edit_avatar_form': self.edit_avatar_form(
-                request.POST, instance=request.user),
+                request.POST, request.FILES, instance=request.user),
             'change_password_form': self.password_change_form(
                 request.user, request.POST)
         }
@@ -116,7 +133,8 @@ class ProfileEditView(View):
             messages.success(request, 'Your password has been successfully updated!')
 
             return HttpResponseRedirect(reverse('website:edit'))
-        elif context['edit_avatar_form'].is_valid():
+        elif ('avatar' in request.FILES
+              and context['edit_avatar_form'].is_valid()):
             context['edit_avatar_form'].save()
             messages.success(request, 'Your avatar has been successfully updated!')
 
@@ -156,31 +174,47 @@ class ProfileEditView(View):
         return render(request, self.template_name, context)
 
 
-class EventsListView(ListView):
+class EventsListView(KeysetPaginationMixin, ListView):
     context_object_name = 'events_list'
     template_name = 'website/pages/events_list.html'
+    page_ordering = ('-date_from', '-pk')
 
     def get_queryset(self):
         if not self.request.user.is_client():
             raise Http404()
 
-        return Event.objects.filter(owner=self.request.user.client).order_by(
-            '-date_from')
+        events = Event.objects.filter(owner=self.request.user.client)
+        return events.prefetch_related('businesses').order_by('-date_from')
 
 
-class EventDetailView(DetailView):
-    model = Event
-    context_object_name = 'event'
-    template_name = 'website/pages/event.html'
+def export_response(events, export_format, filename, name, **kwargs):
+    if export_format not in CONTENT_TYPES:
+        raise Http404()
+
+    response = StreamingHttpResponse(
+        export_events(events, export_format, name, **kwargs),
+        content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(
+        filename, export_format)
+    return response
+
 
-    def get_object(self, queryset=None):
-        event = super().get_object(queryset)
+class EventsExportView(View):
 
-        if (not self.request.user.is_client()
-                or not self.request.user.client.event_set.filter(pk=event.pk)):
+    def get(self, request, export_format):
+        if not request.user.is_client():
             raise Http404()
 
-        return event
+        return export_response(
+            Event.objects.filter(owner=request.user.client), export_format,
+            'events', 'Events of {}'.format(request.user.username))
+
+
+class EventDetailView(OwnerRequiredMixin, DetailView):
+    queryset = Event.objects.prefetch_related('businesses')
+    owner_profile = 'client'
+    context_object_name = 'event'
+    template_name = 'website/pages/event.html'
 
 
 class AddEventView(View):
@@ -199,47 +233,46 @@ class AddEventView(View):
         if not request.user.is_client():
             raise Http404()
 
-        event_form = self.event_form(request.POST)
+        event_form = self.event_form(request.POST, owner=request.user.client)
 
-        if event_form.is_valid():
-            event = event_form.save(commit=False)
-            event.owner = request.user.client
-            event.save()
-            event.businesses.set(request.POST.getlist('businesses'))
-            messages.success(request, 'Your event has been successfully created!')
+        with transaction.atomic():
+            event_form.lock_businesses()
+            if event_form.is_valid():
+                event = event_form.save(commit=False)
+                event.owner = request.user.client
+                event.save()
+                event.businesses.set(event_form.cleaned_data['businesses'])
+                messages.success(request, 'Your event has been successfully created!')
 
-            return HttpResponseRedirect(reverse('website:events'))
+                return HttpResponseRedirect(reverse('website:events'))
 
         return render(request, self.template_name, {
             'event_form': event_form
         })
 
 
-class EditEventView(View):
+class EditEventView(OwnerRequiredMixin, SingleObjectMixin, View):
+    model = Event
+    owner_profile = 'client'
     event_form = EventForm
     template_name = 'website/pages/add_event.html'
 
-    @staticmethod
-    def _check_event_owner(user, pk):
-        if not (user.is_client()
-                and Event.objects.get(pk=pk) in user.client.event_set.all()):
-            raise Http404()
-
     def get(self, request, pk):
-        self._check_event_owner(request.user, pk)
         return render(request, self.template_name, {
-            'event_form': self.event_form(instance=Event.objects.get(pk=pk))
+            'event_form': self.event_form(instance=self.get_object(),
+                                          owner=self.get_owner())
         })
 
     def post(self, request, pk):
-        self._check_event_owner(request.user, pk)
-        event_form = self.event_form(request.POST,
-                                     instance=Event.objects.get(pk=pk))
-        if event_form.is_valid():
-            event_form.save()
-            messages.success(request, 'Your event has been successfully updated!')
+        event_form = self.event_form(request.POST, instance=self.get_object(),
+                                     owner=self.get_owner())
+        with transaction.atomic():
+            event_form.lock_businesses()
+            if event_form.is_valid():
+                event_form.save()
+                messages.success(request, 'Your event has been successfully updated!')
 
-            return HttpResponseRedirect(reverse('website:events'))
+                return HttpResponseRedirect(reverse('website:events'))
 
         messages.error(request, 'Please correct the error below.')
         return render(request, self.template_name, {
@@ -247,21 +280,182 @@ class EditEventView(View):
         })
 
 
-class BusinessesListView(ListView):
+class BusinessesListView(ConditionalPageMixin, KeysetPaginationMixin,
+                         ListView):
+    read_from_replicas = True
     template_name = 'website/pages/businesses_list.html'
     context_object_name = 'businesses_list'
 
+    def get_page_version(self):
+        return self.get_keyset_page_version(self.get_queryset())
+
     def get_queryset(self):
-        return Business.objects.all()
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            return get_search_backend().search(query)
+
+        return Business.objects.select_related(
+            'owner__user', 'business_type').order_by('pk')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '').strip()
+        return context
+
+
+class BusinessAutocompleteView(View):
+    read_from_replicas = True
+    limit = 10
+
+    def get(self, request):
+        prefix = request.GET.get('q', '').strip()
+        businesses = Business.objects.name_prefix(prefix).values_list(
+            'pk', 'name', 'business_type__business_type')[:self.limit]
 
+        return JsonResponse({'results': [
+            {'id': pk, 'name': name, 'business_type': business_type}
+            for pk, name, business_type in (businesses if prefix else ())
+        ]})
 
-class RankingView(ListView):
+
+class BusinessDetailView(ConditionalPageMixin, CachedPageMixin, DetailView):
+    read_from_replicas = True
+    queryset = Business.objects.select_related('business_type')
+    template_name = 'website/pages/business.html'
+    cache_name = 'business'
+
+    def get_cache_scopes(self):
+        return ['business:{}'.format(self.kwargs['pk'])]
+
+    def get_page_version(self):
+        self.updated_at = Business.objects.filter(
+            pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+        return self.updated_at
+
+    def get_last_modified(self):
+        return self.updated_at
+
+
+class RankingView(ConditionalPageMixin, CachedPageMixin, ListView):
+    read_from_replicas = True
     template_name = 'website/pages/ranking.html'
     context_object_name = 'businesses_list'
+    cache_name = 'ranking'
+
+    def get_cache_scopes(self):
+        return ['ranking']
+
+    def get_page_version(self):
+        return list(self.get_queryset().values_list('pk', 'updated_at'))
 
     def get_queryset(self):
-        return Business.objects.all().annotate(
-            avg_rating=Avg('opinion__rating')).order_by('-avg_rating')[:10]
+        return Business.objects.select_related(
+            'owner__user', 'business_type').order_by('-average_rating')[:10]
+
+
+class BusinessScheduleView(View):
+    read_from_replicas = True
+    max_window = datetime.timedelta(days=400)
+
+    def get(self, request, pk):
+        get_object_or_404(Business.objects.only('pk'), pk=pk)
+
+        try:
+            date_from, date_to = self._get_window(request)
+        except ValueError as error:
+            return JsonResponse({'success': 0, 'error': str(error)},
+                                status=400)
+
+        events = Event.objects.overlapping(date_from, date_to).booking(
+            pk).order_by('date_from', 'pk')
+
+        etag = get_or_set(
+            make_key('schedule_etag', pk, date_from, date_to,
+                     *get_versions('schedule:{}'.format(pk))),
+            lambda: self._get_etag(events))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = StreamingHttpResponse(self._stream_events(events),
+                                             content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+    def _get_window(self, request):
+        try:
+            date_from, date_to = (
+                datetime.datetime.fromtimestamp(
+                    int(request.GET[param]) / 1000, tz=datetime.timezone.utc)
+                for param in ('from', 'to'))
+        except (KeyError, OverflowError, OSError, ValueError):
+            raise ValueError('Window must be given as "from" and "to" '
+                             'timestamps in milliseconds.')
+
+        if not date_from < date_to <= date_from + self.max_window:
+            raise ValueError('Window must be non-empty and at most {} days '
+                             'long.'.format(self.max_window.days))
+
+        return date_from, date_to
+
+    @staticmethod
+    def _get_etag(events):
+        digest = hashlib.md5()
+        for row in events.values_list(
+                'pk', 'title', 'date_from', 'date_to').iterator():
+            digest.update(repr(row).encode())
+
+        return quote_etag(digest.hexdigest())
+
+    @staticmethod
+    def _stream_events(events):
+        yield '{"success": 1, "result": ['
+        for index, event in enumerate(events.iterator()):
+            yield (',' if index else '') + json.dumps(
+                event.get_schedule_entry())
+        yield ']}'
+
+
+class BusinessLiveView(View):
+    """Booking changes of a business as Server-Sent Events.
+
+    Under ASGI, website.asgi serves these streams without a thread; this
+    view serves them elsewhere. Each stream holds its worker thread, so
+    streams are short and browsers wait before reconnecting. Calendars
+    only reload after a reconnection if they missed a change.
+    """
+
+    def get(self, request, pk):
+        get_object_or_404(Business.objects.only('pk'), pk=pk)
+        # The stream needs no database connection while it holds the thread.
+        for connection in connections.all():
+            if not connection.in_atomic_block:
+                connection.close()
+
+        seconds = getattr(settings, 'LIVE_UPDATES_THREADED_STREAM_SECONDS',
+                          10)
+        reconnect_delay = getattr(
+            settings, 'LIVE_UPDATES_THREADED_RECONNECT_SECONDS', 20)
+        response = StreamingHttpResponse(
+            live.stream(live.business_channel(pk), seconds,
+                        int(reconnect_delay * 1000), live.parse_event_id(
+                            request.META.get('HTTP_LAST_EVENT_ID'))),
+            content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stops nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class BusinessScheduleExportView(View):
+    read_from_replicas = True
+
+    def get(self, request, pk, export_format):
+        business = get_object_or_404(Business.objects.only('pk', 'name'),
+                                     pk=pk)
+
+        return export_response(
+            Event.objects.filter(businesses=pk), export_format,
+            'schedule-{}'.format(pk), 'Schedule of {}'.format(business.name),
+            with_businesses=False)
 
 
 class AddBusinessView(View):
@@ -294,30 +488,21 @@ class AddBusinessView(View):
         })
 
 
-class EditBusinessView(View):
+class EditBusinessView(OwnerRequiredMixin, SingleObjectMixin, View):
+    model = Business
+    owner_profile = 'contractor'
     business_form = BusinessForm
     template_name = 'website/pages/edit_business.html'
 
-    @staticmethod
-    def _check_business_owner(user, pk):
-        if not (user.is_contractor()
-                and Business.objects.get(pk=pk)
-                in user.contractor.business_set.all()):
-            raise Http404()
-
     def get(self, request, pk):
-        self._check_business_owner(request.user, pk)
-
-        business_form = self.business_form(instance=Business.objects.get(pk=pk))
+        business_form = self.business_form(instance=self.get_object())
         return render(request, self.template_name, {
             'business_form': business_form
         })
 
     def post(self, request, pk):
-        self._check_business_owner(request.user, pk)
-
         business_form = self.business_form(request.POST,
-                                           instance=Business.objects.get(pk=pk))
+                                           instance=self.get_object())
         if business_form.is_valid():
             business_form.save()
             messages.success(request, 'Your business has been successfully updated!')
@@ -351,34 +536,35 @@ class AddOpinionView(View):
 
         business = get_object_or_404(Business, pk=pk)
 
-        # Past events created by the client
-        events_count = business.event_set.filter(
-            owner__user=request.user).filter(
-            date_to__lt=timezone.now()).count()
-
-        if events_count == 0:
-            messages.error(request, 'This business has not handled any of your events.')
-            return HttpResponseRedirect(
-                reverse('website:business', kwargs={'pk': pk}))
-
-        created_opinions_count = business.opinion_set.filter(
-            business__event__owner__user=request.user
-        ).count()
-
-        if events_count <= created_opinions_count:
-            messages.error(request, 'You cannot add more opinions on this business.')
-            return HttpResponseRedirect(
-                reverse('website:business', kwargs={'pk': pk}))
-
-        form = self.form(request.POST)
-        if form.is_valid():
-            opinion = form.save(commit=False)
-            opinion.business = business
-            opinion.save()
-
-            messages.success(request, 'Your opinion has been successfully added!')
-            return HttpResponseRedirect(
-                reverse('website:business', kwargs={'pk': pk}))
+        with transaction.atomic():
+            # end_events ends events periodically; the client's events at
+            # this business that ended since are credited here.
+            Event.objects.filter(owner=request.user.client,
+                                 businesses=business).end_past()
+            eligibility = OpinionEligibility.objects.select_for_update(
+            ).filter(client=request.user.client, business=business).first()
+
+            if eligibility is None or not eligibility.ended_events:
+                messages.error(request, 'This business has not handled any of your events.')
+                return HttpResponseRedirect(
+                    reverse('website:business', kwargs={'pk': pk}))
+
+            if not eligibility.can_add_opinion():
+                messages.error(request, 'You cannot add more opinions on this business.')
+                return HttpResponseRedirect(
+                    reverse('website:business', kwargs={'pk': pk}))
+
+            form = self.form(request.POST)
+            if form.is_valid():
+                opinion = form.save(commit=False)
+                opinion.business = business
+                opinion.author = request.user.client
+                opinion.event = eligibility.get_unreviewed_event()
+                opinion.save()
+
+                messages.success(request, 'Your opinion has been successfully added!')
+                return HttpResponseRedirect(
+                    reverse('website:business', kwargs={'pk': pk}))
 
         return render(request, self.template_name, {
             'form': form,
@@ -386,19 +572,34 @@ class AddOpinionView(View):
         })
 
 
-class OpinionsListView(View):
+class OpinionsListView(ConditionalPageMixin, CachedPageMixin,
+                       KeysetPaginationMixin, View):
+    read_from_replicas = True
     template_name = 'website/pages/opinions_list.html'
+    page_ordering = ('-pk',)
+    cache_name = 'opinions'
+
+    def get_cache_scopes(self):
+        return ['business:{}'.format(self.kwargs['pk']),
+                'opinions:{}'.format(self.kwargs['pk'])]
+
+    def get_page_version(self):
+        business = Business.objects.filter(
+            pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+        return business, self.get_keyset_page_version(
+            Opinion.objects.filter(business=self.kwargs['pk']))
 
     def get(self, request, pk):
         business = get_object_or_404(Business, pk=pk)
-        opinions = business.opinion_set.all()
+        _, page = self.paginate_keyset(business.opinion_set.all())
         return render(request, self.template_name, {
             'business': business,
-            'opinions': opinions
+            'opinions': page.object_list,
+            'page_obj': page
         })
 
 
-class MainPageView(View):
+class MainPageView(KeysetPaginationMixin, View):
     template_name = 'website/pages/main_page.html'
 
     def get(self, request):
@@ -407,7 +608,26 @@ class MainPageView(View):
         return render(request, self.template_name)
 
     def _get_contractor_main(self, request):
-        businesses = Business.objects.filter(owner=self.request.user.contractor)
+        _, page = self.paginate_keyset(
+            Business.objects.filter(owner=self.request.user.contractor))
         return render(request, self.template_name, {
-            'businesses': businesses
+            'businesses': page.object_list,
+            'page_obj': page
         })
+
+
+class MetricsView(View):
+    """Metrics of all server processes, for staff and for scrapers sending
+    ``METRICS_TOKEN`` as a bearer token."""
+
+    def get(self, request):
+        if not (self._has_token(request) or request.user.is_staff):
+            raise PermissionDenied
+        return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+    @staticmethod
+    def _has_token(request):
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        return bool(token) and hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(),
+            'Bearer {}'.format(token).encode())